@@ -8,9 +8,13 @@ __author__ = 'Hugh Sorby, Richard Cristie'
 __stepname__ = 'Load Femur'
 __location__ = 'https://github.com/rchristie/mapclientplugins.loadfemurstep/archive/master.zip'
 
-# import class that derives itself from the step mountpoint.
-from mapclientplugins.loadfemurstep import step
+try:
+    import mapclient
+except ImportError:
+    # running headless e.g. the loadfemur-batch command; there is no framework to register the step with
+    mapclient = None
 
-# Import the resource file when the module is loaded,
-# this enables the framework to use the step icon.
-from . import resources_rc
\ No newline at end of file
+if mapclient is not None:
+    # import class that derives itself from the step mountpoint.
+    # Its Qt resources, dialog and computation are imported on first use.
+    from mapclientplugins.loadfemurstep import step
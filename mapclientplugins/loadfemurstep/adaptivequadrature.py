@@ -0,0 +1,147 @@
+"""
+Error controlled integration of plate penetration over elements which the
+plate boundary crosses.
+
+Penetration is max(plateHeight - height, 0), whose kink along the contact
+boundary is poorly resolved by a fixed Gauss rule on the elements it passes
+through, while elements entirely below the plate are smooth and elements
+entirely above it contribute nothing. Only the crossed elements are
+refined, by recursively splitting them into quarters in xi and comparing
+the sum of the quarters with their parent; the differences are the
+estimated error. The points evaluated refining each element are limited to
+a budget, as a multiple of the fixed rule, beyond which its cells keep
+their last values, so a tight tolerance cannot cost unbounded work.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import numpy
+from mapclientplugins.loadfemurstep.hermitemesh import bicubicHermiteBasis, getGaussPoints
+
+# xi offsets of the four quarters of a cell in units of the quarter size
+QUARTER_OFFSETS = numpy.array([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+
+class AdaptiveContactQuadrature(object):
+    """
+    Gauss rule applied to square xi cells of bicubic Hermite elements,
+    refined where the penetration integral has not converged.
+    """
+
+    def __init__(self, hermiteMesh, dofValues, numberOfPoints, maximumLevels, evaluationBudget=0):
+        """
+        :param hermiteMesh: HermiteMesh
+        :param dofValues: float array (dofsCount, 3) of coordinates nodal parameters
+        :param numberOfPoints: Gauss points per cell direction
+        :param maximumLevels: maximum number of times a cell is split
+        :param evaluationBudget: maximum points evaluated refining each element
+        as a multiple of the fixed rule's points, or 0 for no limit
+        """
+        self._elementParameters = hermiteMesh.getElementParameters(dofValues)
+        self._xi, self._weights = getGaussPoints(numberOfPoints)
+        self._maximumLevels = maximumLevels
+        self._maximumElementEvaluations = evaluationBudget*len(self._weights) if (evaluationBudget > 0) else None
+
+    def getCellPointsCount(self):
+        return len(self._weights)
+
+    def _integrateCells(self, up, plateHeight, elementIndexes, origins, sizes):
+        """
+        :param elementIndexes: int array (cellsCount) element of each cell
+        :param origins: float array (cellsCount, 2) xi of each cell's first corner
+        :param sizes: float array (cellsCount) xi width of each cell
+        :return: float array (cellsCount) of penetration integrated over each cell
+        """
+        cellsCount = len(elementIndexes)
+        pointsCount = len(self._weights)
+        xi = (origins[:, numpy.newaxis, :] + sizes[:, numpy.newaxis, numpy.newaxis]*self._xi).reshape((-1, 2))
+        basis, dxi1, dxi2 = bicubicHermiteBasis(xi)
+        shape = (cellsCount, pointsCount, basis.shape[1])
+        elementParameters = self._elementParameters[elementIndexes]
+        heights = numpy.einsum('eqf,efc,c->eq', basis.reshape(shape), elementParameters, up)
+        dxdxi1 = numpy.einsum('eqf,efc->eqc', dxi1.reshape(shape), elementParameters)
+        dxdxi2 = numpy.einsum('eqf,efc->eqc', dxi2.reshape(shape), elementParameters)
+        jacobian = numpy.linalg.norm(numpy.cross(dxdxi1, dxdxi2), axis=2)
+        penetrations = numpy.maximum(plateHeight - heights, 0.0)
+        return numpy.dot(penetrations*jacobian, self._weights)*sizes*sizes
+
+    def integrateElements(self, up, plateHeight, elementIndexes):
+        """
+        :return: float array of the fixed rule integral of penetration over each element
+        """
+        elementsCount = len(elementIndexes)
+        return self._integrateCells(up, plateHeight, elementIndexes, numpy.zeros((elementsCount, 2)), numpy.ones(elementsCount))
+
+    def integratePenetration(self, up, plateHeight, elementIndexes, tolerance, coarseValues=None):
+        """
+        Integrate penetration over elements, splitting cells until the
+        change from splitting is within their area share of tolerance or
+        the maximum level is reached. An element whose cells cannot all be
+        split within its evaluation budget keeps their current values, with
+        a quarter of their parent's estimated error each.
+        :param elementIndexes: int array of elements crossed by the plate
+        :param tolerance: absolute error allowed over all elements
+        :param coarseValues: optional float array of the fixed rule integral
+        over each element, evaluated if not given
+        :return: (integral, estimated error or None if nothing was refined,
+        number of points evaluated)
+        """
+        elementsCount = len(elementIndexes)
+        pointsCount = len(self._weights)
+        origins = numpy.zeros((elementsCount, 2))
+        sizes = numpy.ones(elementsCount)
+        evaluations = 0
+        if coarseValues is None:
+            coarseValues = self.integrateElements(up, plateHeight, elementIndexes)
+            evaluations += elementsCount*pointsCount
+        values = numpy.asarray(coarseValues, dtype=float)
+        integral = 0.0
+        errorEstimate = None
+        # element of each cell as index into elementIndexes, points spent refining each element
+        # and estimated error of each cell, unknown before it is refined
+        owners = numpy.arange(elementsCount)
+        elementEvaluations = numpy.zeros(elementsCount, dtype=int)
+        cellErrors = None
+        for level in range(self._maximumLevels):
+            if len(elementIndexes) == 0:
+                break
+            splitEvaluations = numpy.bincount(owners, minlength=elementsCount)*4*pointsCount
+            if self._maximumElementEvaluations is not None:
+                overBudget = (elementEvaluations + splitEvaluations)[owners] > self._maximumElementEvaluations
+                if numpy.any(overBudget):
+                    integral += float(numpy.sum(values[overBudget]))
+                    if cellErrors is not None:
+                        errorEstimate = (errorEstimate or 0.0) + float(numpy.sum(cellErrors[overBudget]))
+                    keep = ~overBudget
+                    elementIndexes = elementIndexes[keep]
+                    origins = origins[keep]
+                    sizes = sizes[keep]
+                    values = values[keep]
+                    owners = owners[keep]
+                    if len(elementIndexes) == 0:
+                        break
+                    splitEvaluations = numpy.bincount(owners, minlength=elementsCount)*4*pointsCount
+            elementEvaluations += splitEvaluations
+            quarterSizes = numpy.repeat(0.5*sizes, 4)
+            quarterOrigins = numpy.repeat(origins, 4, axis=0) + quarterSizes[:, numpy.newaxis]*numpy.tile(QUARTER_OFFSETS, (len(sizes), 1))
+            quarterElementIndexes = numpy.repeat(elementIndexes, 4)
+            quarterValues = self._integrateCells(up, plateHeight, quarterElementIndexes, quarterOrigins, quarterSizes)
+            evaluations += len(quarterValues)*pointsCount
+            refinedValues = numpy.sum(quarterValues.reshape((-1, 4)), axis=1)
+            errors = numpy.abs(refinedValues - values)
+            converged = errors <= tolerance*sizes*sizes/elementsCount
+            if level == (self._maximumLevels - 1):
+                converged[:] = True
+            integral += float(numpy.sum(refinedValues[converged]))
+            errorEstimate = (errorEstimate or 0.0) + float(numpy.sum(errors[converged]))
+            split = numpy.repeat(~converged, 4)
+            elementIndexes = quarterElementIndexes[split]
+            origins = quarterOrigins[split]
+            sizes = quarterSizes[split]
+            values = quarterValues[split]
+            owners = numpy.repeat(owners, 4)[split]
+            cellErrors = numpy.repeat(0.25*errors, 4)[split]
+        # coarse values are only left unrefined when maximumLevels is 0
+        integral += float(numpy.sum(values))
+        return integral, errorEstimate, evaluations
@@ -0,0 +1,79 @@
+'''
+Run a long computation in a background thread without blocking the GUI.
+'''
+from PySide import QtCore
+
+class _Runner(QtCore.QObject):
+    '''
+    Calls the function in the background thread. The function is passed a
+    progress callback as keyword argument 'progress'.
+    '''
+
+    progressed = QtCore.Signal(str, float)
+    done = QtCore.Signal()
+
+    def __init__(self, function, args):
+        QtCore.QObject.__init__(self)
+        self._function = function
+        self._args = args
+        # only ever set True from the GUI thread and read in the background thread
+        self.cancelled = False
+        self.results = None
+        self.error = None
+
+    def _progress(self, phase, fraction):
+        self.progressed.emit(phase, fraction)
+        return not self.cancelled
+
+    @QtCore.Slot()
+    def run(self):
+        try:
+            self.results = self._function(*self._args, progress=self._progress)
+        except Exception as e:
+            self.error = e
+        self.done.emit()
+
+class BackgroundExecution(QtCore.QObject):
+    '''
+    Owns the background thread. Must be created on the GUI thread, where
+    progress and completion callbacks are then called.
+    '''
+
+    def __init__(self, function, args, progressCallback, doneCallback):
+        '''
+        :param function: callable(*args, progress=callable(phase, fraction))
+        :param progressCallback: callable(phase, fraction)
+        :param doneCallback: callable(results, error) with error None on success
+        '''
+        QtCore.QObject.__init__(self)
+        self._progressCallback = progressCallback
+        self._doneCallback = doneCallback
+        self._thread = QtCore.QThread()
+        self._runner = _Runner(function, args)
+        self._runner.moveToThread(self._thread)
+        self._thread.started.connect(self._runner.run)
+        # self lives in the GUI thread so these connections are queued
+        self._runner.progressed.connect(self._progressed)
+        self._runner.done.connect(self._done)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        '''
+        Request cancellation, which takes effect at the next progress report.
+        '''
+        self._runner.cancelled = True
+
+    def isRunning(self):
+        return self._thread.isRunning()
+
+    @QtCore.Slot(str, float)
+    def _progressed(self, phase, fraction):
+        self._progressCallback(phase, fraction)
+
+    @QtCore.Slot()
+    def _done(self):
+        self._thread.quit()
+        self._thread.wait()
+        self._doneCallback(self._runner.results, self._runner.error)
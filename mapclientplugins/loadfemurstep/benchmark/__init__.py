@@ -0,0 +1,3 @@
+'''
+Benchmarks for the load femur computation, runnable without the MAP Client.
+'''
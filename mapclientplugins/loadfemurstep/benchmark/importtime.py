@@ -0,0 +1,116 @@
+"""
+Check the time to import the plugin as the MAP Client does when listing
+plugins, and that the computation, Zinc and the configure dialog are not
+imported with it.
+
+Usage: python -m mapclientplugins.loadfemurstep.benchmark.importtime [--budget 0.05] [--repeats 5]
+
+Each import is timed in a fresh interpreter, after importing what the MAP
+Client has already loaded, keeping the fastest of repeats. Modules whose
+prerequisites are not installed are skipped. Exits with status 1 if any
+import is over budget or imports a deferred module.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# module imported on plugin discovery, with modules already loaded by the MAP
+# Client including the namespace package shared by all plugins, and those
+# loaded only if installed: the package alone is also imported headless
+PLUGIN_IMPORTS = [
+    ('mapclientplugins.loadfemurstep', ['mapclientplugins'], ['PySide.QtGui', 'mapclient.mountpoints.workflowstep']),
+    ('mapclientplugins.loadfemurstep.step', ['mapclientplugins', 'PySide.QtGui', 'mapclient.mountpoints.workflowstep'], []),
+]
+
+# modules which must only be imported on execute or configure, unless already
+# loaded as prerequisites
+DEFERRED_MODULES = [
+    'opencmiss.zinc',
+    'numpy',
+    'scipy',
+    'PySide',
+    'mapclientplugins.loadfemurstep.configuredialog',
+    'mapclientplugins.loadfemurstep.loadfemur',
+    'mapclientplugins.loadfemurstep.resources_rc',
+]
+
+_TIMING_SCRIPT = """
+import importlib, json, sys, timeit
+for prerequisite in %(prerequisites)r:
+    try:
+        importlib.import_module(prerequisite)
+    except ImportError:
+        sys.stdout.write(json.dumps({ 'skipped': prerequisite }))
+        sys.exit(0)
+for prerequisite in %(optionalPrerequisites)r:
+    try:
+        importlib.import_module(prerequisite)
+    except ImportError:
+        pass
+loadedModules = set(sys.modules)
+startTime = timeit.default_timer()
+importlib.import_module(%(module)r)
+elapsedTime = timeit.default_timer() - startTime
+sys.stdout.write(json.dumps({ 'time': elapsedTime,
+    'deferredImported': [name for name in %(deferred)r if (name in sys.modules) and (name not in loadedModules)] }))
+"""
+
+def timeImport(module, prerequisites=[], optionalPrerequisites=[]):
+    """
+    Import module in a new interpreter after its prerequisites, and any
+    optional prerequisites which are installed.
+    :return: dict of 'time' in seconds and 'deferredImported' list of
+    deferred modules it imported, or of 'skipped' prerequisite if missing
+    """
+    script = _TIMING_SCRIPT % { 'module': module, 'prerequisites': prerequisites,
+        'optionalPrerequisites': optionalPrerequisites, 'deferred': DEFERRED_MODULES }
+    output = subprocess.check_output([sys.executable, '-c', script])
+    return json.loads(output.decode('utf-8'))
+
+def checkImportTimes(budget, repeats=5):
+    """
+    :param budget: maximum import time in seconds
+    :return: list of dicts of 'module', 'time' fastest over repeats or None
+    if skipped, 'deferredImported', 'skipped' prerequisite or None and 'ok'
+    """
+    rows = []
+    for module, prerequisites, optionalPrerequisites in PLUGIN_IMPORTS:
+        row = { 'module': module, 'time': None, 'deferredImported': [], 'skipped': None, 'ok': True }
+        for repeat in range(repeats):
+            result = timeImport(module, prerequisites, optionalPrerequisites)
+            if 'skipped' in result:
+                row['skipped'] = result['skipped']
+                break
+            row['time'] = result['time'] if row['time'] is None else min(row['time'], result['time'])
+            row['deferredImported'] = result['deferredImported']
+        if row['skipped'] is None:
+            row['ok'] = (row['time'] <= budget) and not row['deferredImported']
+        rows.append(row)
+    return rows
+
+def print_rows(rows, stream=sys.stdout):
+    for row in rows:
+        if row['skipped']:
+            stream.write('%-40s  skipped: %s not installed\n' % (row['module'], row['skipped']))
+            continue
+        stream.write('%-40s  %8.4f s  %s\n' % (row['module'], row['time'], 'ok' if row['ok'] else 'FAIL'))
+        if row['deferredImported']:
+            stream.write('    imports deferred modules: ' + ', '.join(row['deferredImported']) + '\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the plugin imports within a time budget without the computation.')
+    parser.add_argument('--budget', type=float, default=0.05, help='maximum import time in seconds')
+    parser.add_argument('--repeats', type=int, default=5, help='imports per module, keeping the fastest')
+    args = parser.parse_args(argv)
+    rows = checkImportTimes(args.budget, args.repeats)
+    print_rows(rows)
+    return 0 if all(row['ok'] for row in rows) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
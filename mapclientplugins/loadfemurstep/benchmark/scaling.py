@@ -0,0 +1,246 @@
+"""
+Time each phase of loadfemur on synthetic meshes across a size sweep, and
+compare with a saved baseline to detect performance regressions.
+
+Usage: python -m mapclientplugins.loadfemurstep.benchmark.scaling --sizes 8x4 16x8 32x16
+    [--output results.json] [--baseline baseline.json] [--tolerance 0.25]
+    [--parity] [--parity-tolerance 1e-6]
+
+Exits with status 1 if any run reads its input file other than exactly
+once, if any phase is slower than the baseline by more than the
+tolerance, or with --parity if force or stress fit objective from any
+contact backend differs from the first backend by more than the parity
+tolerance relative to its value.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from opencmiss.zinc.context import Context as ZincContext
+from opencmiss.zinc.region import Region
+from mapclientplugins.loadfemurstep.loadfemur import CONTACT_BACKENDS, FemurModel, createLoggernotifier, \
+    getSettings, loadfemur, solveFemurModel
+from mapclientplugins.loadfemurstep.phases import PhaseMonitor
+from mapclientplugins.loadfemurstep.benchmark.synthetic import writeFemurLikeMesh
+
+DEFAULT_SIZES = ['8x4', '16x8', '32x16', '64x32']
+
+# phase time differences below this are timer noise and never regressions
+MINIMUM_TIME_DIFFERENCE = 0.05
+# results compared between contact backends
+PARITY_VALUE_NAMES = ['force', 'stressFitObjective']
+
+def parseSize(size):
+    """
+    :param size: string 'AROUNDxUP', e.g. '16x8'
+    :return: (elementsCountAround, elementsCountUp)
+    """
+    around, up = size.lower().split('x')
+    return int(around), int(up)
+
+@contextlib.contextmanager
+def countingFileReads():
+    """
+    Context manager counting calls to Region.readFile while entered.
+    :return: list with the file name of each call
+    """
+    filenames = []
+    readFile = Region.readFile
+    def countingReadFile(region, filename):
+        filenames.append(filename)
+        return readFile(region, filename)
+    Region.readFile = countingReadFile
+    try:
+        yield filenames
+    finally:
+        Region.readFile = readFile
+
+def compareContactBackends(filename, settings=None):
+    """
+    Solve with every contact backend on the same model, without writing
+    results files; metrics are written next to filename.
+    :return: dict of backend name to dict of PARITY_VALUE_NAMES to value
+    """
+    settings = getSettings(settings)
+    context = ZincContext('parity')
+    model = FemurModel(context.createRegion(), filename)
+    values = {}
+    for backend in CONTACT_BACKENDS:
+        backendSettings = dict(settings)
+        backendSettings.update({ 'contactBackend': backend, 'writeResults': False })
+        filenameOut = os.path.splitext(filename)[0] + '_parity_' + backend + '.exf'
+        results = solveFemurModel(model, filenameOut, backendSettings, PhaseMonitor())
+        values[backend] = dict((name, results[name]) for name in PARITY_VALUE_NAMES)
+    return values
+
+def checkSingleReads(rows):
+    """
+    :return: list of (elementsCountAround, elementsCountUp, fileReads, readPhases)
+    for sizes where any run did not read its input exactly once
+    """
+    return [_getSizeKey(row) + (row['fileReads'], row['readPhases']) for row in rows
+            if any(count != 1 for count in row['fileReads'] + row['readPhases'])]
+
+def checkBackendParity(rows, tolerance=1.0E-6):
+    """
+    :param tolerance: allowed difference relative to the first backend's value
+    :return: list of (elementsCountAround, elementsCountUp, backend, name, firstValue, value)
+    for values differing from the first backend's by more than tolerance
+    """
+    mismatches = []
+    for row in rows:
+        backendValues = row.get('backendValues')
+        if not backendValues:
+            continue
+        firstValues = backendValues[CONTACT_BACKENDS[0]]
+        for backend in CONTACT_BACKENDS[1:]:
+            for name in PARITY_VALUE_NAMES:
+                firstValue = firstValues[name]
+                value = backendValues[backend][name]
+                if abs(value - firstValue) > tolerance*abs(firstValue):
+                    mismatches.append(_getSizeKey(row) + (backend, name, firstValue, value))
+    return mismatches
+
+def runScalingBenchmark(sizes, settings=None, repeats=1, parity=False, workDir=None):
+    """
+    Generate a synthetic mesh of each size and run loadfemur on it, keeping
+    the fastest time of each phase over repeats.
+    :param sizes: list of (elementsCountAround, elementsCountUp)
+    :param parity: if True also record backendValues of force and stress fit
+    objective with each contact backend
+    :param workDir: directory for meshes and outputs, default a temporary one
+    :return: list of dicts with elementsCountAround, elementsCountUp, nodes,
+    elements, force, phases dict of name to time, totalTime, and fileReads
+    and readPhases lists of the number of calls to Region.readFile and of
+    'read' phases in each run
+    """
+    removeWorkDir = workDir is None
+    if removeWorkDir:
+        workDir = tempfile.mkdtemp(prefix='loadfemur_scaling')
+    context = ZincContext('benchmark')
+    loggernotifier = createLoggernotifier(context)
+    rows = []
+    try:
+        for elementsCountAround, elementsCountUp in sizes:
+            stem = 'femur_%dx%d' % (elementsCountAround, elementsCountUp)
+            filenameIn = os.path.join(workDir, stem + '.exf')
+            filenameOut = os.path.join(workDir, stem + '_results.exf')
+            nodesCount, elementsCount = writeFemurLikeMesh(filenameIn, elementsCountAround, elementsCountUp)
+            phases = {}
+            fileReads = []
+            readPhases = []
+            for repeat in range(repeats):
+                with countingFileReads() as filenamesRead:
+                    results = loadfemur(filenameIn, filenameOut, settings, context=context)
+                fileReads.append(len(filenamesRead))
+                readPhases.append(sum(1 for phase in results['metrics']['phases'] if phase['name'] == 'read'))
+                for phase in results['metrics']['phases']:
+                    name = phase['name']
+                    phases[name] = min(phases.get(name, phase['time']), phase['time'])
+            row = {
+                'elementsCountAround': elementsCountAround,
+                'elementsCountUp': elementsCountUp,
+                'nodes': nodesCount,
+                'elements': elementsCount,
+                'force': results['force'],
+                'phases': phases,
+                'totalTime': sum(phases.values()),
+                'fileReads': fileReads,
+                'readPhases': readPhases,
+            }
+            if parity:
+                row['backendValues'] = compareContactBackends(filenameIn, settings)
+            rows.append(row)
+    finally:
+        del loggernotifier
+        if removeWorkDir:
+            shutil.rmtree(workDir, ignore_errors=True)
+    return rows
+
+def _getSizeKey(row):
+    return row['elementsCountAround'], row['elementsCountUp']
+
+def compareToBaseline(rows, baselineRows, tolerance=0.25):
+    """
+    :param tolerance: allowed fractional increase in each phase time
+    :return: list of (elementsCountAround, elementsCountUp, phase, baselineTime, time)
+    for phases slower than baseline by more than tolerance
+    """
+    baselineBySize = dict((_getSizeKey(row), row) for row in baselineRows)
+    regressions = []
+    for row in rows:
+        baselineRow = baselineBySize.get(_getSizeKey(row))
+        if baselineRow is None:
+            continue
+        for name, time in sorted(row['phases'].items()):
+            baselineTime = baselineRow['phases'].get(name)
+            if baselineTime is None:
+                continue
+            if (time > baselineTime*(1.0 + tolerance)) and ((time - baselineTime) > MINIMUM_TIME_DIFFERENCE):
+                regressions.append(_getSizeKey(row) + (name, baselineTime, time))
+    return regressions
+
+def print_rows(rows, stream=sys.stdout):
+    names = []
+    for row in rows:
+        names += [name for name in row['phases'] if name not in names]
+    stream.write('%9s  %8s  %8s' % ('size', 'nodes', 'elements') + ''.join('  %9s' % name for name in names) + '  %9s\n' % 'total')
+    for row in rows:
+        stream.write('%9s  %8d  %8d' % ('%dx%d' % _getSizeKey(row), row['nodes'], row['elements'])
+            + ''.join('  %9.3f' % row['phases'][name] if name in row['phases'] else '  %9s' % '' for name in names)
+            + '  %9.3f\n' % row['totalTime'])
+        for name in (PARITY_VALUE_NAMES if 'backendValues' in row else []):
+            stream.write('    %s by contact backend: ' % name + ', '.join('%s %.12g' % (backend, row['backendValues'][backend][name])
+                for backend in CONTACT_BACKENDS) + '\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time loadfemur phases on synthetic femur-like meshes of increasing size.')
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help='mesh sizes as AROUNDxUP element counts')
+    parser.add_argument('--repeats', type=int, default=1, help='runs per size, keeping the fastest time of each phase')
+    parser.add_argument('--settings', default=None, help='JSON file of solver settings')
+    parser.add_argument('--parity', action='store_true', help='also compare force and objective from each contact backend')
+    parser.add_argument('--parity-tolerance', type=float, default=1.0E-6, help='allowed relative difference between backends')
+    parser.add_argument('--output', default=None, help='JSON file to save results to')
+    parser.add_argument('--baseline', default=None, help='JSON file of earlier results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed fractional slowdown of each phase')
+    args = parser.parse_args(argv)
+    settings = None
+    if args.settings:
+        with open(args.settings) as stream:
+            settings = json.load(stream)
+    rows = runScalingBenchmark([parseSize(size) for size in args.sizes], settings, args.repeats, args.parity)
+    print_rows(rows)
+    failed = False
+    for elementsCountAround, elementsCountUp, fileReads, readPhases in checkSingleReads(rows):
+        sys.stdout.write('READS %dx%d: input read %s times in %s read phases\n' % (elementsCountAround, elementsCountUp,
+            fileReads, readPhases))
+        failed = True
+    mismatches = checkBackendParity(rows, args.parity_tolerance)
+    for elementsCountAround, elementsCountUp, backend, name, firstValue, value in mismatches:
+        sys.stdout.write('MISMATCH %dx%d %s %s: %.12g, %s %.12g\n' % (elementsCountAround, elementsCountUp, backend, name,
+            value, CONTACT_BACKENDS[0], firstValue))
+        failed = True
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump({ 'settings': getSettings(settings), 'rows': rows }, outfile, sort_keys=True, indent=4)
+    if args.baseline:
+        with open(args.baseline) as stream:
+            baselineRows = json.load(stream)['rows']
+        regressions = compareToBaseline(rows, baselineRows, args.tolerance)
+        for elementsCountAround, elementsCountUp, name, baselineTime, time in regressions:
+            sys.stdout.write('REGRESSION %dx%d %s: %.3f s -> %.3f s\n' % (elementsCountAround, elementsCountUp, name, baselineTime, time))
+        if regressions:
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Compare time and residual of the stress fit solvers on femur meshes.
+
+Usage: python -m mapclientplugins.loadfemurstep.benchmark.stresssolvers mesh1.exf [mesh2.exf ...]
+    [--residuals 1e-2 1e-4 1e-6]
+
+With --residuals also compares the time and conjugate gradient iterations
+to reach each relative residual starting from the multilevel coarse fit
+and from zero, as a single-level fit.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import argparse
+import json
+import sys
+import timeit
+
+import numpy
+from opencmiss.zinc.context import Context as ZincContext
+from mapclientplugins.loadfemurstep.loadfemur import FemurModel, STRESS_SOLVERS, createPlateContact, \
+    createStressField, fitStress, getSettings
+
+def benchmarkStressSolvers(filenames, settings=None, solvers=STRESS_SOLVERS):
+    """
+    Fit stress with each solver on each mesh, loading each mesh once.
+    Solver times include any one-off extraction they need from the mesh.
+    :return: list of dicts with file, nodes, elements, solver, time, objective
+    """
+    settings = getSettings(settings)
+    context = ZincContext('benchmark')
+    rows = []
+    for filename in filenames:
+        model = FemurModel(context.createRegion(), filename)
+        plateCentre = model.getPlateCentre(settings['plateOffset'])
+        plateContact = createPlateContact(model, plateCentre, settings)
+        for solver in solvers:
+            stress = createStressField(model.fm, model.mesh, model.nodes, model.coordinates, name='stress_' + solver)
+            solverSettings = dict(settings)
+            solverSettings['stressSolver'] = solver
+            startTime = timeit.default_timer()
+            objective = fitStress(model, stress, plateContact, plateCentre, solverSettings)
+            rows.append({
+                'file': filename,
+                'nodes': model.nodes.getSize(),
+                'elements': model.mesh.getSize(),
+                'solver': solver,
+                'time': timeit.default_timer() - startTime,
+                'objective': objective,
+            })
+    return rows
+
+def benchmarkResiduals(filenames, residuals, settings=None, maximumIterations=1000):
+    """
+    Time refinement to each relative residual from the multilevel coarse
+    fit and from zero on each mesh. Times exclude the one-off assembly and
+    factorisation.
+    :param residuals: list of relative residuals to reach
+    :return: list of dicts with file, nodes, residual, start 'coarse' or
+    'zero', iterations, time, reached
+    """
+    settings = getSettings(settings)
+    context = ZincContext('benchmark')
+    rows = []
+    for filename in filenames:
+        model = FemurModel(context.createRegion(), filename)
+        plateCentre = model.getPlateCentre(settings['plateOffset'])
+        quadrature = model.getSurfaceQuadrature(settings['numberOfPoints'])
+        up = numpy.array(model.up)
+        pointPenetrations = numpy.maximum(numpy.dot(plateCentre, up) - quadrature.getPointHeights(up), 0.0)
+        multilevelStressFit = model.getMultilevelStressFit(settings['numberOfPoints'], settings['multilevelRowStep'])
+        for residual in residuals:
+            for start in ('zero', 'coarse'):
+                startTime = timeit.default_timer()
+                multilevelStressFit.solve(pointPenetrations, maximumIterations, residual, coarseStart=(start == 'coarse'))
+                rows.append({
+                    'file': filename,
+                    'nodes': model.nodes.getSize(),
+                    'residual': residual,
+                    'start': start,
+                    'iterations': multilevelStressFit.iterations,
+                    'time': timeit.default_timer() - startTime,
+                    'reached': multilevelStressFit.residuals[-1] <= residual,
+                })
+    return rows
+
+def print_residual_rows(rows, stream=sys.stdout):
+    stream.write('%8s  %10s  %-6s  %10s  %10s\n' % ('nodes', 'residual', 'start', 'iterations', 'time/s'))
+    for row in rows:
+        stream.write('%8d  %10.2g  %-6s  %10d  %10.4f%s\n' % (row['nodes'], row['residual'], row['start'],
+            row['iterations'], row['time'], '' if row['reached'] else '  not reached'))
+
+def print_rows(rows, stream=sys.stdout):
+    stream.write('%8s  %8s  %-10s  %10s  %16s\n' % ('nodes', 'elements', 'solver', 'time/s', 'objective'))
+    for row in rows:
+        stream.write('%8d  %8d  %-10s  %10.3f  %16.8g\n' % (row['nodes'], row['elements'], row['solver'], row['time'], row['objective']))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare stress fit solvers on femur meshes of several sizes.')
+    parser.add_argument('filenames', nargs='+', help='EX files of femur surface meshes')
+    parser.add_argument('--settings', default=None, help='JSON file of solver settings')
+    parser.add_argument('--residuals', nargs='+', type=float, default=None,
+                        help='relative residuals to time multilevel and single-level refinement to')
+    args = parser.parse_args(argv)
+    settings = None
+    if args.settings:
+        with open(args.settings) as stream:
+            settings = json.load(stream)
+    print_rows(benchmarkStressSolvers(args.filenames, settings))
+    if args.residuals:
+        print_residual_rows(benchmarkResiduals(args.filenames, args.residuals, settings))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
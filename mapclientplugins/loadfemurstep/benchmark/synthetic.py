@@ -0,0 +1,139 @@
+"""
+Synthetic femur-like surface meshes of any size.
+
+Generates an apex-capped tube of bicubic Hermite elements with the node
+ordering loadfemur expects: node 1 at the apex, then rings of
+elementsCountAround nodes from the apex end, so getNodeIdentifiersInRow
+and getElementsCountAround work as for segmented femurs.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import math
+
+from opencmiss.zinc.context import Context as ZincContext
+from opencmiss.zinc.element import Element, Elementbasis, Elementfieldtemplate
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.node import Node
+
+def _createApexElementfieldtemplate(mesh, basis):
+    """
+    Bicubic Hermite element field template collapsed at xi2 = 0 onto local
+    node 1, the apex. Around the apex d/dxi1 is zero and d/dxi2 at each
+    collapsed corner points towards the ring node on its side, using scale
+    factors cos(angle), sin(angle) on the apex node's d/ds1 and d/ds2 for
+    the corner at xi1 = 0, then the same for the corner at xi1 = 1, so
+    neighbouring elements share their edges from the apex.
+    """
+    eft = mesh.createElementfieldtemplate(basis)
+    eft.setNumberOfLocalNodes(3)
+    eft.setNumberOfLocalScaleFactors(4)
+    for s in range(1, 5):
+        eft.setScaleFactorType(s, Elementfieldtemplate.SCALE_FACTOR_TYPE_ELEMENT_GENERAL)
+    # functions 1-8 are for the two collapsed apex corners
+    for fn in (1, 5):
+        eft.setTermNodeParameter(fn, 1, 1, Node.VALUE_LABEL_VALUE, 1)
+    for fn in (2, 4, 6, 8):
+        eft.setFunctionNumberOfTerms(fn, 0)
+    for fn, firstScaleFactor in ((3, 1), (7, 3)):
+        eft.setFunctionNumberOfTerms(fn, 2)
+        eft.setTermNodeParameter(fn, 1, 1, Node.VALUE_LABEL_D_DS1, 1)
+        eft.setTermScaling(fn, 1, [firstScaleFactor])
+        eft.setTermNodeParameter(fn, 2, 1, Node.VALUE_LABEL_D_DS2, 1)
+        eft.setTermScaling(fn, 2, [firstScaleFactor + 1])
+    # functions 9-16 are for local nodes 3 and 4 of the uncollapsed element
+    valueLabels = [Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2]
+    for fn in range(9, 17):
+        eft.setTermNodeParameter(fn, 1, (fn - 1)//4, valueLabels[(fn - 1) % 4], 1)
+    return eft
+
+def generateFemurLikeMesh(region, elementsCountAround, elementsCountUp, radius=15.0, length=200.0):
+    """
+    Create coordinates, nodes and elements of a capped tube in region.
+    :param elementsCountAround: elements around each ring, at least 3
+    :param elementsCountUp: rows of elements including the apex row, at least 2
+    :param radius: tube radius
+    :param length: distance from apex to last ring
+    :return: (nodesCount, elementsCount)
+    """
+    fm = region.getFieldmodule()
+    fm.beginChange()
+    coordinates = fm.createFieldFiniteElement(3)
+    coordinates.setName('coordinates')
+    coordinates.setManaged(True)
+    coordinates.setTypeCoordinate(True)
+    coordinates.setCoordinateSystemType(Field.COORDINATE_SYSTEM_TYPE_RECTANGULAR_CARTESIAN)
+    for c, name in enumerate(['x', 'y', 'z']):
+        coordinates.setComponentName(c + 1, name)
+
+    nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+    nodetemplate = nodes.createNodetemplate()
+    nodetemplate.defineField(coordinates)
+    for valueLabel in (Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2):
+        nodetemplate.setValueNumberOfVersions(coordinates, -1, valueLabel, 1)
+    cache = fm.createFieldcache()
+    elementLength = length/elementsCountUp
+    # apex node; d/ds1, d/ds2 are combined by the apex elements' scale factors
+    node = nodes.createNode(1, nodetemplate)
+    cache.setNode(node)
+    coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_VALUE, 1, [0.0, 0.0, 0.0])
+    coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS1, 1, [radius, 0.0, 0.0])
+    coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS2, 1, [0.0, radius, 0.0])
+    coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_D2_DS1DS2, 1, [0.0, 0.0, 0.0])
+    angleStep = 2.0*math.pi/elementsCountAround
+    nodeIdentifier = 2
+    for ring in range(1, elementsCountUp + 1):
+        z = ring*elementLength
+        for n in range(elementsCountAround):
+            angle = n*angleStep
+            cosAngle = math.cos(angle)
+            sinAngle = math.sin(angle)
+            node = nodes.createNode(nodeIdentifier, nodetemplate)
+            cache.setNode(node)
+            coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_VALUE, 1, [radius*cosAngle, radius*sinAngle, z])
+            coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS1, 1, [-radius*angleStep*sinAngle, radius*angleStep*cosAngle, 0.0])
+            coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS2, 1, [0.0, 0.0, elementLength])
+            coordinates.setNodeParameters(cache, -1, Node.VALUE_LABEL_D2_DS1DS2, 1, [0.0, 0.0, 0.0])
+            nodeIdentifier += 1
+
+    mesh = fm.findMeshByDimension(2)
+    basis = fm.createElementbasis(2, Elementbasis.FUNCTION_TYPE_CUBIC_HERMITE)
+    eft = mesh.createElementfieldtemplate(basis)
+    elementtemplate = mesh.createElementtemplate()
+    elementtemplate.setElementShapeType(Element.SHAPE_TYPE_SQUARE)
+    elementtemplate.defineField(coordinates, -1, eft)
+    apexEft = _createApexElementfieldtemplate(mesh, basis)
+    apexElementtemplate = mesh.createElementtemplate()
+    apexElementtemplate.setElementShapeType(Element.SHAPE_TYPE_SQUARE)
+    apexElementtemplate.defineField(coordinates, -1, apexEft)
+    elementIdentifier = 1
+    for n in range(elementsCountAround):
+        element = mesh.createElement(elementIdentifier, apexElementtemplate)
+        element.setNodesByIdentifier(apexEft, [1, 2 + n, 2 + (n + 1) % elementsCountAround])
+        angle1 = n*angleStep
+        angle2 = (n + 1)*angleStep
+        element.setScaleFactors(apexEft, [math.cos(angle1), math.sin(angle1), math.cos(angle2), math.sin(angle2)])
+        elementIdentifier += 1
+    for row in range(1, elementsCountUp):
+        firstNodeIdentifier = 2 + (row - 1)*elementsCountAround
+        for n in range(elementsCountAround):
+            bottom1 = firstNodeIdentifier + n
+            bottom2 = firstNodeIdentifier + (n + 1) % elementsCountAround
+            element = mesh.createElement(elementIdentifier, elementtemplate)
+            element.setNodesByIdentifier(eft, [bottom1, bottom2, bottom1 + elementsCountAround, bottom2 + elementsCountAround])
+            elementIdentifier += 1
+    fm.endChange()
+    return nodes.getSize(), mesh.getSize()
+
+def writeFemurLikeMesh(filename, elementsCountAround, elementsCountUp, radius=15.0, length=200.0):
+    """
+    Generate a capped tube mesh and write it to an EX file.
+    :return: (nodesCount, elementsCount)
+    """
+    context = ZincContext('synthetic')
+    region = context.getDefaultRegion()
+    counts = generateFemurLikeMesh(region, elementsCountAround, elementsCountUp, radius, length)
+    region.writeFile(filename)
+    return counts
@@ -0,0 +1,121 @@
+"""
+Check that warm started stress fits give the same stress as cold starts
+over a sequence of plate offsets, including with contact culling, where
+stress outside the fit stencil must stay zero.
+
+Usage: python -m mapclientplugins.loadfemurstep.benchmark.warmstartcheck
+    [--size 16x8] [--offsets 0.05 0.02 -0.5 0.05] [--iterations 10] [--tolerance 1e-4]
+
+Exits with status 1 if any warm started stress differs from the cold
+started stress by more than the tolerance relative to its largest value,
+or with culling is not zero where the cold stress is zero, or if no fit is
+actually warm started both with and without culling.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy
+from opencmiss.zinc.context import Context as ZincContext
+from mapclientplugins.loadfemurstep.loadfemur import FemurModel, createLoggernotifier, getLoadCases, getSettings, \
+    solveFemurModel
+from mapclientplugins.loadfemurstep.phases import PhaseMonitor
+from mapclientplugins.loadfemurstep.warmstart import WarmStartStore
+from mapclientplugins.loadfemurstep.benchmark.scaling import parseSize
+from mapclientplugins.loadfemurstep.benchmark.synthetic import writeFemurLikeMesh
+
+DEFAULT_OFFSETS = [0.05, 0.02, -0.5, 0.05]
+
+def solveStress(model, filenameOut, settings, warmStartStore=None):
+    """
+    :return: (float array (dofsCount, 3) of fitted stress nodal parameters of
+    the first load case, True if it was warm started)
+    """
+    monitor = PhaseMonitor()
+    solveFemurModel(model, filenameOut, settings, monitor, warmStartStore)
+    name = getLoadCases(settings)[0][0]
+    return model.getHermiteMesh().readDofValues(model.fm, model.fm.findFieldByName(name).castFiniteElement()), \
+        monitor.getMetrics()['warmStarted']
+
+def checkWarmStarts(size, plateOffsets, settings=None, tolerance=1.0E-4, workDir=None):
+    """
+    Fit stress at each plate offset in turn with warm starts, and again
+    from cold, with and without contact culling.
+    :param size: (elementsCountAround, elementsCountUp) of synthetic mesh
+    :param tolerance: allowed difference relative to the largest cold stress
+    :return: list of dicts of 'cullContact', 'plateOffset', 'warmStarted',
+    'difference' relative difference, 'nonZeroOutside' count of stress
+    parameters non-zero where cold stress is zero with culling, and 'ok'
+    """
+    removeWorkDir = workDir is None
+    if removeWorkDir:
+        workDir = tempfile.mkdtemp(prefix='loadfemur_warmstart')
+    context = ZincContext('warmstartcheck')
+    loggernotifier = createLoggernotifier(context)
+    rows = []
+    try:
+        filenameIn = os.path.join(workDir, 'femur.exf')
+        filenameOut = os.path.join(workDir, 'femur_results.exf')
+        writeFemurLikeMesh(filenameIn, *size)
+        model = FemurModel(context.createRegion(), filenameIn)
+        for cullContact in (False, True):
+            warmStartStore = WarmStartStore(os.path.join(workDir, 'warmstart_%s' % cullContact))
+            for plateOffset in plateOffsets:
+                caseSettings = getSettings(settings)
+                caseSettings.update({ 'stressSolver': 'optimiser', 'cullContact': cullContact,
+                    'plateOffset': plateOffset, 'writeResults': False })
+                caseSettings['warmStart'] = False
+                coldStress, coldStarted = solveStress(model, filenameOut, caseSettings)
+                caseSettings['warmStart'] = True
+                warmStress, warmStarted = solveStress(model, filenameOut, caseSettings, warmStartStore)
+                scale = numpy.max(numpy.abs(coldStress))
+                difference = numpy.max(numpy.abs(warmStress - coldStress))
+                if scale > 0.0:
+                    difference /= scale
+                # with culling stress outside the fit stencil is exactly zero
+                nonZeroOutside = int(numpy.count_nonzero(warmStress[coldStress == 0.0])) if cullContact else 0
+                rows.append({ 'cullContact': cullContact, 'plateOffset': plateOffset, 'warmStarted': warmStarted,
+                    'difference': float(difference),
+                    'nonZeroOutside': nonZeroOutside, 'ok': (difference <= tolerance) and (nonZeroOutside == 0) })
+    finally:
+        del loggernotifier
+        if removeWorkDir:
+            shutil.rmtree(workDir, ignore_errors=True)
+    return rows
+
+def isWarmStartCovered(rows):
+    """
+    :return: True if some fit was warm started both with and without culling,
+    so the rows test warm starts at all
+    """
+    return all(any(row['warmStarted'] for row in rows if row['cullContact'] == cullContact) for cullContact in (False, True))
+
+def print_rows(rows, stream=sys.stdout):
+    stream.write('%11s  %12s  %11s  %12s  %14s\n' % ('cullContact', 'plateOffset', 'warmStarted', 'difference', 'nonZeroOutside'))
+    for row in rows:
+        stream.write('%11s  %12g  %11s  %12.3e  %14d  %s\n' % (row['cullContact'], row['plateOffset'], row['warmStarted'], row['difference'],
+            row['nonZeroOutside'], 'ok' if row['ok'] else 'FAIL'))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check warm started stress fits match cold starts over several plate offsets.')
+    parser.add_argument('--size', default='16x8', help='synthetic mesh size as AROUNDxUP element counts')
+    parser.add_argument('--offsets', nargs='+', type=float, default=DEFAULT_OFFSETS, help='plate offsets solved in turn')
+    parser.add_argument('--iterations', type=int, default=10, help='maximum optimiser iterations')
+    parser.add_argument('--tolerance', type=float, default=1.0E-4, help='allowed difference relative to the largest stress')
+    args = parser.parse_args(argv)
+    rows = checkWarmStarts(parseSize(args.size), args.offsets, { 'maximumIterations': args.iterations }, args.tolerance)
+    print_rows(rows)
+    if not isWarmStartCovered(rows):
+        sys.stdout.write('NOT COVERED: no fit was warm started both with and without culling\n')
+        return 1
+    return 0 if all(row['ok'] for row in rows) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
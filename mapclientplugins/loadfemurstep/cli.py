@@ -0,0 +1,196 @@
+"""
+Headless batch processing of femur meshes across a process pool.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import timeit
+import traceback
+
+from opencmiss.zinc.context import Context as ZincContext
+from mapclientplugins.loadfemurstep.loadfemur import loadfemur, write_simpleviz_script, createLoggernotifier
+from mapclientplugins.loadfemurstep.logutils import LOG_LEVELS, configureLogging, flushRateLimits
+from mapclientplugins.loadfemurstep.warmstart import WarmStartStore
+
+log = logging.getLogger(__name__)
+
+SUMMARY_FILENAME = 'summary.csv'
+LOG_FILENAME = 'loadfemur.log'
+
+# per worker process Zinc context, logger notifier and log buffer
+_workerContext = None
+_workerLoggernotifier = None
+_workerLogBuffer = None
+
+def _initialiseWorker(logLevel='warning', logBufferCapacity=0, logBufferLevel='info'):
+    global _workerContext, _workerLoggernotifier, _workerLogBuffer
+    _workerLogBuffer = configureLogging(logLevel, logBufferCapacity, logBufferLevel)
+    _workerContext = ZincContext('loadfemur')
+    _workerLoggernotifier = createLoggernotifier(_workerContext)
+
+def _processFile(task):
+    """
+    Run loadfemur on one file in the worker's context, catching all errors
+    so one bad file does not stop the batch. Any buffered log of the run is
+    written to LOG_FILENAME in its output directory.
+    :param task: tuple (filenameIn, outputDir, settings, warmStartDir or None)
+    :return: dict of file, status, force, plateOffset, runtime, error
+    """
+    filenameIn, outputDir, settings, warmStartDir = task
+    startTime = timeit.default_timer()
+    summary = { 'file': filenameIn, 'status': 'ok', 'force': None, 'plateOffset': None, 'runtime': None, 'error': '' }
+    try:
+        if not os.path.isdir(outputDir):
+            os.makedirs(outputDir)
+        filenameOut = os.path.join(outputDir, 'results.exfile')
+        warmStartStore = WarmStartStore(warmStartDir) if warmStartDir else None
+        results = loadfemur(filenameIn, filenameOut, settings, context=_workerContext, warmStartStore=warmStartStore)
+        if results['sidecarFilename'] and (filenameOut not in results['outputFilenames']):
+            write_simpleviz_script(os.path.join(outputDir, 'simpleviz.py'), filenameIn, results['sidecarFilename'])
+        else:
+            write_simpleviz_script(os.path.join(outputDir, 'simpleviz.py'), filenameOut)
+        summary['force'] = results['force']
+        summary['plateOffset'] = results['plateOffset']
+    except Exception:
+        summary['status'] = 'failed'
+        summary['error'] = traceback.format_exc().strip().splitlines()[-1]
+        log.error('%s failed', filenameIn, exc_info=True)
+    summary['runtime'] = timeit.default_timer() - startTime
+    flushRateLimits()
+    if _workerLogBuffer is not None:
+        if os.path.isdir(outputDir):
+            _workerLogBuffer.write_log(os.path.join(outputDir, LOG_FILENAME))
+        _workerLogBuffer.clear()
+    return summary
+
+def findInputFiles(inputs):
+    """
+    :param inputs: list of directories, files or glob patterns
+    :return: sorted list of EX file names
+    """
+    filenames = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for extension in ('*.ex', '*.exf', '*.exfile'):
+                filenames.update(glob.glob(os.path.join(pattern, extension)))
+        else:
+            filenames.update(glob.glob(pattern))
+    return sorted(filenames)
+
+def _splitPath(path):
+    """
+    :return: list of directory and file names in path
+    """
+    head, tail = os.path.split(path)
+    if head == path:
+        return [head]
+    return _splitPath(head) + [tail] if tail else _splitPath(head)
+
+def getOutputDirs(outputRoot, filenames):
+    """
+    Name each input file's output directory by its path from the deepest
+    directory common to all inputs, without extension, so inputs with the
+    same base name in different directories get their own. Inputs which
+    would still share a directory, differing only in extension, have a
+    short hash of their path appended.
+    :return: list of output directories for filenames
+    """
+    paths = [_splitPath(os.path.splitdrive(os.path.abspath(filename))[1]) for filename in filenames]
+    commonCount = len(os.path.commonprefix([path[:-1] for path in paths]))
+    names = [os.path.join(*(path[commonCount:-1] + [os.path.splitext(path[-1])[0]])) for path in paths]
+    outputDirs = []
+    for filename, name in zip(filenames, names):
+        if names.count(name) > 1:
+            name += '_' + hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()[:8]
+        outputDirs.append(os.path.join(outputRoot, name))
+    return outputDirs
+
+def processFiles(filenames, outputRoot, settings=None, workers=None, warmStartDir=None,
+                 logLevel='warning', logBufferCapacity=0, logBufferLevel='info'):
+    """
+    Run loadfemur on all files across a pool of worker processes, each with
+    its own Zinc context.
+    :param workers: number of worker processes, default CPU count
+    :param warmStartDir: optional directory of stress solutions for the warmStart setting
+    :param logLevel: name of level in LOG_LEVELS shown by workers
+    :param logBufferCapacity: latest log records of each file written to its output directory, 0 for none
+    :param logBufferLevel: name of lowest level in LOG_LEVELS of log records written
+    :return: list of per-file summary dicts in input order
+    """
+    tasks = [(filename, outputDir, settings, warmStartDir)
+             for filename, outputDir in zip(filenames, getOutputDirs(outputRoot, filenames))]
+    if workers == 1:
+        _initialiseWorker(logLevel, logBufferCapacity, logBufferLevel)
+        return [_processFile(task) for task in tasks]
+    pool = multiprocessing.Pool(workers, initializer=_initialiseWorker, initargs=(logLevel, logBufferCapacity, logBufferLevel))
+    try:
+        return pool.map(_processFile, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def write_summary_csv(filename, summaries):
+    if sys.version_info[0] < 3:
+        outfile = open(filename, 'wb')
+    else:
+        outfile = open(filename, 'w', newline='')
+    with outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(['file', 'status', 'force', 'plateOffset', 'runtime', 'error'])
+        for summary in summaries:
+            writer.writerow([summary['file'], summary['status'],
+                '' if summary['force'] is None else '%.12g' % summary['force'],
+                '' if summary['plateOffset'] is None else '%.12g' % summary['plateOffset'],
+                '%.3f' % summary['runtime'], summary['error']])
+
+def print_summary_table(summaries, stream=sys.stdout):
+    width = max([len(os.path.basename(summary['file'])) for summary in summaries] + [4])
+    stream.write('%-*s  %-6s  %16s  %10s\n' % (width, 'file', 'status', 'force', 'runtime/s'))
+    for summary in summaries:
+        force = '' if summary['force'] is None else '%.8g' % summary['force']
+        stream.write('%-*s  %-6s  %16s  %10.3f\n' % (width, os.path.basename(summary['file']), summary['status'], force, summary['runtime']))
+        if summary['error']:
+            stream.write('    ' + summary['error'] + '\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load femur surface meshes against a plate and fit stress, without the MAP Client.')
+    parser.add_argument('inputs', nargs='+', help='EX files, directories of EX files or glob patterns')
+    parser.add_argument('-o', '--output', default='loadfemur_output', help='root directory for per-file outputs')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes, default CPU count')
+    parser.add_argument('--settings', default=None, help='JSON file of solver settings')
+    parser.add_argument('--warm-start-dir', default=None, help='directory of stress solutions to warm start fits from with the warmStart setting')
+    parser.add_argument('--log-level', choices=list(LOG_LEVELS), default='warning', help='lowest level of messages shown')
+    parser.add_argument('--log-buffer', type=int, default=0,
+        help='number of latest messages of each file written to ' + LOG_FILENAME + ' in its output directory')
+    parser.add_argument('--log-buffer-level', choices=list(LOG_LEVELS), default='info', help='lowest level of messages written to ' + LOG_FILENAME)
+    args = parser.parse_args(argv)
+
+    filenames = findInputFiles(args.inputs)
+    if not filenames:
+        parser.error('no input files found')
+    settings = None
+    if args.settings:
+        with open(args.settings) as stream:
+            settings = json.load(stream)
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    summaries = processFiles(filenames, args.output, settings, args.workers, args.warm_start_dir,
+                             args.log_level, args.log_buffer, args.log_buffer_level)
+    write_summary_csv(os.path.join(args.output, SUMMARY_FILENAME), summaries)
+    print_summary_table(summaries)
+    failedCount = sum(1 for summary in summaries if summary['status'] != 'ok')
+    return 1 if failedCount else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
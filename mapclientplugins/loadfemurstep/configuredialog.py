@@ -27,11 +27,31 @@ class ConfigureDialog(QtGui.QDialog):
         # Set a place holder for a callable that will get set from the step.
         # We will use this method to decide whether the identifier is unique.
         self.identifierOccursCount = None
+        # Set a place holder for a callable that will get set from the step.
+        # We will use this method to clear the step's result cache.
+        self.clearResultCache = None
 
         self._makeConnections()
 
     def _makeConnections(self):
         self._ui.lineEdit0.textChanged.connect(self.validate)
+        self._ui.lineEditLoadCaseAngles.textChanged.connect(self.validate)
+        self._ui.checkBoxUseResultCache.toggled.connect(self._ui.spinBoxResultCacheSize.setEnabled)
+        self._ui.pushButtonClearResultCache.clicked.connect(self._clearResultCacheClicked)
+        self._ui.checkBoxUseService.toggled.connect(self._ui.spinBoxServicePort.setEnabled)
+
+    def _getLoadCaseAngles(self):
+        '''
+        :return: list of load case angles entered, or None if not all are numbers
+        '''
+        try:
+            return [float(angle) for angle in self._ui.lineEditLoadCaseAngles.text().replace(',', ' ').split()]
+        except ValueError:
+            return None
+
+    def _clearResultCacheClicked(self):
+        if self.clearResultCache is not None:
+            self.clearResultCache()
 
     def accept(self):
         '''
@@ -62,7 +82,10 @@ class ConfigureDialog(QtGui.QDialog):
         else:
             self._ui.lineEdit0.setStyleSheet(INVALID_STYLE_SHEET)
 
-        return valid
+        anglesValid = self._getLoadCaseAngles() is not None
+        self._ui.lineEditLoadCaseAngles.setStyleSheet(DEFAULT_STYLE_SHEET if anglesValid else INVALID_STYLE_SHEET)
+
+        return valid and anglesValid
 
     def getConfig(self):
         '''
@@ -73,6 +96,23 @@ class ConfigureDialog(QtGui.QDialog):
         self._previousIdentifier = self._ui.lineEdit0.text()
         config = {}
         config['identifier'] = self._ui.lineEdit0.text()
+        config['useResultCache'] = self._ui.checkBoxUseResultCache.isChecked()
+        config['resultCacheSize'] = self._ui.spinBoxResultCacheSize.value()
+        config['sweepSamples'] = self._ui.spinBoxSweepSamples.value()
+        config['sweepStart'] = self._ui.doubleSpinBoxSweepStart.value()
+        config['sweepStop'] = self._ui.doubleSpinBoxSweepStop.value()
+        config['contactBackend'] = self._ui.comboBoxContactBackend.currentText()
+        config['stressSolver'] = self._ui.comboBoxStressSolver.currentText()
+        config['cullContact'] = self._ui.checkBoxCullContact.isChecked()
+        config['outputMode'] = self._ui.comboBoxOutputMode.currentText()
+        config['targetForce'] = self._ui.doubleSpinBoxTargetForce.value()
+        config['loadCaseAngles'] = self._getLoadCaseAngles() or []
+        config['useService'] = self._ui.checkBoxUseService.isChecked()
+        config['servicePort'] = self._ui.spinBoxServicePort.value()
+        config['warmStart'] = self._ui.checkBoxWarmStart.isChecked()
+        config['stressFitTolerance'] = self._ui.doubleSpinBoxStressFitTolerance.value()
+        config['writeResults'] = self._ui.checkBoxWriteResults.isChecked()
+        config['forceTolerance'] = self._ui.doubleSpinBoxForceTolerance.value()
         return config
 
     def setConfig(self, config):
@@ -83,4 +123,23 @@ class ConfigureDialog(QtGui.QDialog):
         '''
         self._previousIdentifier = config['identifier']
         self._ui.lineEdit0.setText(config['identifier'])
+        self._ui.checkBoxUseResultCache.setChecked(config['useResultCache'])
+        self._ui.spinBoxResultCacheSize.setValue(config['resultCacheSize'])
+        self._ui.spinBoxResultCacheSize.setEnabled(config['useResultCache'])
+        self._ui.spinBoxSweepSamples.setValue(config['sweepSamples'])
+        self._ui.doubleSpinBoxSweepStart.setValue(config['sweepStart'])
+        self._ui.doubleSpinBoxSweepStop.setValue(config['sweepStop'])
+        self._ui.comboBoxContactBackend.setCurrentIndex(self._ui.comboBoxContactBackend.findText(config['contactBackend']))
+        self._ui.comboBoxStressSolver.setCurrentIndex(self._ui.comboBoxStressSolver.findText(config['stressSolver']))
+        self._ui.checkBoxCullContact.setChecked(config['cullContact'])
+        self._ui.comboBoxOutputMode.setCurrentIndex(self._ui.comboBoxOutputMode.findText(config['outputMode']))
+        self._ui.doubleSpinBoxTargetForce.setValue(config['targetForce'])
+        self._ui.lineEditLoadCaseAngles.setText(', '.join('%g' % angle for angle in config['loadCaseAngles']))
+        self._ui.checkBoxUseService.setChecked(config['useService'])
+        self._ui.spinBoxServicePort.setValue(config['servicePort'])
+        self._ui.spinBoxServicePort.setEnabled(config['useService'])
+        self._ui.checkBoxWarmStart.setChecked(config['warmStart'])
+        self._ui.doubleSpinBoxStressFitTolerance.setValue(config['stressFitTolerance'])
+        self._ui.checkBoxWriteResults.setChecked(config['writeResults'])
+        self._ui.doubleSpinBoxForceTolerance.setValue(config['forceTolerance'])
 
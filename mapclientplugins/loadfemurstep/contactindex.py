@@ -0,0 +1,56 @@
+"""
+Index of element heights for culling elements which cannot touch the plate.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import numpy
+from mapclientplugins.loadfemurstep.hermitemesh import BICUBIC_HERMITE_FUNCTIONS_COUNT, getBicubicHermiteToBezierMatrix
+
+class ElementHeightIndex(object):
+    """
+    Bounds on the height along up of every element, from the convex hull
+    of its Bezier control points, sorted so the elements with any point
+    below a plate are found by binary search. Elements entirely at or
+    above the plate have zero penetration everywhere.
+    """
+
+    def __init__(self, hermiteMesh, dofValues, up):
+        """
+        :param hermiteMesh: HermiteMesh
+        :param dofValues: float array (dofsCount, 3) of coordinates nodal parameters
+        :param up: unit vector heights are measured along
+        """
+        self._hermiteMesh = hermiteMesh
+        elementHeights = numpy.dot(hermiteMesh.getElementParameters(dofValues), up)
+        controlHeights = numpy.dot(elementHeights, getBicubicHermiteToBezierMatrix().T)
+        self.minimumHeights = numpy.min(controlHeights, axis=1)
+        self.maximumHeights = numpy.max(controlHeights, axis=1)
+        self._order = numpy.argsort(self.minimumHeights, kind='stable')
+        self._sortedMinimumHeights = self.minimumHeights[self._order]
+
+    def getContactElementIndexes(self, plateHeight):
+        """
+        :return: sorted int array of indexes of elements which may be below plateHeight
+        """
+        count = numpy.searchsorted(self._sortedMinimumHeights, plateHeight, side='left')
+        return numpy.sort(self._order[:count])
+
+    def getFitStencil(self, elementIndexes):
+        """
+        Nodes whose stress parameters are affected by penetration of elements,
+        and the elements using them, outside which the stress fit is zero.
+        :param elementIndexes: int array of contact element indexes
+        :return: (int array of node identifiers, sorted int array of element indexes)
+        """
+        hermiteMesh = self._hermiteMesh
+        mapElements = hermiteMesh.mapRows // BICUBIC_HERMITE_FUNCTIONS_COUNT
+        inContact = numpy.zeros(hermiteMesh.getElementsCount(), dtype=bool)
+        inContact[elementIndexes] = True
+        freeDofs = numpy.zeros(hermiteMesh.getDofsCount(), dtype=bool)
+        freeDofs[hermiteMesh.mapColumns[inContact[mapElements]]] = True
+        nodeIdentifiers = numpy.unique(hermiteMesh.dofNodeIdentifiers[freeDofs])
+        fitElementIndexes = numpy.unique(mapElements[freeDofs[hermiteMesh.mapColumns]])
+        return nodeIdentifiers, fitElementIndexes
@@ -0,0 +1,304 @@
+"""
+NumPy representation of bicubic Hermite surface meshes.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import numpy
+from opencmiss.zinc.element import Elementbasis
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.node import Node
+
+BICUBIC_HERMITE_FUNCTIONS_COUNT = 16
+HERMITE_VALUE_LABELS = [ Node.VALUE_LABEL_VALUE, Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D2_DS1DS2 ]
+
+def cubicHermiteBasis(t):
+    """
+    1D cubic Hermite basis functions in order value 0, derivative 0,
+    value 1, derivative 1.
+    :param t: float array of xi values
+    :return: (basis, basis derivatives) each float array (len(t), 4)
+    """
+    t = numpy.asarray(t, dtype=float)
+    t2 = t*t
+    t3 = t2*t
+    basis = numpy.stack([1.0 - 3.0*t2 + 2.0*t3, t - 2.0*t2 + t3, 3.0*t2 - 2.0*t3, t3 - t2], axis=-1)
+    derivatives = numpy.stack([6.0*(t2 - t), 1.0 - 4.0*t + 3.0*t2, 6.0*(t - t2), 3.0*t2 - 2.0*t], axis=-1)
+    return basis, derivatives
+
+def bicubicHermiteBasis(xi):
+    """
+    Bicubic Hermite basis functions in Zinc order: local nodes with xi1
+    varying fastest, then value, d/dxi1, d/dxi2, d2/dxi1dxi2 per node.
+    :param xi: float array (pointsCount, 2)
+    :return: (basis, d/dxi1, d/dxi2) each float array (pointsCount, 16)
+    """
+    xi = numpy.asarray(xi, dtype=float)
+    b1, d1 = cubicHermiteBasis(xi[:, 0])
+    b2, d2 = cubicHermiteBasis(xi[:, 1])
+    basis = numpy.empty((len(xi), BICUBIC_HERMITE_FUNCTIONS_COUNT))
+    dxi1 = numpy.empty_like(basis)
+    dxi2 = numpy.empty_like(basis)
+    fn = 0
+    for n2 in range(2):
+        for n1 in range(2):
+            # value and derivative 1D functions for this node
+            v1, s1 = 2*n1, 2*n1 + 1
+            v2, s2 = 2*n2, 2*n2 + 1
+            for f1, f2 in ((v1, v2), (s1, v2), (v1, s2), (s1, s2)):
+                basis[:, fn] = b1[:, f1]*b2[:, f2]
+                dxi1[:, fn] = d1[:, f1]*b2[:, f2]
+                dxi2[:, fn] = b1[:, f1]*d2[:, f2]
+                fn += 1
+    return basis, dxi1, dxi2
+
+def getBicubicHermiteToBezierMatrix():
+    """
+    Matrix converting the 16 bicubic Hermite parameters of an element in
+    Zinc order into its 16 bicubic Bezier control points, xi1 varying
+    fastest. The surface lies in the convex hull of the control points.
+    :return: float array (16, 16)
+    """
+    # 1D Bezier control points from value 0, derivative 0, value 1, derivative 1
+    bezierFromHermite = numpy.array([
+        [1.0, 0.0, 0.0, 0.0],
+        [1.0, 1.0/3.0, 0.0, 0.0],
+        [0.0, 0.0, 1.0, -1.0/3.0],
+        [0.0, 0.0, 1.0, 0.0]])
+    matrix = numpy.empty((BICUBIC_HERMITE_FUNCTIONS_COUNT, BICUBIC_HERMITE_FUNCTIONS_COUNT))
+    fn = 0
+    for n2 in range(2):
+        for n1 in range(2):
+            v1, s1 = 2*n1, 2*n1 + 1
+            v2, s2 = 2*n2, 2*n2 + 1
+            for f1, f2 in ((v1, v2), (s1, v2), (v1, s2), (s1, s2)):
+                matrix[:, fn] = numpy.outer(bezierFromHermite[:, f2], bezierFromHermite[:, f1]).reshape(-1)
+                fn += 1
+    return matrix
+
+def getGaussPoints(numberOfPoints):
+    """
+    Tensor product Gauss-Legendre rule on the unit square.
+    :return: (xi float array (numberOfPoints**2, 2), weights float array (numberOfPoints**2))
+    """
+    points, weights = numpy.polynomial.legendre.leggauss(numberOfPoints)
+    points = 0.5*(points + 1.0)
+    weights = 0.5*weights
+    xi = numpy.array([[points[i1], points[i2]] for i2 in range(numberOfPoints) for i1 in range(numberOfPoints)])
+    return xi, numpy.outer(weights, weights).reshape(-1)
+
+class HermiteMesh(object):
+    """
+    Map from global nodal parameters to the 16 bicubic Hermite basis
+    function parameters of every element, including element field template
+    remapping and scale factors. Nodal parameters are identified by degree
+    of freedom (DOF) index.
+    """
+
+    def __init__(self, elementIdentifiers, dofNodeIdentifiers, dofValueLabels, dofVersions,
+                 mapRows, mapColumns, mapValues):
+        """
+        :param elementIdentifiers: int array (elementsCount)
+        :param dofNodeIdentifiers: int array (dofsCount) node of each DOF
+        :param dofValueLabels: int array (dofsCount) Node.VALUE_LABEL_* of each DOF
+        :param dofVersions: int array (dofsCount) version of each DOF
+        :param mapRows: int array of element*16 + function index
+        :param mapColumns: int array of DOF index
+        :param mapValues: float array of scaling for each row, column entry
+        """
+        self.elementIdentifiers = elementIdentifiers
+        self.dofNodeIdentifiers = dofNodeIdentifiers
+        self.dofValueLabels = dofValueLabels
+        self.dofVersions = dofVersions
+        self.mapRows = mapRows
+        self.mapColumns = mapColumns
+        self.mapValues = mapValues
+
+    def getElementsCount(self):
+        return len(self.elementIdentifiers)
+
+    def getDofsCount(self):
+        return len(self.dofNodeIdentifiers)
+
+    def getElementParameters(self, dofValues, elementIndexes=None):
+        """
+        :param dofValues: float array (dofsCount, componentsCount)
+        :param elementIndexes: optional int array of elements to get, default all
+        :return: float array (elementsCount, 16, componentsCount)
+        """
+        elementsCount = self.getElementsCount()
+        componentsCount = dofValues.shape[1]
+        rowsCount = elementsCount*BICUBIC_HERMITE_FUNCTIONS_COUNT
+        parameters = numpy.empty((rowsCount, componentsCount))
+        for c in range(componentsCount):
+            parameters[:, c] = numpy.bincount(self.mapRows, weights=self.mapValues*dofValues[self.mapColumns, c], minlength=rowsCount)
+        parameters = parameters.reshape((elementsCount, BICUBIC_HERMITE_FUNCTIONS_COUNT, componentsCount))
+        if elementIndexes is not None:
+            parameters = parameters[elementIndexes]
+        return parameters
+
+    def readDofValues(self, fm, field, componentsCount=3):
+        """
+        :param field: finite element field defined with the mesh's element field templates
+        :return: float array (dofsCount, componentsCount) of field nodal parameters
+        """
+        nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        cache = fm.createFieldcache()
+        dofValues = numpy.zeros((self.getDofsCount(), componentsCount))
+        lastNodeIdentifier = None
+        for d in range(self.getDofsCount()):
+            nodeIdentifier = int(self.dofNodeIdentifiers[d])
+            if nodeIdentifier != lastNodeIdentifier:
+                cache.setNode(nodes.findNodeByIdentifier(nodeIdentifier))
+                lastNodeIdentifier = nodeIdentifier
+            result, values = field.getNodeParameters(cache, -1, int(self.dofValueLabels[d]), int(self.dofVersions[d]), componentsCount)
+            dofValues[d] = values
+        return dofValues
+
+    def writeDofValues(self, fm, field, dofValues):
+        """
+        Set nodal parameters of field from dofValues, in a single change.
+        :param dofValues: float array (dofsCount, componentsCount)
+        """
+        nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        cache = fm.createFieldcache()
+        lastNodeIdentifier = None
+        fm.beginChange()
+        for d in range(self.getDofsCount()):
+            nodeIdentifier = int(self.dofNodeIdentifiers[d])
+            if nodeIdentifier != lastNodeIdentifier:
+                cache.setNode(nodes.findNodeByIdentifier(nodeIdentifier))
+                lastNodeIdentifier = nodeIdentifier
+            field.setNodeParameters(cache, -1, int(self.dofValueLabels[d]), int(self.dofVersions[d]), dofValues[d].tolist())
+        fm.endChange()
+
+class SurfaceQuadrature(object):
+    """
+    Gauss points of every element of a bicubic Hermite surface with their
+    coordinates and quadrature weights times area Jacobian.
+    """
+
+    def __init__(self, hermiteMesh, dofValues, numberOfPoints):
+        """
+        :param hermiteMesh: HermiteMesh
+        :param dofValues: float array (dofsCount, 3) of coordinates nodal parameters
+        :param numberOfPoints: Gauss points per element direction
+        """
+        self.numberOfPoints = numberOfPoints
+        elementParameters = hermiteMesh.getElementParameters(dofValues)
+        xi, weights = getGaussPoints(numberOfPoints)
+        self.xi = xi
+        self.basis, dxi1, dxi2 = bicubicHermiteBasis(xi)
+        # (elementsCount, pointsCount, 3)
+        self.points = numpy.einsum('qf,efc->eqc', self.basis, elementParameters)
+        dxdxi1 = numpy.einsum('qf,efc->eqc', dxi1, elementParameters)
+        dxdxi2 = numpy.einsum('qf,efc->eqc', dxi2, elementParameters)
+        jacobian = numpy.linalg.norm(numpy.cross(dxdxi1, dxdxi2), axis=2)
+        # (elementsCount, pointsCount)
+        self.areaWeights = jacobian*weights
+
+    def getPointHeights(self, up):
+        """
+        :return: float array (elementsCount, pointsCount) of point coordinates along up
+        """
+        return numpy.dot(self.points, up)
+
+def getEftTerms(eft):
+    """
+    :return: list over functions of list of terms (local node, value label, version, scale factor indexes)
+    """
+    basis = eft.getElementbasis()
+    if (basis.getNumberOfFunctions() != BICUBIC_HERMITE_FUNCTIONS_COUNT) or \
+            (basis.getFunctionType(1) != Elementbasis.FUNCTION_TYPE_CUBIC_HERMITE) or \
+            (basis.getFunctionType(2) != Elementbasis.FUNCTION_TYPE_CUBIC_HERMITE):
+        raise ValueError('HermiteMesh only supports bicubic Hermite elements')
+    scaleFactorsCount = eft.getNumberOfLocalScaleFactors()
+    functionTerms = []
+    for fn in range(1, BICUBIC_HERMITE_FUNCTIONS_COUNT + 1):
+        terms = []
+        for term in range(1, eft.getFunctionNumberOfTerms(fn) + 1):
+            scaleIndexes = []
+            if scaleFactorsCount > 0:
+                scaleIndexesCount, scaleIndexes = eft.getTermScaling(fn, term, scaleFactorsCount)
+                scaleIndexes = list(scaleIndexes)[:scaleIndexesCount]
+            terms.append((eft.getTermLocalNodeIndex(fn, term), eft.getTermNodeValueLabel(fn, term),
+                          eft.getTermNodeVersion(fn, term), scaleIndexes))
+        functionTerms.append(terms)
+    return functionTerms
+
+def buildHermiteMesh(elementIdentifiers, elementFunctionTerms, elementLocalNodeIdentifiers, elementScaleFactors):
+    """
+    Build the parameter map from per-element template terms, local nodes and
+    scale factors, from the arrays extracted from a Zinc mesh.
+    :param elementIdentifiers: sequence of element identifiers
+    :param elementFunctionTerms: per element, list over functions of list of
+    terms (local node, value label, version, scale factor indexes)
+    :param elementLocalNodeIdentifiers: per element, sequence of node identifiers
+    :param elementScaleFactors: per element, sequence of scale factor values
+    :return: HermiteMesh
+    """
+    dofIndexes = {}
+    dofKeys = []
+    mapRows = []
+    mapColumns = []
+    mapValues = []
+    for e in range(len(elementIdentifiers)):
+        localNodeIdentifiers = elementLocalNodeIdentifiers[e]
+        scaleFactors = elementScaleFactors[e]
+        for fn, terms in enumerate(elementFunctionTerms[e]):
+            for localNode, valueLabel, version, scaleIndexes in terms:
+                dofKey = (int(localNodeIdentifiers[localNode - 1]), valueLabel, version)
+                d = dofIndexes.get(dofKey)
+                if d is None:
+                    d = dofIndexes[dofKey] = len(dofKeys)
+                    dofKeys.append(dofKey)
+                scale = 1.0
+                for s in scaleIndexes:
+                    scale *= scaleFactors[s - 1]
+                mapRows.append(e*BICUBIC_HERMITE_FUNCTIONS_COUNT + fn)
+                mapColumns.append(d)
+                mapValues.append(scale)
+    # order DOFs by node so reading and writing visit each node once
+    dofKeyOrder = sorted(range(len(dofKeys)), key=lambda d: dofKeys[d])
+    dofRenumber = numpy.empty(len(dofKeys), dtype=numpy.int64)
+    dofRenumber[dofKeyOrder] = numpy.arange(len(dofKeys))
+    sortedDofKeys = numpy.array([dofKeys[d] for d in dofKeyOrder], dtype=numpy.int64).reshape((-1, 3))
+    return HermiteMesh(numpy.array(elementIdentifiers, dtype=numpy.int64),
+                       sortedDofKeys[:, 0], sortedDofKeys[:, 1], sortedDofKeys[:, 2],
+                       numpy.array(mapRows, dtype=numpy.int64), dofRenumber[numpy.array(mapColumns, dtype=numpy.int64)],
+                       numpy.array(mapValues, dtype=float))
+
+def extractHermiteMesh(mesh, coordinates):
+    """
+    Build the parameter map of all elements from the element field templates
+    of coordinates, in a single pass over the mesh.
+    :return: HermiteMesh
+    :raises ValueError: if any element is not bicubic Hermite
+    """
+    eftTerms = []
+    elementIdentifiers = []
+    elementFunctionTerms = []
+    elementLocalNodeIdentifiers = []
+    elementScaleFactors = []
+    elementiterator = mesh.createElementiterator()
+    element = elementiterator.next()
+    while element.isValid():
+        eft = element.getElementfieldtemplate(coordinates, -1)
+        if not eft.isValid():
+            raise ValueError('HermiteMesh requires coordinates to be defined on all elements')
+        functionTerms = None
+        for knownEft, knownFunctionTerms in eftTerms:
+            if knownEft == eft:
+                functionTerms = knownFunctionTerms
+                break
+        if functionTerms is None:
+            functionTerms = getEftTerms(eft)
+            eftTerms.append((eft, functionTerms))
+        elementIdentifiers.append(element.getIdentifier())
+        elementFunctionTerms.append(functionTerms)
+        elementLocalNodeIdentifiers.append([element.getNode(eft, ln).getIdentifier() for ln in range(1, eft.getNumberOfLocalNodes() + 1)])
+        elementScaleFactors.append([element.getScaleFactor(eft, s)[1] for s in range(1, eft.getNumberOfLocalScaleFactors() + 1)])
+        element = elementiterator.next()
+    return buildHermiteMesh(elementIdentifiers, elementFunctionTerms, elementLocalNodeIdentifiers, elementScaleFactors)
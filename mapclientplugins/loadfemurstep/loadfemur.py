@@ -6,14 +6,43 @@ License, v. 2.0. If a copy of the MPL was not distributed with this
 file, You can obtain one at http://mozilla.org/MPL/2.0/.
 """
 
+import contextlib
+import glob
+import logging
 import math
+import os
+import timeit
+
+import numpy
 from opencmiss.zinc.context import Context as ZincContext
-# from opencmiss.zinc.status import OK as ZINC_OK
+from opencmiss.zinc.status import OK as ZINC_OK
 # from opencmiss.zinc.element import Element, Elementbasis
 from opencmiss.zinc.field import Field, FieldFindMeshLocation
-from opencmiss.zinc.logger import Loggernotifier
-from opencmiss.zinc.node import Node
+from opencmiss.zinc.logger import Logger
 from opencmiss.zinc.optimisation import Optimisation
+from mapclientplugins.loadfemurstep.adaptivequadrature import AdaptiveContactQuadrature
+from mapclientplugins.loadfemurstep.contactindex import ElementHeightIndex
+from mapclientplugins.loadfemurstep.hermitemesh import extractHermiteMesh, SurfaceQuadrature
+from mapclientplugins.loadfemurstep.logutils import LOGGER_NAME, summarizeIdentifiers
+from mapclientplugins.loadfemurstep.meshtopology import extractMeshTopology
+from mapclientplugins.loadfemurstep.numpycontact import NumpyPlateContact
+from mapclientplugins.loadfemurstep.phases import LoadFemurCancelled, PhaseMonitor
+from mapclientplugins.loadfemurstep.settings import CONTACT_BACKENDS, DEFAULT_SETTINGS, OUTPUT_MODES, STRESS_SOLVERS, \
+    getSettings
+from mapclientplugins.loadfemurstep.stressfit import DirectStressFit, MultilevelStressFit, getRowProlongation
+from mapclientplugins.loadfemurstep.stresssidecar import createStressField, getStressSidecarFilename, loadStressSidecar, \
+    write_stress_sidecar
+from mapclientplugins.loadfemurstep.warmstart import WarmStart, getTopologySignature
+
+log = logging.getLogger(__name__)
+zincLog = logging.getLogger(LOGGER_NAME + '.zinc')
+
+# logging level of each Zinc logger message type
+ZINC_MESSAGE_LEVELS = {
+    Logger.MESSAGE_TYPE_ERROR: logging.ERROR,
+    Logger.MESSAGE_TYPE_WARNING: logging.WARNING,
+    Logger.MESSAGE_TYPE_INFORMATION: logging.INFO,
+}
 
 def vector_cross_product3(a, b):
     """
@@ -42,196 +71,949 @@ def vector_normalise(v):
     return [(v[i] / mag) for i in range(len(v))]
 
 def loggerCallback(loggerEvent):
-    print(loggerEvent.getMessageText())
-
-def getElementsCountAround(mesh, nodes, coordinates):
-    """
-    :return: elementsCountAround
-    """
-    apexNode = nodes.findNodeByIdentifier(1)
-    elementsCountAround = 0;
-    elementiterator = mesh.createElementiterator()
-    element = elementiterator.next()
-    while element.isValid():
-        eft = element.getElementfieldtemplate(coordinates, -1)
-        if eft.isValid():
-            nodeCount = eft.getNumberOfLocalNodes()
-            for n in range(1, nodeCount + 1):
-                node = element.getNode(eft, n)
-                if node == apexNode:
-                    elementsCountAround += 1
-                    break;
-        element = elementiterator.next()
-    return elementsCountAround
-
-def getNodeIdentifiersInRow(nodes, elementsCountAround, row):
-    """
-    :param: row starting at 0 for apex
-    :return: list of node identifiers in row
-    """
-    nodeIdentifiers = []
-    nodeiterator = nodes.createNodeiterator()
-    node = nodeiterator.next()
-    remainingnodesinrow = 1
-    currentRow = 0
-    while node.isValid():
-        if currentRow == row:
-            nodeIdentifiers.append(node.getIdentifier())
-        elif currentRow > row:
-            break
-        remainingnodesinrow -= 1
-        if remainingnodesinrow == 0:
-            currentRow += 1
-            remainingnodesinrow = elementsCountAround
-        node = nodeiterator.next()
-    return nodeIdentifiers
-
-def getMeanNodeCoordinates(fm, nodes, coordinates, nodeIdentifiers):
-    xMean = [ 0.0, 0.0, 0.0 ]
-    cache = fm.createFieldcache()
-    for nodeIdentifier in nodeIdentifiers:
-        node = nodes.findNodeByIdentifier(nodeIdentifier)
-        cache.setNode(node)
-        result, x = coordinates.evaluateReal(cache, 3)
-        for i in range(3):
-            xMean[i] += x[i]
-    count = len(nodeIdentifiers);
-    for i in range(3):
-        xMean[i] /= count
-    return xMean
-
-def loadfemur(filenameIn, filenameOut):
+    level = ZINC_MESSAGE_LEVELS.get(loggerEvent.getMessageType(), logging.INFO)
+    if zincLog.isEnabledFor(level):
+        # the text is the template so each distinct message has its own rate limit
+        zincLog.log(level, loggerEvent.getMessageText())
+
+def logNodeRow(row, nodeIdentifiers, centre):
     """
-    :param filenameIn:
-    :param filenameOut:
-    :return: None
+    Log the nodes of a row in full at debug level, or summarized at info level.
     """
-    context = ZincContext('loadfemur')
-    logger = context.getLogger()
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('row %d = %s, centre = %s', row, list(nodeIdentifiers), centre)
+    elif log.isEnabledFor(logging.INFO):
+        log.info('row %d = %s, centre = %s', row, summarizeIdentifiers(nodeIdentifiers), centre)
 
+def createLoggernotifier(context):
+    """
+    Log messages from the context's Zinc logger. Caller must keep the returned
+    notifier for as long as messages are wanted.
+    :return: Loggernotifier, or None if Zinc messages are not logged at any level
+    """
+    if not zincLog.isEnabledFor(logging.ERROR):
+        return None
+    logger = context.getLogger()
     ln = logger.createLoggernotifier()
     ln.setCallback(loggerCallback)
+    return ln
+
+@contextlib.contextmanager
+def loggingZincMessages(context):
+    """
+    Log messages from the context's Zinc logger within a with block.
+    :param context: Zinc context, or None when its messages are logged by the caller
+    """
+    loggernotifier = createLoggernotifier(context) if context is not None else None
+    try:
+        yield
+    finally:
+        if loggernotifier is not None:
+            loggernotifier.clearCallback()
+
+class FemurModel(object):
+    """
+    Femur surface mesh read into a region, with its topology and the axes
+    used to place the plate.
+    """
+
+    def __init__(self, region, filenameIn, monitor=None):
+        """
+        :param region: Zinc region to read into
+        :param filenameIn: name of EX file containing 2D mesh and coordinates
+        :param monitor: optional PhaseMonitor
+        """
+        if monitor is None:
+            monitor = PhaseMonitor()
+        self.region = region
+        with monitor.phase('read'):
+            region.readFile(filenameIn)
+        self.fm = region.getFieldmodule()
+        self.coordinates = self.fm.findFieldByName("coordinates").castFiniteElement()
+        self.mesh = self.fm.findMeshByDimension(2)
+        self.nodes = self.fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        with monitor.phase('topology'):
+            self.topology = extractMeshTopology(self.fm, self.mesh, self.nodes, self.coordinates)
+            self._calculateAxes()
+        self._plateMeshGroup = None
+        self._hermiteMesh = None
+        self._coordinatesDofValues = None
+        self._surfaceQuadratures = {}
+        self._elementHeightIndexes = {}
+        self._directStressFits = {}
+        self._multilevelStressFits = {}
+        self._stressFieldNames = []
+
+    def _calculateAxes(self):
+        topology = self.topology
+        elementsCountAround = topology.getElementsCountAround()
+        log.info('elementsCountAround %d', elementsCountAround)
+        row1 = 1
+        row2 = self.mesh.getSize() // elementsCountAround
+        if row1 == row2:
+            row1 = 0
+        nodeIdentifiersRow1 = topology.getNodeIdentifiersInRow(elementsCountAround, row1)
+        row1centre = topology.getMeanNodeCoordinates(nodeIdentifiersRow1)
+        logNodeRow(row1, nodeIdentifiersRow1, row1centre)
+        nodeIdentifiersRow2 = topology.getNodeIdentifiersInRow(elementsCountAround, row2)
+        row2centre = topology.getMeanNodeCoordinates(nodeIdentifiersRow2)
+        logNodeRow(row2, nodeIdentifiersRow2, row2centre)
+
+        bottomToTop = [(row2centre[i] - row1centre[i]) for i in range(3)]
+        up = vector_normalise(bottomToTop)
+        forwardPoint = topology.getMeanNodeCoordinates(nodeIdentifiersRow1[:1])
+        forward = [(forwardPoint[i] - row1centre[i]) for i in range(3)]
+        self.size = vector_magnitude(forward)
+        axis = vector_cross_product3(forward, up)
+        self.axis = vector_normalise(axis)
+        self.forward = vector_cross_product3(up, self.axis)
+        self.up = up
+        self.row1centre = row1centre
+        self.bottomToTop = bottomToTop
+
+    def getPlateCentre(self, plateOffset):
+        """
+        :param plateOffset: offset from row 1 centre as a fraction of the row 1 to top distance
+        :return: plate centre coordinates as a list
+        """
+        return [(self.row1centre[i] + plateOffset*self.bottomToTop[i]) for i in range(3)]
+
+    def getTiltedPlateOrientation(self, tiltAngle):
+        """
+        :param tiltAngle: angle in degrees to tilt the plate about axis
+        :return: (up, forward) plate unit normal and in-plane direction as lists
+        """
+        cosAngle = math.cos(math.radians(tiltAngle))
+        sinAngle = math.sin(math.radians(tiltAngle))
+        up = [(self.up[i]*cosAngle - self.forward[i]*sinAngle) for i in range(3)]
+        forward = [(self.forward[i]*cosAngle + self.up[i]*sinAngle) for i in range(3)]
+        return up, forward
+
+    def getPlateMeshGroup(self):
+        """
+        Get the group "plate", creating it on first call.
+        :return: MeshGroup
+        """
+        if self._plateMeshGroup is None:
+            # create a single element plate mesh by just using xi coordinates of element 1
+            plateGroup = self.fm.createFieldElementGroup(self.mesh)
+            plateGroup.setName("plate")
+            plateGroup.setManaged(True)
+            self._plateMeshGroup = plateGroup.getMeshGroup()
+            element1 = self.mesh.findElementByIdentifier(1)
+            self._plateMeshGroup.addElement(element1)
+        return self._plateMeshGroup
+
+    def getHermiteMesh(self):
+        """
+        :return: HermiteMesh of coordinates, extracted on first call
+        """
+        if self._hermiteMesh is None:
+            self._hermiteMesh = extractHermiteMesh(self.mesh, self.coordinates)
+        return self._hermiteMesh
+
+    def getCoordinatesDofValues(self):
+        """
+        :return: float array (dofsCount, 3) of coordinates nodal parameters
+        """
+        if self._coordinatesDofValues is None:
+            self._coordinatesDofValues = self.getHermiteMesh().readDofValues(self.fm, self.coordinates)
+        return self._coordinatesDofValues
+
+    def getSurfaceQuadrature(self, numberOfPoints):
+        """
+        :return: SurfaceQuadrature of coordinates, computed on first call for numberOfPoints
+        """
+        quadrature = self._surfaceQuadratures.get(numberOfPoints)
+        if quadrature is None:
+            quadrature = SurfaceQuadrature(self.getHermiteMesh(), self.getCoordinatesDofValues(), numberOfPoints)
+            self._surfaceQuadratures[numberOfPoints] = quadrature
+        return quadrature
+
+    def getElementHeightIndex(self, up):
+        """
+        :return: ElementHeightIndex of coordinates along up, computed on first call for up
+        """
+        key = tuple(up)
+        heightIndex = self._elementHeightIndexes.get(key)
+        if heightIndex is None:
+            heightIndex = ElementHeightIndex(self.getHermiteMesh(), self.getCoordinatesDofValues(), up)
+            self._elementHeightIndexes[key] = heightIndex
+        return heightIndex
+
+    def getDirectStressFit(self, numberOfPoints):
+        """
+        :return: DirectStressFit with factorised mass matrix, built on first call for numberOfPoints
+        """
+        directStressFit = self._directStressFits.get(numberOfPoints)
+        if directStressFit is None:
+            directStressFit = DirectStressFit(self.getHermiteMesh(), self.getSurfaceQuadrature(numberOfPoints))
+            self._directStressFits[numberOfPoints] = directStressFit
+        return directStressFit
 
-    region = context.getDefaultRegion()
-
-    region.readFile(filenameIn)
-    fm = region.getFieldmodule()
-    # define 3-component 'stress' field identically to coordinates
-    stress = fm.findFieldByName("coordinates")
-    stress.setName("stress")
-    stress.setTypeCoordinate(False)
-    region.readFile(filenameIn)
-    coordinates = fm.findFieldByName("coordinates")
-
-    mesh = fm.findMeshByDimension(2)
-    nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
-    elementsCountAround = getElementsCountAround(mesh, nodes, coordinates)
-    print('elementsCountAround',elementsCountAround)
-    row1 = 1
-    row2 = mesh.getSize() // elementsCountAround
-    if row1 == row2:
-        row1 = 0
-    nodeIdentifiersRow1 = getNodeIdentifiersInRow(nodes, elementsCountAround, row1)
-    row1centre = getMeanNodeCoordinates(fm, nodes, coordinates, nodeIdentifiersRow1)
-    print('row', row1, '=', nodeIdentifiersRow1,', centre =', row1centre)
-    nodeIdentifiersRow2 = getNodeIdentifiersInRow(nodes, elementsCountAround, row2)
-    row2centre = getMeanNodeCoordinates(fm, nodes, coordinates, nodeIdentifiersRow2)
-    print('row', row2, '=', nodeIdentifiersRow2,', centre =', row2centre)
-
-    bottomToTop = [(row2centre[i] - row1centre[i]) for i in range(3)]
-    up = vector_normalise(bottomToTop)
-    forwardPoint = getMeanNodeCoordinates(fm, nodes, coordinates, nodeIdentifiersRow1[:1])
-    forward = [(forwardPoint[i] - row1centre[i]) for i in range(3)]
-    size = vector_magnitude(forward)
-    axis = vector_cross_product3(forward, up)
-    axis = vector_normalise(axis)
-    forward = vector_cross_product3(up, axis)
-
-    # create a single element plate mesh by just using xi coordinates of element 1
-    plateGroup = fm.createFieldElementGroup(mesh)
-    plateGroup.setName("plate")
-    plateMeshGroup = plateGroup.getMeshGroup()
-    element1 = mesh.findElementByIdentifier(1)
-    plateMeshGroup.addElement(element1)
-    plate_size = 10.0*size
-    minus05 = fm.createFieldConstant([-0.5,-0.5,0.0])
-    xi = fm.findFieldByName("xi")
-    xiMinus05 = fm.createFieldAdd(xi, minus05)
-    plateTransform = fm.createFieldConstant(axis + forward + [0.0, 0.0, 0.0])
-    plateTransCoordinates = fm.createFieldMatrixMultiply(1, xiMinus05, plateTransform)
-    plateCentre = [(row1centre[i] + 0.05*bottomToTop[i]) for i in range(3)]
-    constPlateCentre = fm.createFieldConstant(plateCentre)
-    plateCoordinates = fm.createFieldAdd(constPlateCentre, plateTransCoordinates)
-
-    findXi = fm.createFieldFindMeshLocation(coordinates, plateCoordinates, plateMeshGroup)
-    findXi.setSearchMode(FieldFindMeshLocation.SEARCH_MODE_NEAREST)
-
-    projectedCoordinates = fm.createFieldEmbedded(plateCoordinates, findXi)
-    # down = [-up[i] for i in range(3)]
-    constUp = fm.createFieldConstant(up)
-    projectionVector = fm.createFieldSubtract(projectedCoordinates, coordinates)
-    negativeProjectionDistance = fm.createFieldDotProduct(projectionVector, constUp)
-    constZero = fm.createFieldConstant([0.0])
-    negativeProjectionDistanceIsPositive = fm.createFieldGreaterThan(negativeProjectionDistance, constZero)
-    penetration = fm.createFieldIf(negativeProjectionDistanceIsPositive, negativeProjectionDistance, constZero)
-
-    force = fm.createFieldMeshIntegral(penetration, coordinates, mesh)
-    force.setNumbersOfPoints(4)
-
-    cache = fm.createFieldcache()
-
-    result, forceValue = force.evaluateReal(cache, 1)
-
-    print("forceValue ", result, forceValue)
-
-    # for oi in range(-20, 10):
-    #     plateCentre = [(bottomCentre[i] - (oi*0.2)*bottomToTop[i]) for i in range(3)]
-    #     constPlateCentre.assignReal(cache, plateCentre)
-    #     result, dist = negativeProjectionDistance.evaluateReal(cache, 1)
-    #     result, pen = penetration.evaluateReal(cache, 1)
-    #     result, coord = coordinates.evaluateReal(cache, 3)
-    #     result, projCoord = projectedCoordinates.evaluateReal(cache, 3)
-    #     result, forceValue = force.evaluateReal(cache, 1)
-    #     print(str(oi) + ". plateCentre " + str(plateCentre) + ":  forceValue = " + str(forceValue) + " dist = " + str(dist) + " pen = " + str(pen))
-    #     print("   coord = " + str(coord) + " projCoord = " + str(projCoord))
-
-    # clear 'stress'
-    stress = stress.castFiniteElement()
-    nodeIter = nodes.createNodeiterator()
-    node = nodeIter.next()
-    zeroVector3 = [0.0, 0.0, 0.0]
-    while node.isValid():
-        cache.setNode(node)
-        stress.setNodeParameters(cache, -1, Node.VALUE_LABEL_VALUE, 1, zeroVector3)
-        stress.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS1, 1, zeroVector3)
-        stress.setNodeParameters(cache, -1, Node.VALUE_LABEL_D_DS2, 1, zeroVector3)
-        stress.setNodeParameters(cache, -1, Node.VALUE_LABEL_D2_DS1DS2, 1, zeroVector3)
-        node = nodeIter.next()
+    def getRingNodeIdentifiers(self):
+        """
+        :return: list of node identifier lists of each ring from row 1, excluding the apex
+        """
+        elementsCountAround = self.topology.getElementsCountAround()
+        ringsCount = self.mesh.getSize() // elementsCountAround
+        return [self.topology.getNodeIdentifiersInRow(elementsCountAround, row) for row in range(1, ringsCount + 1)]
+
+    def getMultilevelStressFit(self, numberOfPoints, rowStep):
+        """
+        :return: MultilevelStressFit with factorised coarse system, built on first call for numberOfPoints, rowStep
+        """
+        key = (numberOfPoints, rowStep)
+        multilevelStressFit = self._multilevelStressFits.get(key)
+        if multilevelStressFit is None:
+            hermiteMesh = self.getHermiteMesh()
+            prolongation = getRowProlongation(hermiteMesh, self.getRingNodeIdentifiers(), rowStep)
+            multilevelStressFit = MultilevelStressFit(hermiteMesh, self.getSurfaceQuadrature(numberOfPoints), prolongation)
+            self._multilevelStressFits[key] = multilevelStressFit
+        return multilevelStressFit
+
+    def createStressField(self, name):
+        """
+        Define a zero stress field like coordinates, recording its name so it
+        can be released before the model is solved again.
+        :return: the new finite element field
+        """
+        self._stressFieldNames.append(name)
+        return createStressField(self.fm, self.mesh, self.nodes, self.coordinates, name)
+
+    def releaseStressFields(self):
+        """
+        Unmanage stress fields from an earlier solve so they are destroyed
+        once no longer referenced, freeing their names and leaving them out
+        of later output.
+        """
+        for name in self._stressFieldNames:
+            field = self.fm.findFieldByName(name)
+            if field.isValid():
+                field.setManaged(False)
+        self._stressFieldNames = []
+
+    def setMeshGroupElements(self, meshGroup, elementIndexes):
+        """
+        Make meshGroup contain only the elements at elementIndexes in the HermiteMesh.
+        """
+        elementIdentifiers = self.getHermiteMesh().elementIdentifiers
+        self.fm.beginChange()
+        meshGroup.removeAllElements()
+        for index in elementIndexes:
+            meshGroup.addElement(self.mesh.findElementByIdentifier(int(elementIdentifiers[index])))
+        self.fm.endChange()
+
+    def setNodesetGroupNodes(self, nodesetGroup, nodeIdentifiers):
+        """
+        Make nodesetGroup contain only the nodes with nodeIdentifiers.
+        """
+        self.fm.beginChange()
+        nodesetGroup.removeAllNodes()
+        for nodeIdentifier in nodeIdentifiers:
+            nodesetGroup.addNode(self.nodes.findNodeByIdentifier(int(nodeIdentifier)))
+        self.fm.endChange()
+
+class PlateContact(object):
+    """
+    Field graph for the penetration of the femur surface through a rigid
+    planar plate and the resulting contact force. The graph and its field
+    cache are built once; the plate is moved by reassigning its centre and
+    tilted by reassigning its normal and transform. With contact culling, force and maximum penetration are evaluated only
+    over the elements and nodes which can be below the plate, updated
+    whenever the plate moves.
+    With a force tolerance the force is a hybrid: Zinc integrates elements
+    entirely below the plate with the Gauss rule, while elements the plate
+    boundary crosses are integrated in NumPy with the same per-cell adaptive
+    refinement as NumpyPlateContact. Contact area, maximum penetration and
+    the stress fit still use the Zinc fields.
+    """
+
+    def __init__(self, model, plateCentre, numberOfPoints, cullContact=False, forceTolerance=0.0, forceRefinementLevels=0,
+                 forceEvaluationBudget=0):
+        """
+        :param model: FemurModel
+        :param plateCentre: initial plate centre coordinates
+        :param numberOfPoints: Gauss points per element direction for force
+        :param cullContact: if True integrate only over elements which can touch the plate
+        :param forceTolerance: relative estimated error of force, or 0 for the fixed rule
+        :param forceRefinementLevels: maximum times a crossed element is split with a force tolerance
+        :param forceEvaluationBudget: maximum points refining each crossed element as a multiple
+        of the fixed rule, or 0 for no limit
+        """
+        self._model = model
+        self._numberOfPoints = numberOfPoints
+        self._forceTolerance = forceTolerance
+        # points evaluated and estimated error of the last force evaluation
+        self.forceEvaluations = 0
+        self.forceErrorEstimate = None
+        self.up = list(model.up)
+        self._plateCentre = list(plateCentre)
+        fm = model.fm
+        mesh = model.mesh
+        coordinates = model.coordinates
+        plateMeshGroup = model.getPlateMeshGroup()
+        plate_size = 10.0*model.size
+        minus05 = fm.createFieldConstant([-0.5,-0.5,0.0])
+        xi = fm.findFieldByName("xi")
+        xiMinus05 = fm.createFieldAdd(xi, minus05)
+        self._plateTransform = fm.createFieldConstant(model.axis + model.forward + [0.0, 0.0, 0.0])
+        plateTransCoordinates = fm.createFieldMatrixMultiply(1, xiMinus05, self._plateTransform)
+        self._constPlateCentre = fm.createFieldConstant(plateCentre)
+        plateCoordinates = fm.createFieldAdd(self._constPlateCentre, plateTransCoordinates)
+
+        findXi = fm.createFieldFindMeshLocation(coordinates, plateCoordinates, plateMeshGroup)
+        findXi.setSearchMode(FieldFindMeshLocation.SEARCH_MODE_NEAREST)
+
+        projectedCoordinates = fm.createFieldEmbedded(plateCoordinates, findXi)
+        # down = [-up[i] for i in range(3)]
+        self._constUp = fm.createFieldConstant(model.up)
+        projectionVector = fm.createFieldSubtract(projectedCoordinates, coordinates)
+        negativeProjectionDistance = fm.createFieldDotProduct(projectionVector, self._constUp)
+        constZero = fm.createFieldConstant([0.0])
+        negativeProjectionDistanceIsPositive = fm.createFieldGreaterThan(negativeProjectionDistance, constZero)
+        self.penetration = fm.createFieldIf(negativeProjectionDistanceIsPositive, negativeProjectionDistance, constZero)
+
+        self._heightIndex = None
+        integrationMesh = mesh
+        maximumNodes = model.nodes
+        if cullContact:
+            self._heightIndex = model.getElementHeightIndex(self.up)
+            self._nodeHeights = numpy.dot(model.topology.nodeCoordinates, self.up)
+            self._contactElementGroup = fm.createFieldElementGroup(mesh)
+            integrationMesh = self._contactMeshGroup = self._contactElementGroup.getMeshGroup()
+            self._contactNodeGroup = fm.createFieldNodeGroup(model.nodes)
+            maximumNodes = self._contactNodesetGroup = self._contactNodeGroup.getNodesetGroup()
+        self.force = fm.createFieldMeshIntegral(self.penetration, coordinates, integrationMesh)
+        self.force.setNumbersOfPoints(numberOfPoints)
+        self.contactArea = fm.createFieldMeshIntegral(negativeProjectionDistanceIsPositive, coordinates, integrationMesh)
+        self.contactArea.setNumbersOfPoints(numberOfPoints)
+        self.maximumPenetration = fm.createFieldNodesetMaximum(self.penetration, maximumNodes)
+
+        self._adaptiveHeightIndex = None
+        if forceTolerance > 0.0:
+            self._adaptiveHeightIndex = model.getElementHeightIndex(self.up)
+            self._interiorElementGroup = fm.createFieldElementGroup(mesh)
+            self._interiorMeshGroup = self._interiorElementGroup.getMeshGroup()
+            self._interiorForce = fm.createFieldMeshIntegral(self.penetration, coordinates, self._interiorMeshGroup)
+            self._interiorForce.setNumbersOfPoints(numberOfPoints)
+            self._crossingElementIndexes = None
+            self._adaptiveQuadrature = AdaptiveContactQuadrature(model.getHermiteMesh(), model.getCoordinatesDofValues(),
+                numberOfPoints, forceRefinementLevels, forceEvaluationBudget)
+
+        self.cache = fm.createFieldcache()
+        if cullContact:
+            self._updateContactGroups(plateCentre)
+        if forceTolerance > 0.0:
+            self._updateAdaptiveGroups(plateCentre)
+
+    def _updateContactGroups(self, plateCentre):
+        plateHeight = numpy.dot(plateCentre, self.up)
+        self._model.setMeshGroupElements(self._contactMeshGroup, self._heightIndex.getContactElementIndexes(plateHeight))
+        nodeIdentifiers = self._model.topology.nodeIdentifiers[self._nodeHeights < plateHeight]
+        self._model.setNodesetGroupNodes(self._contactNodesetGroup, nodeIdentifiers)
+
+    def _updateAdaptiveGroups(self, plateCentre):
+        plateHeight = numpy.dot(plateCentre, self.up)
+        elementIndexes = self._adaptiveHeightIndex.getContactElementIndexes(plateHeight)
+        crossing = self._adaptiveHeightIndex.maximumHeights[elementIndexes] > plateHeight
+        self._model.setMeshGroupElements(self._interiorMeshGroup, elementIndexes[~crossing])
+        self._crossingElementIndexes = elementIndexes[crossing]
+
+    def setPlateCentre(self, plateCentre):
+        """
+        Move plate to centre without rebuilding the field graph.
+        """
+        self._plateCentre = list(plateCentre)
+        self._constPlateCentre.assignReal(self.cache, self._plateCentre)
+        if self._heightIndex is not None:
+            self._updateContactGroups(plateCentre)
+        if self._adaptiveHeightIndex is not None:
+            self._updateAdaptiveGroups(plateCentre)
+
+    def setPlateOrientation(self, up, forward):
+        """
+        Turn plate about its centre to unit normal up and unit in-plane
+        direction forward without rebuilding the field graph.
+        """
+        self.up = list(up)
+        axis = vector_cross_product3(forward, up)
+        self._plateTransform.assignReal(self.cache, axis + list(forward) + [0.0, 0.0, 0.0])
+        self._constUp.assignReal(self.cache, self.up)
+        if self._heightIndex is not None:
+            self._heightIndex = self._model.getElementHeightIndex(self.up)
+            self._nodeHeights = numpy.dot(self._model.topology.nodeCoordinates, self.up)
+            self._updateContactGroups(self._plateCentre)
+        if self._adaptiveHeightIndex is not None:
+            self._adaptiveHeightIndex = self._model.getElementHeightIndex(self.up)
+            self._updateAdaptiveGroups(self._plateCentre)
+
+    def evaluateForce(self):
+        """
+        :return: contact force for the current plate centre
+        """
+        if self._adaptiveHeightIndex is not None:
+            return self._evaluateAdaptiveForce()
+        pointsCount = self._numberOfPoints*self._numberOfPoints
+        if self._heightIndex is not None:
+            self.forceEvaluations = self._contactMeshGroup.getSize()*pointsCount
+            if self.forceEvaluations == 0:
+                return 0.0
+        else:
+            self.forceEvaluations = self._model.mesh.getSize()*pointsCount
+        result, forceValue = self.force.evaluateReal(self.cache, 1)
+        return forceValue
+
+    def _evaluateAdaptiveForce(self):
+        """
+        :return: contact force with crossed elements refined until within tolerance
+        """
+        interiorCount = self._interiorMeshGroup.getSize()
+        self.forceEvaluations = interiorCount*self._numberOfPoints*self._numberOfPoints
+        self.forceErrorEstimate = None
+        interiorForce = 0.0
+        if interiorCount > 0:
+            result, interiorForce = self._interiorForce.evaluateReal(self.cache, 1)
+        if len(self._crossingElementIndexes) == 0:
+            return interiorForce
+        # the plate is planar so penetration is the distance below it, as integrated by the numpy backend
+        plateHeight = numpy.dot(self._plateCentre, self.up)
+        coarseValues = self._adaptiveQuadrature.integrateElements(self.up, plateHeight, self._crossingElementIndexes)
+        self.forceEvaluations += coarseValues.size*self._numberOfPoints*self._numberOfPoints
+        tolerance = self._forceTolerance*(interiorForce + float(numpy.sum(coarseValues)))
+        crossingForce, self.forceErrorEstimate, evaluations = self._adaptiveQuadrature.integratePenetration(
+            self.up, plateHeight, self._crossingElementIndexes, tolerance, coarseValues)
+        self.forceEvaluations += evaluations
+        return interiorForce + crossingForce
+
+    def evaluateContactArea(self):
+        """
+        :return: area of surface below the plate for the current plate centre
+        """
+        if (self._heightIndex is not None) and (self._contactMeshGroup.getSize() == 0):
+            return 0.0
+        result, areaValue = self.contactArea.evaluateReal(self.cache, 1)
+        return areaValue
+
+    def evaluateMaximumPenetration(self):
+        """
+        :return: maximum nodal penetration for the current plate centre
+        """
+        if (self._heightIndex is not None) and (self._contactNodesetGroup.getSize() == 0):
+            return 0.0
+        result, penetrationValue = self.maximumPenetration.evaluateReal(self.cache, 1)
+        return penetrationValue
+
+def createPlateContact(model, plateCentre, settings):
+    """
+    :param settings: complete settings dict; 'contactBackend' chooses the implementation
+    :return: PlateContact or NumpyPlateContact
+    """
+    if settings['contactBackend'] == 'numpy':
+        return NumpyPlateContact(model, plateCentre, settings['numberOfPoints'], settings['cullContact'],
+            settings['forceTolerance'], settings['forceRefinementLevels'], settings['forceEvaluationBudget'])
+    return PlateContact(model, plateCentre, settings['numberOfPoints'], settings['cullContact'],
+        settings['forceTolerance'], settings['forceRefinementLevels'], settings['forceEvaluationBudget'])
+
+def getSweepPlateOffsets(settings):
+    """
+    :return: array of plate offsets to sweep, empty if sweep is off
+    """
+    return numpy.linspace(settings['sweepStart'], settings['sweepStop'], settings['sweepSamples'])
 
+def sweepPlateOffsets(model, plateContact, plateOffsets):
+    """
+    Evaluate force and maximum penetration for each plate offset, reusing
+    the field graph and field cache of plateContact.
+    :param plateOffsets: sequence of offsets as fractions of row 1 to top distance
+    :return: float array (len(plateOffsets), 3) of offset, force, maximum penetration
+    """
+    samples = numpy.empty((len(plateOffsets), 3))
+    for n, plateOffset in enumerate(plateOffsets):
+        plateContact.setPlateCentre(model.getPlateCentre(plateOffset))
+        samples[n] = [plateOffset, plateContact.evaluateForce(), plateContact.evaluateMaximumPenetration()]
+    return samples
+
+def solvePlateOffsetForForce(model, plateContact, targetForce, plateOffset, tolerance=1.0E-6, maximumEvaluations=30):
+    """
+    Find the plate offset at which the contact force equals targetForce by
+    Newton's method, reusing the field graph and field cache of plateContact.
+    The derivative of force with offset is the contact area times the
+    component of the row 1 to top vector normal to the plate. Steps are safeguarded by bisection once the solution is
+    bracketed, and the plate is stepped up with doubling steps while there
+    is no contact.
+    :param targetForce: positive force to reach
+    :param plateOffset: initial offset as a fraction of row 1 to top distance
+    :param tolerance: relative tolerance on force
+    :return: (plateOffset, force, evaluations, converged, residual) where if
+    not converged plateOffset and force are those evaluated closest to
+    targetForce, and residual is their force error relative to targetForce.
+    The plate is left at plateOffset.
+    """
+    length = sum(model.bottomToTop[i]*plateContact.up[i] for i in range(3))
+    lowerOffset = None
+    upperOffset = None
+    expandStep = 0.05
+    bestOffset = None
+    bestError = None
+    for evaluation in range(1, maximumEvaluations + 1):
+        plateContact.setPlateCentre(model.getPlateCentre(plateOffset))
+        force = plateContact.evaluateForce()
+        error = force - targetForce
+        if abs(error) <= tolerance*targetForce:
+            return plateOffset, force, evaluation, True, error/targetForce
+        if (bestError is None) or (abs(error) < abs(bestError)):
+            bestOffset = plateOffset
+            bestError = error
+        if error < 0.0:
+            lowerOffset = plateOffset
+        else:
+            upperOffset = plateOffset
+        slope = plateContact.evaluateContactArea()*length
+        nextOffset = (plateOffset - error/slope) if (slope > 0.0) else None
+        if (lowerOffset is not None) and (upperOffset is not None):
+            if (upperOffset - lowerOffset) <= 1.0E-12*max(abs(upperOffset), 1.0):
+                break
+            if (nextOffset is None) or (nextOffset <= lowerOffset) or (nextOffset >= upperOffset):
+                nextOffset = 0.5*(lowerOffset + upperOffset)
+        elif nextOffset is None:
+            # no contact: force is below target
+            nextOffset = plateOffset + expandStep
+            expandStep *= 2.0
+        plateOffset = nextOffset
+    if bestOffset != plateOffset:
+        # re-evaluate so the plate contact is left at the offset returned
+        plateContact.setPlateCentre(model.getPlateCentre(bestOffset))
+        plateContact.evaluateForce()
+    return bestOffset, targetForce + bestError, evaluation, False, bestError/targetForce
+
+def loadfemursweep(filenameIn, plateOffsets, settings=None):
+    """
+    Sweep the plate along the femur without fitting stress.
+    :param filenameIn: name of EX file containing femur surface
+    :param plateOffsets: sequence of offsets as fractions of row 1 to top distance
+    :param settings: dict of solver settings, see DEFAULT_SETTINGS
+    :return: float array (len(plateOffsets), 3) of offset, force, maximum penetration
+    """
+    settings = getSettings(settings)
+    context = ZincContext('loadfemur')
+    with loggingZincMessages(context):
+        model = FemurModel(context.getDefaultRegion(), filenameIn)
+        plateContact = createPlateContact(model, model.getPlateCentre(settings['plateOffset']), settings)
+        return sweepPlateOffsets(model, plateContact, plateOffsets)
+
+def write_sweep_csv(filename, samples):
+    """
+    :param samples: array of rows of offset, force, maximum penetration
+    """
+    with open(filename, 'w') as outfile:
+        outfile.write('plateOffset,force,maximumPenetration\n')
+        for sample in samples:
+            outfile.write('%.12g,%.12g,%.12g\n' % tuple(sample))
+
+def getSweepFilename(filenameOut, loadCaseName='stress'):
+    """
+    :param loadCaseName: name of load case stress field, to distinguish other than the default case
+    :return: name of sweep CSV file written alongside filenameOut
+    """
+    if loadCaseName == 'stress':
+        return os.path.splitext(filenameOut)[0] + '_sweep.csv'
+    return os.path.splitext(filenameOut)[0] + '_sweep_' + loadCaseName + '.csv'
+
+def getLoadCases(settings):
+    """
+    :return: list of (stress field name, plate tilt angle in degrees) for each load case
+    """
+    if not settings['loadCaseAngles']:
+        return [('stress', 0.0)]
+    return [('stress_%d' % (n + 1), float(angle)) for n, angle in enumerate(settings['loadCaseAngles'])]
+
+def createStressFitObjective(model, stress, penetration, numberOfPoints, mesh=None):
+    """
+    :param mesh: optional mesh group to integrate over, default whole mesh
+    :return: Zinc field giving the integral of squares of stress - [penetration, 0, 0]
+    """
+    fm = model.fm
     constZeroVector2 = fm.createFieldConstant([0.0, 0.0])
     sourceStress = fm.createFieldConcatenate([penetration, constZeroVector2])
     stressError = fm.createFieldSubtract(stress, sourceStress)
-    stressFitObjective = fm.createFieldMeshIntegralSquares(stressError, coordinates, mesh)
-    stressFitObjective.setNumbersOfPoints([4])
-    optimisation = fm.createOptimisation()
-    optimisation.setMethod(Optimisation.METHOD_LEAST_SQUARES_QUASI_NEWTON)
-    optimisation.setAttributeInteger(Optimisation.ATTRIBUTE_MAXIMUM_ITERATIONS, 3)
-    optimisation.addIndependentField(stress)
-    optimisation.addObjectiveField(stressFitObjective)
-    result = optimisation.optimise()
-    print("Optimisation result = " + str(result))
-    report = optimisation.getSolutionReport()
+    stressFitObjective = fm.createFieldMeshIntegralSquares(stressError, model.coordinates, mesh if mesh else model.mesh)
+    stressFitObjective.setNumbersOfPoints([numberOfPoints])
+    return stressFitObjective
+
+def evaluateObjective(objective, cache):
+    """
+    :return: sum of components of objective field
+    """
+    result, objectiveValues = objective.evaluateReal(cache, objective.getNumberOfComponents())
+    return sum(objectiveValues)
+
+def fitStress(model, stress, plateContact, plateCentre, settings, monitor=None, warmStartStore=None):
+    """
+    Fit stress to the penetration of the plate at plateCentre.
+    With the 'direct' stressSolver setting the linear least-squares problem
+    is assembled and solved in one step. With 'multilevel' it is solved on
+    rings of nodes multilevelRowStep rows apart, then refined on the full
+    mesh for up to refineIterations conjugate gradient iterations or until
+    the relative residual is refineTolerance. Otherwise it is handed to the
+    Zinc optimiser for up to maximumIterations iterations. With cullContact the
+    optimiser only varies stress at nodes of elements which can touch the
+    plate, integrating over the elements using them; stress is zero
+    elsewhere so the solution is unchanged.
+    With the warmStart setting and a warmStartStore the optimiser starts from
+    the last solution stored for this topology and stress field name, and
+    the solution is stored for next time. The optimiser runs all iterations
+    in one call, keeping its quasi-Newton state, unless optimiseChunkIterations
+    splits them into calls between which progress and cancellation are
+    checked, each restarting that state. With stressFitTolerance it stops
+    once a call reduces the objective by less than that fraction, one
+    iteration per call by default.
+    :param monitor: optional PhaseMonitor, which receives the optimiser
+    iteration count, solution report and iterations and time saved by a
+    warm start
+    :param warmStartStore: optional WarmStartStore
+    :return: stress fit objective value after fitting
+    """
+    if monitor is None:
+        monitor = PhaseMonitor()
+    fm = model.fm
+    cache = plateContact.cache
+    stressFitObjective = createStressFitObjective(model, stress, plateContact.penetration, settings['numberOfPoints'])
+    if settings['stressSolver'] in ('direct', 'multilevel'):
+        with monitor.phase('optimise'):
+            hermiteMesh = model.getHermiteMesh()
+            quadrature = model.getSurfaceQuadrature(settings['numberOfPoints'])
+            up = numpy.array(plateContact.up)
+            pointPenetrations = numpy.maximum(numpy.dot(plateCentre, up) - quadrature.getPointHeights(up), 0.0)
+            if settings['stressSolver'] == 'direct':
+                dofValues = model.getDirectStressFit(settings['numberOfPoints']).solve(pointPenetrations)
+                iterations = 0
+            else:
+                multilevelStressFit = model.getMultilevelStressFit(settings['numberOfPoints'], settings['multilevelRowStep'])
+                dofValues = multilevelStressFit.solve(pointPenetrations, settings['refineIterations'], settings['refineTolerance'])
+                iterations = multilevelStressFit.iterations
+                monitor.setValue('refineResidual', multilevelStressFit.residuals[-1])
+            hermiteMesh.writeDofValues(fm, stress, dofValues)
+        monitor.setValue('optimisationIterations', iterations)
+    else:
+        hermiteMesh = model.getHermiteMesh()
+        useWarmStart = settings['warmStart'] and (warmStartStore is not None)
+        warmStart = None
+        if settings['cullContact']:
+            heightIndex = model.getElementHeightIndex(plateContact.up)
+            contactElementIndexes = heightIndex.getContactElementIndexes(numpy.dot(plateCentre, plateContact.up))
+            fitNodeIdentifiers, fitElementIndexes = heightIndex.getFitStencil(contactElementIndexes)
+            if len(fitNodeIdentifiers) == 0:
+                # no contact: zero stress is the solution, nothing to start from
+                useWarmStart = False
+        with monitor.phase('seed'):
+            # a new stress field is zero, the cold start; a warm start is written in one change
+            if useWarmStart:
+                signature = getTopologySignature(hermiteMesh)
+                warmStart = warmStartStore.lookup(signature, stress.getName(), hermiteMesh.getDofsCount())
+            if warmStart is not None:
+                dofValues = warmStart.dofValues
+                if settings['cullContact']:
+                    # only stencil nodes are optimised so stress must stay zero at all others
+                    dofValues = numpy.where(numpy.isin(hermiteMesh.dofNodeIdentifiers, fitNodeIdentifiers)[:, numpy.newaxis],
+                                            dofValues, 0.0)
+                hermiteMesh.writeDofValues(fm, stress, dofValues)
 
-    region.writeFile(filenameOut)
+        with monitor.phase('optimise'):
+            optimisation = fm.createOptimisation()
+            optimisation.setMethod(Optimisation.METHOD_LEAST_SQUARES_QUASI_NEWTON)
+            optimisation.addIndependentField(stress)
+            if settings['cullContact']:
+                fitElementGroup = fm.createFieldElementGroup(model.mesh)
+                fitMeshGroup = fitElementGroup.getMeshGroup()
+                model.setMeshGroupElements(fitMeshGroup, fitElementIndexes)
+                fitNodeGroup = fm.createFieldNodeGroup(model.nodes)
+                model.setNodesetGroupNodes(fitNodeGroup.getNodesetGroup(), fitNodeIdentifiers)
+                optimisation.setConditionalField(stress, fitNodeGroup)
+                # outside the fit elements stress and penetration are zero so the objective is the same
+                stressFitObjective = createStressFitObjective(model, stress, plateContact.penetration, settings['numberOfPoints'], fitMeshGroup)
+            optimisation.addObjectiveField(stressFitObjective)
+            maximumIterations = settings['maximumIterations']
+            if settings['cullContact'] and (len(fitNodeIdentifiers) == 0):
+                # no contact: zero stress is the solution
+                maximumIterations = 0
+            tolerance = settings['stressFitTolerance']
+            if tolerance > 0.0:
+                lastObjectiveValue = evaluateObjective(stressFitObjective, cache)
+            # each optimise() call restarts the quasi-Newton state, so iterations are only split into
+            # chunks, between which progress, cancellation and the tolerance are checked, when asked to
+            chunkIterations = settings['optimiseChunkIterations']
+            if chunkIterations <= 0:
+                chunkIterations = 1 if (tolerance > 0.0) else maximumIterations
+            result = ZINC_OK
+            iterations = 0
+            startTime = timeit.default_timer()
+            while iterations < maximumIterations:
+                monitor.reportProgress('optimise', iterations/float(maximumIterations))
+                callIterations = min(chunkIterations, maximumIterations - iterations)
+                optimisation.setAttributeInteger(Optimisation.ATTRIBUTE_MAXIMUM_ITERATIONS, callIterations)
+                result = optimisation.optimise()
+                if result != ZINC_OK:
+                    break
+                iterations += callIterations
+                if tolerance > 0.0:
+                    objectiveValue = evaluateObjective(stressFitObjective, cache)
+                    if (lastObjectiveValue - objectiveValue) <= tolerance*lastObjectiveValue:
+                        break
+                    lastObjectiveValue = objectiveValue
+            optimiseTime = timeit.default_timer() - startTime
+            log.info('Optimisation result = %s', result)
+            report = optimisation.getSolutionReport()
+            # a run without iterations has no new solution to store
+            if useWarmStart and (result == ZINC_OK) and (iterations > 0):
+                if warmStart is None:
+                    coldIterations, coldTime = iterations, optimiseTime
+                else:
+                    coldIterations, coldTime = warmStart.coldIterations, warmStart.coldTime
+                try:
+                    warmStartStore.store(signature, stress.getName(),
+                        WarmStart(hermiteMesh.readDofValues(fm, stress), coldIterations, coldTime))
+                except (IOError, OSError):
+                    # the stored solution is only an optimisation for later runs
+                    pass
+        monitor.setValue('optimisationIterations', iterations)
+        monitor.setValue('optimisationResult', result)
+        monitor.setValue('solutionReport', report)
+        monitor.setValue('warmStarted', warmStart is not None)
+        # without a tolerance every fit runs maximumIterations so nothing can be saved
+        iterationsSaved = timeSaved = None
+        if (warmStart is not None) and (tolerance > 0.0):
+            iterationsSaved = warmStart.coldIterations - iterations
+            timeSaved = warmStart.coldTime - optimiseTime
+            log.info('Warm start saved %d iterations, %.3f s', iterationsSaved, timeSaved)
+        monitor.setValue('warmStartIterationsSaved', iterationsSaved)
+        monitor.setValue('warmStartTimeSaved', timeSaved)
+    stressFitObjectiveValue = evaluateObjective(stressFitObjective, cache)
+    monitor.setValue('stressFitObjective', stressFitObjectiveValue)
+    return stressFitObjectiveValue
 
+def readResults(region, filenameIn, filenameOut, outputMode):
+    """
+    Read results written by loadfemur into region, as from its returned region.
+    :param filenameIn: input mesh, read with the stress sidecar for outputMode 'sidecar'
+    :param filenameOut: results EX file name passed to loadfemur
+    :return: True on success
+    """
+    if outputMode == 'sidecar':
+        if region.readFile(filenameIn) != ZINC_OK:
+            return False
+        loadStressSidecar(region, getStressSidecarFilename(filenameOut))
+        return True
+    return region.readFile(filenameOut) == ZINC_OK
+
+def getMetricsFilename(filenameOut):
+    """
+    :return: name of JSON metrics file written alongside filenameOut
+    """
+    return os.path.splitext(filenameOut)[0] + '_metrics.json'
+
+def removeOutputFiles(filenameOut):
+    """
+    Remove every file loadfemur may have written for filenameOut in any
+    output mode: results, stress sidecar, metrics and the sweep CSV files of
+    all load cases.
+    """
+    filenames = [filenameOut, getStressSidecarFilename(filenameOut), getMetricsFilename(filenameOut)]
+    filenames += glob.glob(glob.escape(os.path.splitext(filenameOut)[0]) + '_sweep*.csv')
+    for filename in filenames:
+        if os.path.isfile(filename):
+            os.remove(filename)
+
+def loadfemur(filenameIn, filenameOut, settings=None, context=None, progress=None, profiler=None, warmStartStore=None):
+    """
+    :param filenameIn:
+    :param filenameOut:
+    :param settings: dict of solver settings, see DEFAULT_SETTINGS
+    :param context: optional Zinc context to load into a new region of,
+    otherwise a new context is created
+    :param progress: optional callable(phase, fraction) called at the start of
+    each phase and optimisation iteration; returning False cancels
+    :param profiler: optional callable(phase) returning a context manager
+    entered for the duration of each phase
+    :param warmStartStore: optional WarmStartStore of stress solutions to
+    start the optimiser from with the warmStart setting
+    :return: dict of results: 'loadCases' list of dicts of 'name' of stress
+    field, 'tiltAngle', 'force' value, 'plateOffset' used, which is solved for
+    if the targetForce setting is given, 'targetForceConverged' and
+    'targetForceResidual' force error relative to the target of that solve or
+    None without a target force, 'stressFitObjective' value after fit
+    and 'optimisationIterations', 'warmStartIterationsSaved' and
+    'warmStartTimeSaved' compared with the last cold start or None if not
+    warm started or without a stressFitTolerance, one per loadCaseAngles setting or a single
+    untilted case; 'force', 'plateOffset', 'targetForceConverged',
+    'targetForceResidual' and 'stressFitObjective' of the first load case,
+    'outputFilenames' list of names of files written, results first, which are
+    filenameOut and/or the stress sidecar depending on the outputMode setting
+    unless writeResults is False,
+    'sidecarFilename' or None, 'metrics' dict of phase
+    times, peak memory and optimiser report, also written to 'metricsFilename',
+    and 'region' holding the mesh and stress fields, which stays valid while
+    referenced even if the context is not
+    :raises LoadFemurCancelled: if cancelled by progress
+    """
+    settings = getSettings(settings)
+    monitor = PhaseMonitor(progress, profiler)
+    ownContext = None
+    if context is None:
+        context = ownContext = ZincContext('loadfemur')
+        region = context.getDefaultRegion()
+    else:
+        region = context.createRegion()
+    # messages of a caller's context are logged by the caller
+    with loggingZincMessages(ownContext):
+        model = FemurModel(region, filenameIn, monitor)
+        results = solveFemurModel(model, filenameOut, settings, monitor, warmStartStore)
+    results['region'] = region
+    return results
+
+def solveFemurModel(model, filenameOut, settings, monitor, warmStartStore=None):
+    """
+    Evaluate and fit stress for every load case on a loaded model and write
+    the outputs. May be called again on the same model with other settings,
+    reusing its cached topology, quadrature and factorised fit.
+    :param model: FemurModel
+    :param settings: dict of solver settings, complete as from getSettings
+    :param monitor: PhaseMonitor
+    :param warmStartStore: optional WarmStartStore
+    :return: dict of results as for loadfemur, without 'region'
+    """
+    model.releaseStressFields()
+    fm = model.fm
+    outputFilenames = []
+    fieldsForce = {}
+    loadCaseResults = []
+    plateContact = None
+    loadCases = getLoadCases(settings)
+    for n, (name, tiltAngle) in enumerate(loadCases):
+        monitor.setLoadCase(n, len(loadCases))
+        with monitor.phase('stress'):
+            # define 3-component stress field identically to coordinates
+            stress = model.createStressField(name)
+
+        with monitor.phase('force'):
+            plateOffset = settings['plateOffset']
+            plateCentre = model.getPlateCentre(plateOffset)
+            # the contact field graph is built for the first case and reoriented for others
+            if plateContact is None:
+                plateContact = createPlateContact(model, plateCentre, settings)
+            else:
+                plateContact.setPlateCentre(plateCentre)
+            plateContact.setPlateOrientation(*model.getTiltedPlateOrientation(tiltAngle))
+            targetForceConverged = None
+            targetForceResidual = None
+            if settings['targetForce'] > 0.0:
+                plateOffset, forceValue, evaluations, targetForceConverged, targetForceResidual = solvePlateOffsetForForce(
+                    model, plateContact, settings['targetForce'], plateOffset, settings['targetForceTolerance'])
+                plateCentre = model.getPlateCentre(plateOffset)
+                monitor.setValue('targetForceEvaluations', evaluations)
+                monitor.setValue('targetForceConverged', targetForceConverged)
+                monitor.setValue('targetForceResidual', targetForceResidual)
+                if not targetForceConverged:
+                    log.warning('%s target force %s not reached after %d evaluations: using plate offset %s with force %s, '
+                        'relative residual %.3g', name, settings['targetForce'], evaluations, plateOffset, forceValue,
+                        targetForceResidual)
+            else:
+                forceValue = plateContact.evaluateForce()
+        monitor.setValue('force', forceValue)
+        monitor.setValue('forceEvaluations', plateContact.forceEvaluations)
+        monitor.setValue('forceErrorEstimate', plateContact.forceErrorEstimate)
+        monitor.setValue('plateOffset', plateOffset)
+
+        log.info('%s forceValue %s', name, forceValue)
+
+        plateOffsets = getSweepPlateOffsets(settings)
+        if len(plateOffsets) > 0:
+            with monitor.phase('sweep'):
+                samples = sweepPlateOffsets(model, plateContact, plateOffsets)
+                plateContact.setPlateCentre(plateCentre)
+                sweepFilename = getSweepFilename(filenameOut, name)
+                write_sweep_csv(sweepFilename, samples)
+            outputFilenames.append(sweepFilename)
+
+        stressFitObjective = fitStress(model, stress, plateContact, plateCentre, settings, monitor, warmStartStore)
+        log.info('%s Stress fit objective = %s', name, stressFitObjective)
+        fieldsForce[name] = forceValue
+        loadCaseResults.append({
+            'name': name,
+            'tiltAngle': tiltAngle,
+            'force': forceValue,
+            'forceErrorEstimate': plateContact.forceErrorEstimate,
+            'plateOffset': plateOffset,
+            'targetForceConverged': targetForceConverged,
+            'targetForceResidual': targetForceResidual,
+            'stressFitObjective': stressFitObjective,
+            'optimisationIterations': monitor.getMetrics()['optimisationIterations'],
+            'warmStartIterationsSaved': monitor.getMetrics().get('warmStartIterationsSaved'),
+            'warmStartTimeSaved': monitor.getMetrics().get('warmStartTimeSaved'),
+        })
+    monitor.setValue('loadCases', loadCaseResults)
+
+    sidecarFilename = None
+    with monitor.phase('write'):
+        if settings['writeResults'] and (settings['outputMode'] != 'exfile'):
+            sidecarFilename = getStressSidecarFilename(filenameOut)
+            hermiteMesh = model.getHermiteMesh()
+            plateElementIdentifiers = []
+            elementiterator = model.getPlateMeshGroup().createElementiterator()
+            element = elementiterator.next()
+            while element.isValid():
+                plateElementIdentifiers.append(element.getIdentifier())
+                element = elementiterator.next()
+            fieldsDofValues = dict((name, hermiteMesh.readDofValues(fm, fm.findFieldByName(name).castFiniteElement()))
+                                   for name, tiltAngle in loadCases)
+            write_stress_sidecar(sidecarFilename, hermiteMesh, fieldsDofValues, fieldsForce, plateElementIdentifiers)
+            outputFilenames.insert(0, sidecarFilename)
+        if settings['writeResults'] and (settings['outputMode'] != 'sidecar'):
+            model.region.writeFile(filenameOut)
+            outputFilenames.insert(0, filenameOut)
+    metricsFilename = getMetricsFilename(filenameOut)
+    monitor.setValue('settings', settings)
+    monitor.write_json(metricsFilename)
+    firstCase = loadCaseResults[0]
+    return {
+        'force': firstCase['force'],
+        'plateOffset': firstCase['plateOffset'],
+        'targetForceConverged': firstCase['targetForceConverged'],
+        'targetForceResidual': firstCase['targetForceResidual'],
+        'stressFitObjective': firstCase['stressFitObjective'],
+        'loadCases': loadCaseResults,
+        'outputFilenames': outputFilenames,
+        'sidecarFilename': sidecarFilename,
+        'metrics': monitor.getMetrics(),
+        'metricsFilename': metricsFilename,
+    }
 
-def write_simpleviz_script(filename, modelfilename):
+
+def write_simpleviz_script(filename, modelfilename, sidecarFilename=None):
+    """
+    :param modelfilename: results EX file, or the input mesh if sidecarFilename is given
+    :param sidecarFilename: optional stress sidecar to load after the mesh
+    """
     with open(filename, 'w') as outfile:
         modelfilename = modelfilename.replace('\\', r'\\')
-        outfile.write(
+        if sidecarFilename is None:
+            outfile.write(
 """# Generated by mapclient load femur step
 from opencmiss.zinc.status import OK as ZINC_OK
 def loadModel(region):
     result = region.readFile(""" + '"' + modelfilename + '"' + """)
     return result == ZINC_OK
+""")
+        else:
+            sidecarFilename = sidecarFilename.replace('\\', r'\\')
+            outfile.write(
+"""# Generated by mapclient load femur step
+from opencmiss.zinc.status import OK as ZINC_OK
+from mapclientplugins.loadfemurstep.stresssidecar import loadStressSidecar
+def loadModel(region):
+    result = region.readFile(""" + '"' + modelfilename + '"' + """)
+    if result != ZINC_OK:
+        return False
+    loadStressSidecar(region, """ + '"' + sidecarFilename + '"' + """)
+    return True
 """)
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""
+Logging of the load femur computation and of Zinc with the standard
+logging module.
+
+Messages go to loggers under LOGGER_NAME, which propagate to the
+application's handlers until configureLogging is called. It adds a console
+handler with a rate limit so repeated messages below warning level cannot
+flood bulk runs, and optionally a ring buffer keeping the latest records in
+memory, possibly at a lower level, formatted only when written to a file. In quiet mode
+without a buffer every level is disabled, so logging calls return at their
+level check and no Zinc logger notifier is created.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import collections
+import logging
+import threading
+
+LOGGER_NAME = 'mapclientplugins.loadfemurstep'
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+# level names accepted by configureLogging, in order of decreasing output
+LOG_LEVELS = collections.OrderedDict([
+    ('debug', logging.DEBUG),
+    ('info', logging.INFO),
+    ('warning', logging.WARNING),
+    ('error', logging.ERROR),
+    ('quiet', logging.CRITICAL + 1),
+])
+
+def summarizeIdentifiers(identifiers, maximumCount=6):
+    """
+    :param identifiers: sequence of identifiers
+    :param maximumCount: number of identifiers listed in full
+    :return: string listing identifiers, or for longer sequences the first
+    and last few and the count
+    """
+    count = len(identifiers)
+    if count <= maximumCount:
+        return ', '.join(str(identifier) for identifier in identifiers)
+    half = maximumCount // 2
+    return '%s ... %s (%d identifiers)' % (', '.join(str(identifier) for identifier in identifiers[:half]),
+        ', '.join(str(identifier) for identifier in identifiers[count - half:]), count)
+
+class RateLimitFilter(logging.Filter):
+    """
+    Filter for handler passing at most maximumCount records below WARNING
+    with the same logger, level and message template in each period.
+    Warnings and errors always pass. When a period in which records were
+    dropped has ended, found on the next record or by flush, handler is
+    sent a record of how many were dropped.
+    """
+
+    def __init__(self, handler, maximumCount=10, period=1.0):
+        """
+        :param handler: handler the filter is added to, which reports drops
+        :param maximumCount: records passed per message per period
+        :param period: seconds
+        """
+        logging.Filter.__init__(self)
+        self._handler = handler
+        self._maximumCount = maximumCount
+        self._period = period
+        self._lock = threading.RLock()
+        # (logger name, level, message template) -> [period start time, passed count, dropped count]
+        self._windows = {}
+        # earliest end of a period with drops, or None if none
+        self._reportTime = None
+
+    def filter(self, record):
+        if (record.levelno >= logging.WARNING) or getattr(record, 'suppressedCount', 0):
+            return True
+        with self._lock:
+            if (self._reportTime is not None) and (record.created >= self._reportTime):
+                self._reportSuppressed(record.created)
+            key = (record.name, record.levelno, record.msg)
+            window = self._windows.get(key)
+            if (window is None) or ((record.created - window[0]) >= self._period):
+                self._windows[key] = [record.created, 1, 0]
+                return True
+            if window[1] < self._maximumCount:
+                window[1] += 1
+                return True
+            window[2] += 1
+            endTime = window[0] + self._period
+            if (self._reportTime is None) or (endTime < self._reportTime):
+                self._reportTime = endTime
+            return False
+
+    def _reportSuppressed(self, time=None):
+        """
+        Report drops in periods ended by time, or in all periods if None.
+        """
+        self._reportTime = None
+        for key, window in list(self._windows.items()):
+            if not window[2]:
+                continue
+            endTime = window[0] + self._period
+            if (time is None) or (time >= endTime):
+                name, levelno, msg = key
+                record = logging.LogRecord(name, levelno, '', 0, '%d similar messages suppressed: %s', (window[2], msg), None)
+                record.suppressedCount = window[2]
+                del self._windows[key]
+                self._handler.handle(record)
+            elif (self._reportTime is None) or (endTime < self._reportTime):
+                self._reportTime = endTime
+
+    def flush(self):
+        """
+        Report all drops not yet reported.
+        """
+        with self._lock:
+            self._reportSuppressed()
+
+class RingBufferHandler(logging.Handler):
+    """
+    Keeps the latest capacity records in memory without formatting them,
+    to be written to a file on demand, e.g. after a failure.
+    """
+
+    def __init__(self, capacity, level=logging.NOTSET):
+        logging.Handler.__init__(self, level)
+        self._records = collections.deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def emit(self, record):
+        self._records.append(record)
+
+    def getRecords(self):
+        """
+        :return: list of records kept, oldest first
+        """
+        self.acquire()
+        try:
+            return list(self._records)
+        finally:
+            self.release()
+
+    def clear(self):
+        self.acquire()
+        try:
+            self._records.clear()
+        finally:
+            self.release()
+
+    def write_log(self, filename, append=False):
+        """
+        Write records kept to file, oldest first.
+        :param append: if True append to an existing file instead of replacing it
+        """
+        with open(filename, 'a' if append else 'w') as outfile:
+            for record in self.getRecords():
+                outfile.write(self.format(record) + '\n')
+
+def configureLogging(level='info', bufferCapacity=0, bufferLevel=None, rateLimitCount=10, rateLimitPeriod=1.0,
+                     stream=None):
+    """
+    Send messages at level and above to stream instead of the application's
+    handlers, replacing handlers added by earlier calls.
+    :param level: name in LOG_LEVELS; 'quiet' shows no messages
+    :param bufferCapacity: latest records also kept in a RingBufferHandler, 0 for none
+    :param bufferLevel: name in LOG_LEVELS of records kept, default level
+    :param rateLimitCount: messages below warning with the same template shown per rateLimitPeriod
+    :param rateLimitPeriod: seconds
+    :param stream: default sys.stderr
+    :return: RingBufferHandler, or None if not buffering
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    flushRateLimits()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.propagate = False
+    streamLevel = LOG_LEVELS[level]
+    # the logger level is the lowest handled, so all others return at their level check
+    loggerLevel = streamLevel
+    if streamLevel <= logging.CRITICAL:
+        streamHandler = logging.StreamHandler(stream)
+        streamHandler.setLevel(streamLevel)
+        streamHandler.addFilter(RateLimitFilter(streamHandler, rateLimitCount, rateLimitPeriod))
+        streamHandler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(streamHandler)
+    ringBufferHandler = None
+    if bufferCapacity > 0:
+        ringBufferLevel = LOG_LEVELS[bufferLevel or level]
+        if ringBufferLevel <= logging.CRITICAL:
+            ringBufferHandler = RingBufferHandler(bufferCapacity, ringBufferLevel)
+            logger.addHandler(ringBufferHandler)
+            loggerLevel = min(loggerLevel, ringBufferLevel)
+    logger.setLevel(loggerLevel)
+    return ringBufferHandler
+
+def flushRateLimits():
+    """
+    Report messages dropped by the rate limits of handlers added by
+    configureLogging, e.g. at the end of a run.
+    """
+    for handler in logging.getLogger(LOGGER_NAME).handlers:
+        for filter in handler.filters:
+            if isinstance(filter, RateLimitFilter):
+                filter.flush()
@@ -0,0 +1,111 @@
+"""
+NumPy index of mesh topology and nodal coordinates.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import numpy
+
+class MeshTopology(object):
+    '''
+    Node identifiers, nodal coordinates and element-node connectivity of a
+    mesh held in NumPy arrays, answering row, ring and centroid queries by
+    vectorized lookups instead of walking the Zinc mesh.
+    '''
+
+    def __init__(self, nodeIdentifiers, nodeCoordinates, elementIdentifiers, elementNodeIdentifiers):
+        '''
+        :param nodeIdentifiers: int array (nodesCount) in nodeset order
+        :param nodeCoordinates: float array (nodesCount, 3)
+        :param elementIdentifiers: int array (elementsCount) in mesh order
+        :param elementNodeIdentifiers: int array (elementsCount, maximum local nodes count)
+        with unused entries -1
+        '''
+        self.nodeIdentifiers = nodeIdentifiers
+        self.nodeCoordinates = nodeCoordinates
+        self.elementIdentifiers = elementIdentifiers
+        self.elementNodeIdentifiers = elementNodeIdentifiers
+        # nodeset order is ascending identifier, but do not rely on it for lookups
+        self._nodeOrder = numpy.argsort(nodeIdentifiers, kind='mergesort')
+        self._sortedNodeIdentifiers = nodeIdentifiers[self._nodeOrder]
+
+    def getNodeIndexes(self, nodeIdentifiers):
+        '''
+        :param nodeIdentifiers: sequence of node identifiers
+        :return: int array of indexes into node arrays
+        '''
+        nodeIdentifiers = numpy.asarray(nodeIdentifiers, dtype=self.nodeIdentifiers.dtype)
+        positions = numpy.searchsorted(self._sortedNodeIdentifiers, nodeIdentifiers)
+        positions = numpy.minimum(positions, len(self._sortedNodeIdentifiers) - 1)
+        if not numpy.array_equal(self._sortedNodeIdentifiers[positions], nodeIdentifiers):
+            raise KeyError('Node identifiers not found in mesh topology')
+        return self._nodeOrder[positions]
+
+    def getElementsCountAround(self, apexNodeIdentifier=1):
+        '''
+        :return: number of elements using the apex node
+        '''
+        return int(numpy.count_nonzero(numpy.any(self.elementNodeIdentifiers == apexNodeIdentifier, axis=1)))
+
+    def getNodeIdentifiersInRow(self, elementsCountAround, row):
+        '''
+        Rows are a single apex node followed by rings of elementsCountAround
+        nodes in nodeset order.
+        :param: row starting at 0 for apex
+        :return: list of node identifiers in row
+        '''
+        if row == 0:
+            start, stop = 0, 1
+        else:
+            start = 1 + (row - 1)*elementsCountAround
+            stop = start + elementsCountAround
+        return self.nodeIdentifiers[start:stop].tolist()
+
+    def getMeanNodeCoordinates(self, nodeIdentifiers):
+        '''
+        :return: mean coordinates of nodes as a list of length 3
+        '''
+        return self.nodeCoordinates[self.getNodeIndexes(nodeIdentifiers)].mean(axis=0).tolist()
+
+def extractMeshTopology(fm, mesh, nodes, coordinates):
+    '''
+    Read node identifiers, nodal coordinates and element-node connectivity
+    in a single pass over nodes and elements. Zinc has no bulk access to
+    these, so this still makes a few Zinc calls per node and per element
+    local node, but only once per model: the queries on the returned
+    MeshTopology are then NumPy lookups. The scaling benchmark times it as
+    the topology phase.
+    :return: MeshTopology
+    '''
+    cache = fm.createFieldcache()
+    nodesCount = nodes.getSize()
+    nodeIdentifiers = numpy.empty(nodesCount, dtype=numpy.int64)
+    nodeCoordinates = numpy.empty((nodesCount, 3))
+    nodeiterator = nodes.createNodeiterator()
+    node = nodeiterator.next()
+    n = 0
+    while node.isValid():
+        nodeIdentifiers[n] = node.getIdentifier()
+        cache.setNode(node)
+        result, nodeCoordinates[n] = coordinates.evaluateReal(cache, 3)
+        node = nodeiterator.next()
+        n += 1
+    elementIdentifiers = []
+    elementNodes = []
+    elementiterator = mesh.createElementiterator()
+    element = elementiterator.next()
+    while element.isValid():
+        elementIdentifiers.append(element.getIdentifier())
+        eft = element.getElementfieldtemplate(coordinates, -1)
+        if eft.isValid():
+            elementNodes.append([element.getNode(eft, ln).getIdentifier() for ln in range(1, eft.getNumberOfLocalNodes() + 1)])
+        else:
+            elementNodes.append([])
+        element = elementiterator.next()
+    maximumLocalNodesCount = max([len(localNodes) for localNodes in elementNodes] + [0])
+    elementNodeIdentifiers = numpy.full((len(elementNodes), maximumLocalNodesCount), -1, dtype=numpy.int64)
+    for e, localNodes in enumerate(elementNodes):
+        elementNodeIdentifiers[e, :len(localNodes)] = localNodes
+    return MeshTopology(nodeIdentifiers, nodeCoordinates, numpy.array(elementIdentifiers, dtype=numpy.int64), elementNodeIdentifiers)
@@ -0,0 +1,131 @@
+"""
+Plate contact evaluated with NumPy at Gauss points of all elements at once.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import numpy
+from mapclientplugins.loadfemurstep.adaptivequadrature import AdaptiveContactQuadrature
+
+class NumpyPlateContact(object):
+    """
+    Alternative to PlateContact which, since the plate is planar, computes
+    penetration as the signed distance below the plate plane and integrates
+    force over the bicubic Hermite surface with NumPy. Surface points and
+    area weights at Gauss points are computed once; moving the plate only
+    repeats a vectorized reduction.
+    With contact culling only elements which can be below the plate are
+    summed, found by binary search of their minimum heights.
+    With a force tolerance, elements entirely below the plate use the fixed
+    rule while those the plate boundary crosses are adaptively refined.
+    Also provides the equivalent Zinc penetration field for the stress fit.
+    """
+
+    def __init__(self, model, plateCentre, numberOfPoints, cullContact=False, forceTolerance=0.0, forceRefinementLevels=0,
+                 forceEvaluationBudget=0):
+        """
+        :param model: FemurModel
+        :param plateCentre: initial plate centre coordinates
+        :param numberOfPoints: Gauss points per element direction for force
+        :param cullContact: if True sum force only over elements which can touch the plate
+        :param forceTolerance: relative estimated error of force, or 0 for the fixed rule
+        :param forceRefinementLevels: maximum times a crossed element is split with a force tolerance
+        :param forceEvaluationBudget: maximum points refining each crossed element as a multiple
+        of the fixed rule, or 0 for no limit
+        """
+        fm = model.fm
+        model.getPlateMeshGroup()
+        self._model = model
+        self.up = list(model.up)
+        self._quadrature = model.getSurfaceQuadrature(numberOfPoints)
+        # height of each Gauss point along up, and its quadrature weight times area
+        self._pointHeights = self._quadrature.getPointHeights(self.up)
+        self._pointAreaWeights = self._quadrature.areaWeights
+        self._nodeHeights = numpy.dot(model.topology.nodeCoordinates, self.up)
+        self._plateCentre = None
+        self._plateHeight = None
+        self._forceTolerance = forceTolerance
+        self._adaptiveQuadrature = None
+        if forceTolerance > 0.0:
+            self._adaptiveQuadrature = AdaptiveContactQuadrature(model.getHermiteMesh(), model.getCoordinatesDofValues(),
+                numberOfPoints, forceRefinementLevels, forceEvaluationBudget)
+        self._heightIndex = model.getElementHeightIndex(self.up) if (cullContact or forceTolerance > 0.0) else None
+        # points evaluated and estimated error of the last force evaluation
+        self.forceEvaluations = 0
+        self.forceErrorEstimate = None
+
+        self._constPlateCentre = fm.createFieldConstant(plateCentre)
+        self._constUp = fm.createFieldConstant(model.up)
+        plateOffset = fm.createFieldSubtract(self._constPlateCentre, model.coordinates)
+        negativeProjectionDistance = fm.createFieldDotProduct(plateOffset, self._constUp)
+        constZero = fm.createFieldConstant([0.0])
+        negativeProjectionDistanceIsPositive = fm.createFieldGreaterThan(negativeProjectionDistance, constZero)
+        self.penetration = fm.createFieldIf(negativeProjectionDistanceIsPositive, negativeProjectionDistance, constZero)
+        self.cache = fm.createFieldcache()
+        self.setPlateCentre(plateCentre)
+
+    def setPlateCentre(self, plateCentre):
+        """
+        Move plate to centre.
+        """
+        self._plateCentre = list(plateCentre)
+        self._plateHeight = numpy.dot(plateCentre, self.up)
+        self._constPlateCentre.assignReal(self.cache, self._plateCentre)
+
+    def setPlateOrientation(self, up, forward):
+        """
+        Turn plate about its centre to unit normal up. Only the Gauss point
+        and node heights are recomputed.
+        :param forward: unit in-plane direction, unused as the plate is unbounded
+        """
+        self.up = list(up)
+        self._pointHeights = self._quadrature.getPointHeights(self.up)
+        self._nodeHeights = numpy.dot(self._model.topology.nodeCoordinates, self.up)
+        if self._heightIndex is not None:
+            self._heightIndex = self._model.getElementHeightIndex(self.up)
+        self._constUp.assignReal(self.cache, self.up)
+        self.setPlateCentre(self._plateCentre)
+
+    def evaluatePointPenetrations(self):
+        """
+        :return: float array (elementsCount, pointsCount) of penetration at Gauss points
+        """
+        return numpy.maximum(self._plateHeight - self._pointHeights, 0.0)
+
+    def evaluateForce(self):
+        """
+        :return: contact force for the current plate centre
+        """
+        if self._heightIndex is None:
+            self.forceEvaluations = self._pointHeights.size
+            return float(numpy.sum(self._pointAreaWeights*self.evaluatePointPenetrations()))
+        elementIndexes = self._heightIndex.getContactElementIndexes(self._plateHeight)
+        pointPenetrations = numpy.maximum(self._plateHeight - self._pointHeights[elementIndexes], 0.0)
+        self.forceEvaluations = pointPenetrations.size
+        if self._adaptiveQuadrature is None:
+            return float(numpy.sum(self._pointAreaWeights[elementIndexes]*pointPenetrations))
+        elementForces = numpy.sum(self._pointAreaWeights[elementIndexes]*pointPenetrations, axis=1)
+        crossing = self._heightIndex.maximumHeights[elementIndexes] > self._plateHeight
+        tolerance = self._forceTolerance*float(numpy.sum(elementForces))
+        crossingForce, self.forceErrorEstimate, evaluations = self._adaptiveQuadrature.integratePenetration(
+            self.up, self._plateHeight, elementIndexes[crossing], tolerance, elementForces[crossing])
+        self.forceEvaluations += evaluations
+        return float(numpy.sum(elementForces[~crossing])) + crossingForce
+
+    def evaluateContactArea(self):
+        """
+        :return: area of surface below the plate for the current plate centre
+        """
+        if self._heightIndex is None:
+            return float(numpy.sum(self._pointAreaWeights[self._pointHeights < self._plateHeight]))
+        elementIndexes = self._heightIndex.getContactElementIndexes(self._plateHeight)
+        below = self._pointHeights[elementIndexes] < self._plateHeight
+        return float(numpy.sum(self._pointAreaWeights[elementIndexes][below]))
+
+    def evaluateMaximumPenetration(self):
+        """
+        :return: maximum nodal penetration for the current plate centre
+        """
+        return max(float(self._plateHeight - numpy.min(self._nodeHeights)), 0.0)
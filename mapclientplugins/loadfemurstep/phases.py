@@ -0,0 +1,158 @@
+"""
+Phase-level progress reporting, cancellation and metrics for loadfemur.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from contextlib import contextmanager
+import json
+import sys
+import timeit
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+class LoadFemurCancelled(Exception):
+    """
+    Raised when a progress callback requests cancellation.
+    """
+
+# phases of loadfemur in order, with the approximate fraction of all work done at their start
+PHASES = [
+    ('read', 0.0),
+    ('topology', 0.1),
+    ('stress', 0.2),
+    ('force', 0.25),
+    ('sweep', 0.3),
+    ('seed', 0.35),
+    ('optimise', 0.4),
+    ('write', 0.9),
+]
+
+# phases repeated for each load case, from the first up to but excluding the last
+LOAD_CASE_PHASES = ('stress', 'write')
+
+def getProgressFraction(phase, phaseFraction=0.0):
+    """
+    :param phase: name of phase from PHASES
+    :param phaseFraction: fraction of phase complete
+    :return: fraction of all work complete
+    """
+    phaseNames = [name for name, start in PHASES]
+    index = phaseNames.index(phase)
+    start = PHASES[index][1]
+    end = PHASES[index + 1][1] if (index + 1) < len(PHASES) else 1.0
+    return start + phaseFraction*(end - start)
+
+def reportProgress(progress, phase, phaseFraction=0.0, loadCase=None):
+    """
+    :param progress: callable(phase, fraction) returning False to cancel, or None
+    :param phase: name of phase from PHASES
+    :param phaseFraction: fraction of phase complete
+    :param loadCase: optional (index, count) of the current load case; the
+    phases repeated for each case are scaled into its share of their range
+    :raises LoadFemurCancelled: if progress returns False
+    """
+    if progress is None:
+        return
+    fraction = getProgressFraction(phase, phaseFraction)
+    caseStart = getProgressFraction(LOAD_CASE_PHASES[0])
+    caseEnd = getProgressFraction(LOAD_CASE_PHASES[1])
+    if (loadCase is not None) and (caseStart <= fraction < caseEnd):
+        index, count = loadCase
+        fraction = caseStart + (index + (fraction - caseStart)/(caseEnd - caseStart))*(caseEnd - caseStart)/count
+    if progress(phase, fraction) is False:
+        raise LoadFemurCancelled(phase)
+
+def getPeakMemory():
+    """
+    :return: peak resident memory of this process in bytes so far, or None if unknown
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak*1024
+
+class PhaseMonitor(object):
+    """
+    Records the wall time and peak memory of each phase of a run and any
+    named values such as the optimiser report, reports progress, and wraps
+    each phase in an optional profiler hook.
+    """
+
+    def __init__(self, progress=None, profiler=None):
+        """
+        :param progress: optional callable(phase, fraction), see reportProgress
+        :param profiler: optional callable(phase) returning a context manager
+        entered for the duration of the phase
+        """
+        self._progress = progress
+        self._profiler = profiler
+        self._phases = []
+        self._values = {}
+        self._loadCase = None
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager measuring phase name. Reports progress on entry.
+        :raises LoadFemurCancelled: if progress requests cancellation
+        """
+        reportProgress(self._progress, name, loadCase=self._loadCase)
+        profilerContext = self._profiler(name) if self._profiler else None
+        if profilerContext is not None:
+            profilerContext.__enter__()
+        startTime = timeit.default_timer()
+        startPeakMemory = getPeakMemory()
+        try:
+            yield
+        finally:
+            elapsedTime = timeit.default_timer() - startTime
+            if profilerContext is not None:
+                profilerContext.__exit__(*sys.exc_info())
+            peakMemory = getPeakMemory()
+            self._phases.append({
+                'name': name,
+                'time': elapsedTime,
+                'peakMemory': peakMemory,
+                'peakMemoryIncrease': None if peakMemory is None else peakMemory - startPeakMemory,
+            })
+
+    def reportProgress(self, phase, phaseFraction):
+        """
+        Report progress within a phase, e.g. between optimisation iterations.
+        :raises LoadFemurCancelled: if progress requests cancellation
+        """
+        reportProgress(self._progress, phase, phaseFraction, self._loadCase)
+
+    def setLoadCase(self, index, count):
+        """
+        Report progress of phases repeated for each load case within the
+        index-th of count equal shares of their range.
+        """
+        self._loadCase = (index, count)
+
+    def setValue(self, name, value):
+        """
+        Record a named JSON-serializable value with the metrics.
+        """
+        self._values[name] = value
+
+    def getMetrics(self):
+        """
+        :return: dict of 'phases' list, 'totalTime' and recorded values
+        """
+        metrics = dict(self._values)
+        metrics['phases'] = list(self._phases)
+        metrics['totalTime'] = sum(phase['time'] for phase in self._phases)
+        return metrics
+
+    def write_json(self, filename):
+        with open(filename, 'w') as outfile:
+            json.dump(self.getMetrics(), outfile, sort_keys=True, indent=4)
@@ -0,0 +1,118 @@
+"""
+Content-addressed cache of load femur results.
+
+Entries are keyed on a hash of the input file contents, the plugin version
+and the solver settings, and are evicted least recently used first once the
+total size of the cache exceeds its limit.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+TEMPORARY_PREFIX = '.tmp'
+
+def hashFileContents(hasher, filename, blockSize=1 << 20):
+    """
+    Update hasher with the contents of file, read in blocks.
+    :param hasher: hashlib hash object
+    :param filename: name of file to hash
+    """
+    with open(filename, 'rb') as stream:
+        block = stream.read(blockSize)
+        while block:
+            hasher.update(block)
+            block = stream.read(blockSize)
+
+class ResultCache(object):
+    '''
+    Size-bounded cache of output files on disk, one sub-directory per key.
+    '''
+
+    def __init__(self, cacheDir, maximumSize):
+        '''
+        :param cacheDir: directory holding cache entries, created on demand
+        :param maximumSize: maximum total size of cached files in bytes
+        '''
+        self._cacheDir = cacheDir
+        self._maximumSize = maximumSize
+
+    def getKey(self, filenameIn, version, settings):
+        '''
+        :param filenameIn: name of the input mesh file
+        :param version: plugin version string
+        :param settings: dict of solver settings
+        :return: hex digest identifying these inputs
+        '''
+        hasher = hashlib.sha256()
+        hashFileContents(hasher, filenameIn)
+        hasher.update(version.encode('utf-8'))
+        hasher.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def _getEntryDir(self, key):
+        return os.path.join(self._cacheDir, key)
+
+    def lookup(self, key):
+        '''
+        :return: list of names of the cached files for key, or None on a miss
+        '''
+        entryDir = self._getEntryDir(key)
+        if not os.path.isdir(entryDir):
+            return None
+        # mark entry as most recently used
+        os.utime(entryDir, None)
+        return [os.path.join(entryDir, name) for name in sorted(os.listdir(entryDir))]
+
+    def store(self, key, filenames):
+        '''
+        Copy output files into the cache under key, then evict old entries.
+        Files are stored by base name so must have distinct base names.
+        '''
+        if not os.path.isdir(self._cacheDir):
+            os.makedirs(self._cacheDir)
+        entryDir = self._getEntryDir(key)
+        if os.path.isdir(entryDir):
+            shutil.rmtree(entryDir)
+        # copy into a temporary directory first so a partial copy is never found
+        tempDir = tempfile.mkdtemp(prefix=TEMPORARY_PREFIX, dir=self._cacheDir)
+        for filename in filenames:
+            shutil.copyfile(filename, os.path.join(tempDir, os.path.basename(filename)))
+        os.rename(tempDir, entryDir)
+        self.evict()
+
+    def _getEntries(self):
+        '''
+        :return: list of (last used time, size, entry dir) for all entries
+        '''
+        entries = []
+        if not os.path.isdir(self._cacheDir):
+            return entries
+        for name in os.listdir(self._cacheDir):
+            entryDir = os.path.join(self._cacheDir, name)
+            if name.startswith(TEMPORARY_PREFIX) or not os.path.isdir(entryDir):
+                continue
+            size = sum(os.path.getsize(os.path.join(entryDir, filename)) for filename in os.listdir(entryDir))
+            entries.append((os.path.getmtime(entryDir), size, entryDir))
+        return entries
+
+    def evict(self):
+        '''
+        Remove least recently used entries until the cache fits its maximum size.
+        '''
+        entries = sorted(self._getEntries())
+        totalSize = sum(entry[1] for entry in entries)
+        for lastUsed, size, entryDir in entries:
+            if totalSize <= self._maximumSize:
+                break
+            shutil.rmtree(entryDir, ignore_errors=True)
+            totalSize -= size
+
+    def clear(self):
+        '''
+        Remove all cache entries.
+        '''
+        if os.path.isdir(self._cacheDir):
+            shutil.rmtree(self._cacheDir, ignore_errors=True)
@@ -0,0 +1,259 @@
+"""
+Local service keeping femur meshes loaded between load femur runs.
+
+The service holds one Zinc context and a least recently used set of loaded
+FemurModels keyed by input file name and contents hash, so repeated runs on
+the same mesh skip reading it, extracting its topology and building the
+quadrature and stress fit. It listens for one JSON request per line and
+answers each connection in turn, since a Zinc context must only be used
+from one thread. Only the user running it can connect: on a Unix domain
+socket with mode 0600 where available, otherwise on a local TCP port with
+requests carrying the token it writes to a private file (see
+serviceclient). Input and output files must be under its root directory.
+
+Requests are {"command": "ping"}, {"command": "shutdown"} or
+{"command": "load", "filenameIn": ..., "filenameOut": ..., "settings": {...}}.
+A load is answered with zero or more {"progress": [phase, fraction]} lines
+then {"results": {...}} as returned by loadfemur, or {"error": message}.
+Closing the connection cancels the load at its next progress report.
+
+Usage: python -m mapclientplugins.loadfemurstep.service [--port 7461] [--root DIR]
+    [--models 4] [--warm-start-dir DIR] [--log-level warning]
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import argparse
+import binascii
+import collections
+import hashlib
+import hmac
+import logging
+import os
+import socket
+import sys
+import traceback
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+from opencmiss.zinc.context import Context as ZincContext
+from mapclientplugins.loadfemurstep.loadfemur import FemurModel, createLoggernotifier, getSettings, solveFemurModel
+from mapclientplugins.loadfemurstep.logutils import LOG_LEVELS, configureLogging, flushRateLimits
+from mapclientplugins.loadfemurstep.phases import LoadFemurCancelled, PhaseMonitor
+from mapclientplugins.loadfemurstep.resultcache import hashFileContents
+from mapclientplugins.loadfemurstep.serviceclient import DEFAULT_PORT, SERVICE_DIR, SERVICE_HOST, USE_UNIX_SOCKET, \
+    LoadFemurClient, getServiceSocketFilename, getServiceTokenFilename, readMessage, writeMessage
+from mapclientplugins.loadfemurstep.warmstart import WarmStartStore
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MODELS_COUNT = 4
+
+class LoadFemurService(object):
+    """
+    Loaded femur models in one Zinc context, evicted least recently used
+    first beyond maximumModelsCount. Only files under rootDir are read or
+    written.
+    """
+
+    def __init__(self, maximumModelsCount=DEFAULT_MODELS_COUNT, warmStartStore=None, rootDir=None):
+        """
+        :param maximumModelsCount: number of models kept loaded
+        :param warmStartStore: optional WarmStartStore used with the warmStart setting
+        :param rootDir: directory containing all input and output files, default current directory
+        """
+        self._rootDir = os.path.realpath(rootDir or os.getcwd())
+        self._context = ZincContext('loadfemur_service')
+        self._loggernotifier = createLoggernotifier(self._context)
+        self._maximumModelsCount = maximumModelsCount
+        self._warmStartStore = warmStartStore
+        self._models = collections.OrderedDict()
+
+    def checkPath(self, filename):
+        """
+        :return: real path of filename
+        :raises ValueError: if filename is not under the root directory
+        """
+        path = os.path.realpath(filename)
+        rootPrefix = self._rootDir if self._rootDir.endswith(os.sep) else self._rootDir + os.sep
+        if not path.startswith(rootPrefix):
+            raise ValueError('File ' + filename + ' is outside service root directory ' + self._rootDir)
+        return path
+
+    def getModelKey(self, filenameIn):
+        """
+        :return: (absolute file name, hex digest of its contents)
+        """
+        hasher = hashlib.sha256()
+        hashFileContents(hasher, filenameIn)
+        return os.path.abspath(filenameIn), hasher.hexdigest()
+
+    def getModel(self, filenameIn, monitor):
+        """
+        :return: (FemurModel for current contents of filenameIn, True if it was already loaded)
+        """
+        key = self.getModelKey(filenameIn)
+        model = self._models.pop(key, None)
+        reused = model is not None
+        if not reused:
+            # drop any model for older contents of this file
+            for oldKey in [oldKey for oldKey in self._models if oldKey[0] == key[0]]:
+                del self._models[oldKey]
+            model = FemurModel(self._context.createRegion(), filenameIn, monitor)
+        self._models[key] = model
+        while len(self._models) > self._maximumModelsCount:
+            self._models.popitem(last=False)
+        return model, reused
+
+    def getModelsCount(self):
+        return len(self._models)
+
+    def loadfemur(self, filenameIn, filenameOut, settings=None, progress=None):
+        """
+        As loadfemur, on a resident model where possible. Metrics record
+        whether the model was reused.
+        :raises ValueError: if either file is not under the root directory
+        """
+        filenameIn = self.checkPath(filenameIn)
+        filenameOut = self.checkPath(filenameOut)
+        settings = getSettings(settings)
+        monitor = PhaseMonitor(progress)
+        model, reused = self.getModel(filenameIn, monitor)
+        monitor.setValue('modelReused', reused)
+        return solveFemurModel(model, filenameOut, settings, monitor, self._warmStartStore)
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def _progress(self, phase, fraction):
+        try:
+            writeMessage(self.wfile, { 'progress': [phase, fraction] })
+        except (IOError, OSError, socket.error):
+            # client has gone: cancel
+            return False
+        return True
+
+    def handle(self):
+        try:
+            self._handleRequest()
+        finally:
+            flushRateLimits()
+
+    def _handleRequest(self):
+        try:
+            request = readMessage(self.rfile)
+        except ValueError:
+            writeMessage(self.wfile, { 'error': 'invalid request' })
+            return
+        if request is None:
+            return
+        token = self.server.token
+        if (token is not None) and not hmac.compare_digest(str(request.get('token', '')), token):
+            writeMessage(self.wfile, { 'error': 'invalid token' })
+            return
+        command = request.get('command')
+        if command == 'ping':
+            writeMessage(self.wfile, { 'ok': True, 'models': self.server.service.getModelsCount() })
+        elif command == 'shutdown':
+            writeMessage(self.wfile, { 'ok': True })
+            self.server.shutdownRequested = True
+        elif command == 'load':
+            try:
+                results = self.server.service.loadfemur(request['filenameIn'], request['filenameOut'],
+                    request.get('settings'), progress=self._progress)
+            except LoadFemurCancelled:
+                return
+            except Exception:
+                log.exception('load %s failed', request.get('filenameIn'))
+                message = traceback.format_exc().strip().splitlines()[-1]
+                try:
+                    writeMessage(self.wfile, { 'error': message })
+                except (IOError, OSError, socket.error):
+                    pass
+                return
+            try:
+                writeMessage(self.wfile, { 'results': results })
+            except (IOError, OSError, socket.error):
+                pass
+        else:
+            writeMessage(self.wfile, { 'error': 'unknown command ' + str(command) })
+
+_ServerBase = socketserver.UnixStreamServer if USE_UNIX_SOCKET else socketserver.TCPServer
+
+class LoadFemurServer(_ServerBase):
+    """
+    Serves a LoadFemurService to the current user only, one connection at a
+    time, on the Unix domain socket for port or on the local TCP port with
+    a token.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, service, port=DEFAULT_PORT):
+        if not os.path.isdir(SERVICE_DIR):
+            os.makedirs(SERVICE_DIR, 0o700)
+        self._port = port
+        self.token = None
+        if USE_UNIX_SOCKET:
+            self.address = getServiceSocketFilename(port)
+            if os.path.exists(self.address):
+                if LoadFemurClient(port).isAvailable():
+                    raise socket.error('Load femur service already listening on ' + self.address)
+                # left by a service which did not exit cleanly
+                os.remove(self.address)
+            # create the socket file with mode 0600
+            oldUmask = os.umask(0o177)
+            try:
+                _ServerBase.__init__(self, self.address, _RequestHandler)
+            finally:
+                os.umask(oldUmask)
+        else:
+            _ServerBase.__init__(self, (SERVICE_HOST, port), _RequestHandler)
+            self.address = '%s:%d' % (SERVICE_HOST, port)
+            self.token = binascii.hexlify(os.urandom(16)).decode('ascii')
+            tokenFile = os.open(getServiceTokenFilename(port), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(tokenFile, 'w') as stream:
+                stream.write(self.token)
+        self.service = service
+        self.shutdownRequested = False
+
+    def server_close(self):
+        _ServerBase.server_close(self)
+        filename = getServiceSocketFilename(self._port) if USE_UNIX_SOCKET else getServiceTokenFilename(self._port)
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def serveUntilShutdown(self):
+        while not self.shutdownRequested:
+            self.handle_request()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Keep femur meshes loaded between load femur runs from MAP Client steps.')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='local TCP port or number of socket file to listen on')
+    parser.add_argument('--root', default=None, help='directory containing all files loaded and written, default current directory')
+    parser.add_argument('--models', type=int, default=DEFAULT_MODELS_COUNT, help='number of meshes kept loaded')
+    parser.add_argument('--warm-start-dir', default=None, help='directory of stress solutions to warm start fits from')
+    parser.add_argument('--log-level', choices=list(LOG_LEVELS), default='warning', help='lowest level of messages shown')
+    args = parser.parse_args(argv)
+    configureLogging(args.log_level)
+    warmStartStore = WarmStartStore(args.warm_start_dir) if args.warm_start_dir else None
+    service = LoadFemurService(args.models, warmStartStore, args.root)
+    server = LoadFemurServer(service, args.port)
+    sys.stdout.write('load femur service listening on %s\n' % server.address)
+    sys.stdout.flush()
+    try:
+        server.serveUntilShutdown()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
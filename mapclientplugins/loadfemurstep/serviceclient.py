@@ -0,0 +1,153 @@
+"""
+Client of the load femur service, with the message format and addresses
+shared with it. Needs no Zinc, so MAP Client steps can find and use a
+running service without loading the computation.
+
+Where Unix domain sockets are available the service listens on a socket
+file only its user can connect to, named by port in SERVICE_DIR. Otherwise
+it listens on the local TCP port and requests must include the random token
+it writes to a file in SERVICE_DIR readable only by its user.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import json
+import os
+import socket
+
+from mapclientplugins.loadfemurstep.phases import LoadFemurCancelled
+
+SERVICE_HOST = '127.0.0.1'
+DEFAULT_PORT = 7461
+# directory of service sockets and tokens, private to the user
+SERVICE_DIR = os.path.join(os.path.expanduser('~'), '.loadfemur')
+USE_UNIX_SOCKET = hasattr(socket, 'AF_UNIX')
+
+class LoadFemurServiceError(Exception):
+    """
+    Raised by the client when the service reports that a load failed.
+    """
+    pass
+
+def getServiceSocketFilename(port):
+    """
+    :return: name of Unix domain socket file of service for port
+    """
+    return os.path.join(SERVICE_DIR, 'service-%d.sock' % port)
+
+def getServiceTokenFilename(port):
+    """
+    :return: name of file holding token of TCP service on port
+    """
+    return os.path.join(SERVICE_DIR, 'service-%d.token' % port)
+
+def readServiceToken(port):
+    """
+    :return: token of TCP service on port
+    :raises IOError: if no service has written one
+    """
+    with open(getServiceTokenFilename(port)) as stream:
+        return stream.read().strip()
+
+def writeMessage(stream, message):
+    stream.write((json.dumps(message) + '\n').encode('utf-8'))
+    stream.flush()
+
+def readMessage(stream):
+    """
+    :return: decoded message, or None at end of stream
+    """
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+class LoadFemurClient(object):
+    """
+    Runs load femur in a LoadFemurService, with the same call signature as
+    loadfemur for use with BackgroundExecution.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, timeout=None):
+        """
+        :param port: port of service, which also names its socket file
+        :param timeout: seconds to wait for each message from the service, default forever
+        """
+        self._port = port
+        self._timeout = timeout
+
+    def _connect(self, timeout):
+        if USE_UNIX_SOCKET:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                connection.settimeout(timeout)
+                connection.connect(getServiceSocketFilename(self._port))
+            except (IOError, OSError, socket.error):
+                connection.close()
+                raise
+            return connection
+        return socket.create_connection((SERVICE_HOST, self._port), timeout)
+
+    def _writeRequest(self, stream, request):
+        if not USE_UNIX_SOCKET:
+            request['token'] = readServiceToken(self._port)
+        writeMessage(stream, request)
+
+    def isAvailable(self, timeout=0.5):
+        """
+        :return: True if a service answers a ping within timeout seconds
+        """
+        try:
+            connection = self._connect(timeout)
+            try:
+                stream = connection.makefile('rwb')
+                self._writeRequest(stream, { 'command': 'ping' })
+                reply = readMessage(stream)
+                stream.close()
+            finally:
+                connection.close()
+        except (IOError, OSError, socket.error, ValueError):
+            return False
+        return (reply is not None) and reply.get('ok', False)
+
+    def loadfemur(self, filenameIn, filenameOut, settings=None, progress=None):
+        """
+        :param progress: optional callable(phase, fraction); returning False
+        closes the connection, cancelling the load in the service
+        :return: dict of results as for loadfemur
+        :raises LoadFemurCancelled: if cancelled by progress
+        :raises LoadFemurServiceError: if the load failed in the service
+        """
+        connection = self._connect(self._timeout)
+        try:
+            stream = connection.makefile('rwb')
+            # the service may have a different working directory
+            self._writeRequest(stream, { 'command': 'load', 'filenameIn': os.path.abspath(filenameIn),
+                'filenameOut': os.path.abspath(filenameOut), 'settings': settings })
+            while True:
+                message = readMessage(stream)
+                if message is None:
+                    raise LoadFemurServiceError('Connection to load femur service closed')
+                if 'progress' in message:
+                    if (progress is not None) and (progress(*message['progress']) is False):
+                        raise LoadFemurCancelled()
+                elif 'error' in message:
+                    raise LoadFemurServiceError(message['error'])
+                else:
+                    return message['results']
+        finally:
+            connection.close()
+
+    def shutdown(self):
+        """
+        Ask the service to stop after the current request.
+        """
+        connection = self._connect(self._timeout)
+        try:
+            stream = connection.makefile('rwb')
+            self._writeRequest(stream, { 'command': 'shutdown' })
+            readMessage(stream)
+        finally:
+            connection.close()
@@ -0,0 +1,52 @@
+"""
+Solver settings of the load femur computation and their defaults, kept
+free of Zinc imports so the step can be listed and configured without
+loading the computation.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import copy
+
+# solver settings and their default values
+DEFAULT_SETTINGS = {
+    'plateOffset': 0.05,  # plate centre offset from row 1 as a fraction of row 1 to top distance
+    'numberOfPoints': 4,  # Gauss points per element direction for force and stress fit
+    'maximumIterations': 3,  # maximum stress fit optimisation iterations
+    'sweepStart': 0.0,  # first plate offset in force-displacement sweep
+    'sweepStop': 0.1,  # last plate offset in force-displacement sweep
+    'sweepSamples': 0,  # number of plate offsets in sweep, 0 for no sweep
+    'contactBackend': 'zinc',  # 'zinc' field graph or 'numpy' for plate contact and force
+    'stressSolver': 'optimiser',  # 'optimiser' for Zinc least squares, 'direct' sparse solve or 'multilevel'
+    'multilevelRowStep': 2,  # rows of elements merged in the multilevel coarse fit
+    'refineIterations': 20,  # maximum conjugate gradient iterations refining the multilevel coarse fit
+    'refineTolerance': 1.0E-6,  # relative residual at which multilevel refinement stops
+    'forceTolerance': 0.0,  # relative estimated error of force refining elements the plate boundary crosses, 0 for the fixed rule
+    'forceRefinementLevels': 4,  # maximum refinements of crossed elements with a force tolerance
+    'forceEvaluationBudget': 64,  # maximum points refining each crossed element as a multiple of the fixed rule, 0 for no limit
+    'cullContact': False,  # integrate force and fit stress only near elements which can touch the plate
+    'outputMode': 'exfile',  # 'exfile' whole region, 'sidecar' stress and force only, or 'both'
+    'writeResults': True,  # write outputs of outputMode; False when only the returned region is used
+    'targetForce': 0.0,  # solve for the plate offset giving this force, 0 to use plateOffset
+    'targetForceTolerance': 1.0E-6,  # relative tolerance on force for the target force solve
+    'loadCaseAngles': [],  # plate tilt angles in degrees about axis, one stress field each; empty for one untilted case
+    'warmStart': False,  # start the stress optimiser from the last solution for the same mesh topology
+    'stressFitTolerance': 0.0,  # stop optimising when the objective falls by less than this fraction, 0 to run all iterations
+    'optimiseChunkIterations': 0,  # optimiser iterations per call between progress checks, 0 for all in one call or 1 with a stressFitTolerance
+}
+
+CONTACT_BACKENDS = ['zinc', 'numpy']
+STRESS_SOLVERS = ['optimiser', 'direct', 'multilevel']
+OUTPUT_MODES = ['exfile', 'sidecar', 'both']
+
+def getSettings(settings=None):
+    """
+    :param settings: dict of settings overriding DEFAULT_SETTINGS, or None
+    :return: complete settings dict, sharing no lists with DEFAULT_SETTINGS or settings
+    """
+    completeSettings = dict(DEFAULT_SETTINGS)
+    if settings:
+        completeSettings.update((key, value) for key, value in settings.items() if key in DEFAULT_SETTINGS)
+    return copy.deepcopy(completeSettings)
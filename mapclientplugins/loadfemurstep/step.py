@@ -2,15 +2,37 @@
 '''
 MAP Client Plugin Step
 '''
-from os.path import join, isdir
+from os.path import join, isdir, basename, dirname
 from os import mkdir
+import functools
 import json
+import logging
+import shutil
 
 from PySide import QtGui
 
 from mapclient.mountpoints.workflowstep import WorkflowStepMountPoint
-from mapclientplugins.loadfemurstep.configuredialog import ConfigureDialog
-from mapclientplugins.loadfemurstep.loadfemur import loadfemur, write_simpleviz_script
+from mapclientplugins.loadfemurstep import __version__
+# only modules without Zinc, NumPy or dialog imports here: the MAP Client
+# creates every step to list plugins, so the computation is imported on
+# execute and the dialog on configure
+from mapclientplugins.loadfemurstep.phases import LoadFemurCancelled
+from mapclientplugins.loadfemurstep.resultcache import ResultCache
+from mapclientplugins.loadfemurstep.serviceclient import DEFAULT_PORT, LoadFemurClient
+from mapclientplugins.loadfemurstep.settings import getSettings
+
+log = logging.getLogger(__name__)
+
+PHASE_DESCRIPTIONS = {
+    'read': 'Reading femur mesh...',
+    'topology': 'Extracting mesh topology...',
+    'stress': 'Defining stress field...',
+    'force': 'Integrating contact force...',
+    'sweep': 'Sweeping plate offsets...',
+    'seed': 'Seeding stress fit...',
+    'optimise': 'Fitting stress...',
+    'write': 'Writing results...',
+}
 
 class LoadFemurStep(WorkflowStepMountPoint):
     '''
@@ -23,7 +45,7 @@ class LoadFemurStep(WorkflowStepMountPoint):
         self._configured = False # A step cannot be executed until it has been configured.
         self._category = 'Fitting'
         # Add any other initialisation code here:
-        self._icon =  QtGui.QImage(':/loadfemurstep/images/fitting.png')
+        self._loadedIcon = None # loaded on first use of _icon
         # Ports:
         self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
                       'http://physiomeproject.org/workflow/1.0/rdf-schema#uses',
@@ -31,14 +53,46 @@ class LoadFemurStep(WorkflowStepMountPoint):
         self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
                       'http://physiomeproject.org/workflow/1.0/rdf-schema#provides',
                       'http://physiomeproject.org/workflow/1.0/rdf-schema#file_location'))
+        self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
+                      'http://physiomeproject.org/workflow/1.0/rdf-schema#provides',
+                      'http://physiomeproject.org/workflow/1.0/rdf-schema#zinc_region'))
         # Port data:
         self._portData0 = None # http://physiomeproject.org/workflow/1.0/rdf-schema#file_location
         self._portData1 = None # http://physiomeproject.org/workflow/1.0/rdf-schema#file_location
+        self._portData2 = None # http://physiomeproject.org/workflow/1.0/rdf-schema#zinc_region
+        # results files to read into _portData2 if it is requested when not computed here
+        self._resultsFilename = None
         # Config:
         self._config = {}
         self._config['identifier'] = ''
+        self._config['useResultCache'] = True
+        self._config['resultCacheSize'] = 500 # MB
+        self._config['useService'] = False
+        self._config['servicePort'] = DEFAULT_PORT
+        self._config.update(getSettings())
+        # Background execution state:
+        self._execution = None
+        self._progressDialog = None
+        # Zinc context owning regions handed to later steps, created on first execute
+        self._context = None
+        self._loggernotifier = None
 
 
+    @property
+    def _icon(self):
+        '''
+        The icon and its Qt resources are loaded on first use rather than
+        when the plugin is discovered.
+        '''
+        if self._loadedIcon is None:
+            from mapclientplugins.loadfemurstep import resources_rc
+            self._loadedIcon = QtGui.QImage(':/loadfemurstep/images/fitting.png')
+        return self._loadedIcon
+
+    @_icon.setter
+    def _icon(self, icon):
+        self._loadedIcon = icon
+
     def execute(self):
         '''
         Add your code here that will kick off the execution of the step.
@@ -46,16 +100,116 @@ class LoadFemurStep(WorkflowStepMountPoint):
         may be connected up to a button in a widget for example.
         '''
         # Put your execute step code here before calling the '_doneExecution' method.
+        from opencmiss.zinc.context import Context as ZincContext
+        from mapclientplugins.loadfemurstep.backgroundexecution import BackgroundExecution
+        from mapclientplugins.loadfemurstep.loadfemur import createLoggernotifier, loadfemur, removeOutputFiles
         output_dir = join(self._location, self.getIdentifier() + '_output')
         if not isdir(output_dir):
             mkdir(output_dir)
 
         output_exfile = join(output_dir, 'results.exfile')
-        self._portData1 = join(output_dir, 'simpleviz.py')
-        loadfemur(self._portData0, output_exfile)
-        write_simpleviz_script(self._portData1, output_exfile)
+        self._portData1 = None
+        self._portData2 = None
+        self._resultsFilename = None
+        if self._context is None:
+            # kept for the life of the step so regions handed on stay usable
+            self._context = ZincContext('loadfemur')
+            self._loggernotifier = createLoggernotifier(self._context)
+        settings = getSettings(self._config)
+        cacheKey = None
+        cachedFilenames = None
+        # without results files there is nothing to cache or read back, and warm started
+        # results depend on the stored solutions, which each run replaces
+        if self._config['useResultCache'] and settings['writeResults'] and not settings['warmStart']:
+            resultCache = self._getResultCache()
+            cacheKey = resultCache.getKey(self._portData0, __version__, settings)
+            cachedFilenames = resultCache.lookup(cacheKey)
+        if cachedFilenames:
+            # outputs of an earlier run, possibly in another output mode, must not be left beside cached results
+            removeOutputFiles(output_exfile)
+            for cachedFilename in cachedFilenames:
+                shutil.copyfile(cachedFilename, join(output_dir, basename(cachedFilename)))
+            self._finishExecution(output_exfile)
+            return
+
+        # run in a background thread so the GUI stays responsive
+        self._progressDialog = QtGui.QProgressDialog('Loading femur...', 'Cancel', 0, 100)
+        self._progressDialog.setWindowTitle('Load Femur')
+        self._progressDialog.setMinimumDuration(0)
+        function = None
+        # the service's regions are in another process, so results must be read from files
+        if self._config['useService'] and settings['writeResults']:
+            client = LoadFemurClient(self._config['servicePort'])
+            if client.isAvailable():
+                function = client.loadfemur
+        if function is None:
+            function = functools.partial(loadfemur, context=self._context, warmStartStore=self._getWarmStartStore())
+        self._execution = BackgroundExecution(function,
+            (self._portData0, output_exfile, settings),
+            self._executionProgressed, lambda results, error: self._executionDone(results, error, output_exfile, cacheKey))
+        self._progressDialog.canceled.connect(self._execution.cancel)
+        self._execution.start()
+
+    def _executionProgressed(self, phase, fraction):
+        self._progressDialog.setLabelText(PHASE_DESCRIPTIONS.get(phase, phase))
+        self._progressDialog.setValue(int(100*fraction))
+
+    def _executionDone(self, results, error, output_exfile, cacheKey):
+        self._progressDialog.reset()
+        self._progressDialog = None
+        self._execution = None
+        if error is None:
+            if cacheKey is not None:
+                try:
+                    self._getResultCache().store(cacheKey, results['outputFilenames'] + [results['metricsFilename']])
+                except (IOError, OSError):
+                    # the results are written, only later runs lose the cached copy
+                    log.exception('Failed to store load femur results in the cache')
+            self._portData2 = results.get('region')
+            self._finishExecution(output_exfile)
+            return
+        # leave the step unexecuted with no outputs, so later steps are not run on stale or missing data
+        self._portData1 = None
+        self._portData2 = None
+        self._resultsFilename = None
+        if isinstance(error, LoadFemurCancelled):
+            QtGui.QMessageBox.information(None, 'Load Femur', 'Load femur cancelled. Execute the workflow again to rerun it.')
+        else:
+            QtGui.QMessageBox.critical(None, 'Load Femur', 'Load femur failed: ' + str(error))
+
+    def _finishExecution(self, output_exfile):
+        from mapclientplugins.loadfemurstep.loadfemur import getStressSidecarFilename, write_simpleviz_script
+        if not self._config['writeResults']:
+            self._doneExecution()
+            return
+        self._resultsFilename = output_exfile
+        self._portData1 = join(dirname(output_exfile), 'simpleviz.py')
+        if self._config['outputMode'] == 'sidecar':
+            # stress only: view with the input mesh
+            write_simpleviz_script(self._portData1, self._portData0, getStressSidecarFilename(output_exfile))
+        else:
+            write_simpleviz_script(self._portData1, output_exfile)
         self._doneExecution()
 
+    def _getResultCache(self):
+        '''
+        The result cache is shared by all load femur steps in the workflow.
+        '''
+        return ResultCache(join(self._location, 'loadfemur_cache'), self._config['resultCacheSize']*1024*1024)
+
+    def _getWarmStartStore(self):
+        '''
+        Last stress solutions by mesh topology, used with the warmStart setting.
+        '''
+        from mapclientplugins.loadfemurstep.warmstart import WarmStartStore
+        return WarmStartStore(join(self._location, 'loadfemur_warmstart'))
+
+    def _clearResultCache(self):
+        self._getResultCache().clear()
+        # input mesh snapshots written by earlier versions
+        shutil.rmtree(join(self._location, 'loadfemur_snapshots'), ignore_errors=True)
+        self._getWarmStartStore().clear()
+
     def setPortData(self, index, dataIn):
         '''
         Add your code here that will set the appropriate objects for this step.
@@ -70,8 +224,22 @@ class LoadFemurStep(WorkflowStepMountPoint):
         The index is the index of the port in the port list.  If there is only one
         provides port for this step then the index can be ignored.
         '''
+        if index == 2:
+            return self._getRegion() # http://physiomeproject.org/workflow/1.0/rdf-schema#zinc_region
         return self._portData1 # http://physiomeproject.org/workflow/1.0/rdf-schema#file_location
 
+    def _getRegion(self):
+        '''
+        The region computed in this process, or for results from the cache or
+        the service, one read from the results files on first request.
+        '''
+        if (self._portData2 is None) and (self._resultsFilename is not None):
+            from mapclientplugins.loadfemurstep.loadfemur import readResults
+            region = self._context.createRegion()
+            if readResults(region, self._portData0, self._resultsFilename, self._config['outputMode']):
+                self._portData2 = region
+        return self._portData2
+
     def configure(self):
         '''
         This function will be called when the configure icon on the step is
@@ -80,14 +248,16 @@ class LoadFemurStep(WorkflowStepMountPoint):
         then set:
             self._configured = True
         '''
+        from mapclientplugins.loadfemurstep.configuredialog import ConfigureDialog
         dlg = ConfigureDialog()
         dlg.identifierOccursCount = self._identifierOccursCount
+        dlg.clearResultCache = self._clearResultCache
         dlg.setConfig(self._config)
         dlg.validate()
         dlg.setModal(True)
 
         if dlg.exec_():
-            self._config = dlg.getConfig()
+            self._config.update(dlg.getConfig())
 
         self._configured = dlg.validate()
         self._configuredObserver()
@@ -119,6 +289,7 @@ class LoadFemurStep(WorkflowStepMountPoint):
         '''
         self._config.update(json.loads(string))
 
+        from mapclientplugins.loadfemurstep.configuredialog import ConfigureDialog
         d = ConfigureDialog()
         d.identifierOccursCount = self._identifierOccursCount
         d.setConfig(self._config)
@@ -0,0 +1,292 @@
+"""
+Sparse linear least-squares fits of stress to penetration: direct, and
+multilevel with a coarse solve on a subset of rings of nodes refined by
+conjugate gradients.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import numpy
+import scipy.sparse
+import scipy.sparse.linalg
+from mapclientplugins.loadfemurstep.hermitemesh import BICUBIC_HERMITE_FUNCTIONS_COUNT, HERMITE_VALUE_LABELS, \
+    cubicHermiteBasis
+
+class StressFitSystem(object):
+    """
+    The stress fit objective, the integral of squares of stress - [penetration, 0, 0]
+    over the surface, is quadratic in the stress nodal parameters. Its
+    minimum solves M s = b with M the Hermite mass matrix and b the
+    penetration load vector, which are assembled with sparse arrays from the
+    same Gauss points as the Zinc objective.
+    """
+
+    def __init__(self, hermiteMesh, quadrature):
+        """
+        :param hermiteMesh: HermiteMesh shared by coordinates and stress
+        :param quadrature: SurfaceQuadrature of coordinates
+        """
+        self._quadrature = quadrature
+        elementsCount = hermiteMesh.getElementsCount()
+        dofsCount = hermiteMesh.getDofsCount()
+        functionsCount = BICUBIC_HERMITE_FUNCTIONS_COUNT
+        # map from global DOFs to element basis function parameters
+        self._elementMap = scipy.sparse.csr_matrix(
+            (hermiteMesh.mapValues, (hermiteMesh.mapRows, hermiteMesh.mapColumns)),
+            shape=(elementsCount*functionsCount, dofsCount))
+        basis = quadrature.basis
+        elementMassMatrices = numpy.einsum('eq,qi,qj->eij', quadrature.areaWeights, basis, basis)
+        localIndexes = numpy.arange(functionsCount)
+        rows = (numpy.arange(elementsCount)[:, numpy.newaxis, numpy.newaxis]*functionsCount
+                + localIndexes[numpy.newaxis, :, numpy.newaxis]) + numpy.zeros((1, 1, functionsCount), dtype=numpy.int64)
+        columns = numpy.swapaxes(rows, 1, 2)
+        blockMassMatrix = scipy.sparse.csr_matrix(
+            (elementMassMatrices.reshape(-1), (rows.reshape(-1), columns.reshape(-1))),
+            shape=(elementsCount*functionsCount, elementsCount*functionsCount))
+        self.massMatrix = (self._elementMap.T*blockMassMatrix*self._elementMap).tocsc()
+        # DOFs not used by any element, or with zero scaling, have empty rows and are left zero
+        self._activeDofs = numpy.nonzero(self.massMatrix.diagonal() > 0.0)[0]
+
+    def getLoadVector(self, pointPenetrations):
+        """
+        :param pointPenetrations: float array (elementsCount, pointsCount)
+        :return: float array (dofsCount) of integral of basis times penetration
+        """
+        quadrature = self._quadrature
+        elementLoads = numpy.einsum('eq,qi->ei', quadrature.areaWeights*pointPenetrations, quadrature.basis)
+        return self._elementMap.T.dot(elementLoads.reshape(-1))
+
+    def evaluateObjective(self, dofValues, pointPenetrations):
+        """
+        :param dofValues: float array (dofsCount, 3) of stress nodal parameters
+        :param pointPenetrations: float array (elementsCount, pointsCount)
+        :return: integral of squares of stress - [penetration, 0, 0]
+        """
+        quadrature = self._quadrature
+        elementsCount, pointsCount = pointPenetrations.shape
+        elementParameters = self._elementMap.dot(dofValues).reshape((elementsCount, BICUBIC_HERMITE_FUNCTIONS_COUNT, 3))
+        error = numpy.einsum('qf,efc->eqc', quadrature.basis, elementParameters)
+        error[:, :, 0] -= pointPenetrations
+        return float(numpy.sum(quadrature.areaWeights[:, :, numpy.newaxis]*error*error))
+
+class DirectStressFit(StressFitSystem):
+    """
+    Solves the stress fit directly, keeping the factorised mass matrix for
+    reuse with other penetrations.
+    """
+
+    def __init__(self, hermiteMesh, quadrature):
+        """
+        :param hermiteMesh: HermiteMesh shared by coordinates and stress
+        :param quadrature: SurfaceQuadrature of coordinates
+        """
+        StressFitSystem.__init__(self, hermiteMesh, quadrature)
+        activeMassMatrix = self.massMatrix[self._activeDofs][:, self._activeDofs]
+        self._solveActive = scipy.sparse.linalg.factorized(activeMassMatrix.tocsc())
+
+    def solve(self, pointPenetrations):
+        """
+        :param pointPenetrations: float array (elementsCount, pointsCount)
+        :return: float array (dofsCount, 3) of stress nodal parameters
+        """
+        loadVector = self.getLoadVector(pointPenetrations)
+        dofValues = numpy.zeros((self._elementMap.shape[1], 3))
+        dofValues[self._activeDofs, 0] = self._solveActive(loadVector[self._activeDofs])
+        return dofValues
+
+def getRowProlongation(hermiteMesh, ringNodeIdentifiers, rowStep):
+    """
+    Hermite prolongation from the nodal parameters of every rowStep-th ring
+    of nodes and the last ring to those of all rings, as for elements merged
+    rowStep at a time along the rows. Parameters of rings in between are
+    interpolated from the rings either side at the same position around with
+    cubic Hermite functions in xi2, d/ds2 and d2/ds1ds2 scaled for the span.
+    Nodes in no ring, such as the apex, are kept.
+    :param hermiteMesh: HermiteMesh
+    :param ringNodeIdentifiers: list of node identifier lists of each ring
+    from the apex end, in the same order around
+    :param rowStep: number of rows between kept rings
+    :return: sparse matrix (dofsCount, coarseDofsCount)
+    """
+    dofsCount = hermiteMesh.getDofsCount()
+    dofIndexes = {}
+    for d in range(dofsCount):
+        dofIndexes[(int(hermiteMesh.dofNodeIdentifiers[d]), int(hermiteMesh.dofValueLabels[d]), int(hermiteMesh.dofVersions[d]))] = d
+    valueLabel, ds1Label, ds2Label, ds1ds2Label = [int(label) for label in HERMITE_VALUE_LABELS]
+    # label interpolated: (label of value pair, label of xi2 derivative pair, True if label is the derivative)
+    labelPairs = {
+        valueLabel: (valueLabel, ds2Label, False),
+        ds2Label: (valueLabel, ds2Label, True),
+        ds1Label: (ds1Label, ds1ds2Label, False),
+        ds1ds2Label: (ds1Label, ds1ds2Label, True),
+    }
+    lastRing = len(ringNodeIdentifiers) - 1
+    # node identifier -> (lower ring, upper ring, position around, fraction between)
+    interpolatedNodes = {}
+    for ring in range(lastRing + 1):
+        lowerRing = (ring//rowStep)*rowStep
+        if ring == lowerRing:
+            continue
+        upperRing = min(lowerRing + rowStep, lastRing)
+        if ring == upperRing:
+            continue
+        for position, nodeIdentifier in enumerate(ringNodeIdentifiers[ring]):
+            if (position < len(ringNodeIdentifiers[lowerRing])) and (position < len(ringNodeIdentifiers[upperRing])):
+                interpolatedNodes[nodeIdentifier] = (lowerRing, upperRing, position,
+                    float(ring - lowerRing)/float(upperRing - lowerRing))
+    rows = []
+    columns = []
+    values = []
+    coarseDofs = []
+    for d in range(dofsCount):
+        nodeIdentifier = int(hermiteMesh.dofNodeIdentifiers[d])
+        interpolation = interpolatedNodes.get(nodeIdentifier)
+        label = int(hermiteMesh.dofValueLabels[d])
+        if (interpolation is None) or (label not in labelPairs):
+            rows.append(d)
+            columns.append(d)
+            values.append(1.0)
+            coarseDofs.append(d)
+            continue
+        lowerRing, upperRing, position, t = interpolation
+        span = float(upperRing - lowerRing)
+        basis, derivatives = cubicHermiteBasis([t])
+        pairValueLabel, pairDerivativeLabel, isDerivative = labelPairs[label]
+        if isDerivative:
+            weights = derivatives[0]*[1.0/span, 1.0, 1.0/span, 1.0]
+        else:
+            weights = basis[0]*[1.0, span, 1.0, span]
+        version = int(hermiteMesh.dofVersions[d])
+        sources = []
+        for ring in (lowerRing, upperRing):
+            sourceNodeIdentifier = ringNodeIdentifiers[ring][position]
+            for sourceLabel in (pairValueLabel, pairDerivativeLabel):
+                source = dofIndexes.get((sourceNodeIdentifier, sourceLabel, version))
+                if source is None:
+                    source = dofIndexes.get((sourceNodeIdentifier, sourceLabel, 1))
+                sources.append(source)
+        for source, weight in zip(sources, weights):
+            if (source is not None) and (weight != 0.0):
+                rows.append(d)
+                columns.append(source)
+                values.append(weight)
+    # columns are fine DOF indexes: renumber kept DOFs compactly
+    coarseIndexes = numpy.full(dofsCount, -1, dtype=numpy.int64)
+    coarseIndexes[coarseDofs] = numpy.arange(len(coarseDofs))
+    columns = coarseIndexes[numpy.array(columns, dtype=numpy.int64)]
+    # a source which is itself interpolated, e.g. from an irregular ring, is dropped
+    keep = columns >= 0
+    return scipy.sparse.csr_matrix((numpy.array(values)[keep], (numpy.array(rows, dtype=numpy.int64)[keep], columns[keep])),
+                                   shape=(dofsCount, len(coarseDofs)))
+
+def getBlockJacobiPreconditioner(matrix, dofNodeIdentifiers):
+    """
+    :param matrix: sparse symmetric positive definite matrix over DOFs
+    :param dofNodeIdentifiers: int array node of each DOF
+    :return: sparse block diagonal inverse of the blocks of matrix coupling
+    DOFs of the same node
+    """
+    matrix = matrix.tocsr()
+    order = numpy.argsort(dofNodeIdentifiers, kind='mergesort')
+    sortedNodeIdentifiers = dofNodeIdentifiers[order]
+    starts = numpy.flatnonzero(numpy.r_[True, sortedNodeIdentifiers[1:] != sortedNodeIdentifiers[:-1]])
+    stops = numpy.r_[starts[1:], len(order)]
+    rows = []
+    columns = []
+    values = []
+    for start, stop in zip(starts, stops):
+        dofs = order[start:stop]
+        blockInverse = numpy.linalg.inv(matrix[dofs][:, dofs].toarray())
+        blockRows, blockColumns = numpy.meshgrid(dofs, dofs, indexing='ij')
+        rows.append(blockRows.reshape(-1))
+        columns.append(blockColumns.reshape(-1))
+        values.append(blockInverse.reshape(-1))
+    return scipy.sparse.csr_matrix((numpy.concatenate(values), (numpy.concatenate(rows), numpy.concatenate(columns))),
+                                   shape=matrix.shape)
+
+class MultilevelStressFit(StressFitSystem):
+    """
+    Solves the stress fit on the coarse space of a prolongation directly,
+    then refines the prolongated solution on the full mesh with conjugate
+    gradients, preconditioned by the inverse of each node's block of the
+    mass matrix which couples its value and derivatives. The coarse system
+    is much smaller and its solution a good start, so few iterations are
+    needed to reach a given residual.
+    """
+
+    def __init__(self, hermiteMesh, quadrature, prolongation):
+        """
+        :param hermiteMesh: HermiteMesh shared by coordinates and stress
+        :param quadrature: SurfaceQuadrature of coordinates
+        :param prolongation: sparse matrix (dofsCount, coarseDofsCount) from getRowProlongation
+        """
+        StressFitSystem.__init__(self, hermiteMesh, quadrature)
+        self._prolongation = prolongation.tocsr()
+        coarseMassMatrix = (self._prolongation.T*self.massMatrix*self._prolongation).tocsc()
+        self._activeCoarseDofs = numpy.nonzero(coarseMassMatrix.diagonal() > 0.0)[0]
+        self._solveCoarse = scipy.sparse.linalg.factorized(
+            coarseMassMatrix[self._activeCoarseDofs][:, self._activeCoarseDofs].tocsc())
+        self._activeMassMatrix = self.massMatrix[self._activeDofs][:, self._activeDofs].tocsr()
+        self._preconditioner = getBlockJacobiPreconditioner(self._activeMassMatrix,
+                                                            hermiteMesh.dofNodeIdentifiers[self._activeDofs])
+        self.iterations = 0
+        self.residuals = []
+
+    def _solveCoarseSystem(self, loadVector):
+        """
+        :param loadVector: float array (dofsCount)
+        :return: float array (dofsCount) of prolongated coarse solution
+        """
+        coarseLoadVector = self._prolongation.T.dot(loadVector)
+        coarseDofValues = numpy.zeros(self._prolongation.shape[1])
+        coarseDofValues[self._activeCoarseDofs] = self._solveCoarse(coarseLoadVector[self._activeCoarseDofs])
+        return self._prolongation.dot(coarseDofValues)
+
+    def getCoarseDofsCount(self):
+        return self._prolongation.shape[1]
+
+    def solve(self, pointPenetrations, maximumIterations, tolerance=0.0, coarseStart=True):
+        """
+        Records the iterations taken and relative residual norms from the
+        start in iterations and residuals.
+        :param pointPenetrations: float array (elementsCount, pointsCount)
+        :param maximumIterations: maximum conjugate gradient iterations on the full mesh
+        :param tolerance: stop when the residual norm relative to the load is at most this
+        :param coarseStart: start from the coarse solution if True, otherwise
+        from zero as a single-level solve
+        :return: float array (dofsCount, 3) of stress nodal parameters
+        """
+        loadVector = self.getLoadVector(pointPenetrations)
+        dofValues = numpy.zeros(self._prolongation.shape[0])
+        if coarseStart:
+            dofValues = self._solveCoarseSystem(loadVector)
+        x = dofValues[self._activeDofs]
+        b = loadVector[self._activeDofs]
+        loadNorm = numpy.linalg.norm(b)
+        r = b - self._activeMassMatrix.dot(x)
+        residuals = [numpy.linalg.norm(r)/loadNorm if (loadNorm > 0.0) else 0.0]
+        z = self._preconditioner.dot(r)
+        p = z.copy()
+        rz = numpy.dot(r, z)
+        iterations = 0
+        while (iterations < maximumIterations) and (residuals[-1] > tolerance):
+            Ap = self._activeMassMatrix.dot(p)
+            pAp = numpy.dot(p, Ap)
+            if pAp <= 0.0:
+                break
+            alpha = rz/pAp
+            x += alpha*p
+            r -= alpha*Ap
+            iterations += 1
+            residuals.append(numpy.linalg.norm(r)/loadNorm)
+            z = self._preconditioner.dot(r)
+            rzNew = numpy.dot(r, z)
+            p = z + (rzNew/rz)*p
+            rz = rzNew
+        self.iterations = iterations
+        self.residuals = residuals
+        result = numpy.zeros((self._prolongation.shape[0], 3))
+        result[self._activeDofs, 0] = x
+        return result
@@ -0,0 +1,125 @@
+"""
+Stress field definition and the stress sidecar file, which holds only the
+results of loadfemur for a region holding the input mesh. Imports only
+Zinc and NumPy so generated scripts can load sidecars without the rest of
+the computation.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import os
+
+import numpy
+from opencmiss.zinc.field import Field
+from mapclientplugins.loadfemurstep.hermitemesh import HERMITE_VALUE_LABELS, HermiteMesh
+
+def createStressField(fm, mesh, nodes, coordinates, name="stress"):
+    """
+    Define a 3-component field with the same nodal template and element field
+    templates as coordinates, without re-reading the input file.
+    Parameters of the new field are all zero.
+    :param name: name of field to create
+    :return: the new finite element field
+    """
+    fm.beginChange()
+    stress = fm.createFieldFiniteElement(3)
+    stress.setName(name)
+    stress.setManaged(True)
+    stress.setTypeCoordinate(False)
+    # nodes: one stress node template per distinct set of value versions
+    coordinatesNodetemplate = nodes.createNodetemplate()
+    stressNodetemplates = {}
+    nodeiterator = nodes.createNodeiterator()
+    node = nodeiterator.next()
+    while node.isValid():
+        coordinatesNodetemplate.defineFieldFromNode(coordinates, node)
+        versions = tuple(coordinatesNodetemplate.getValueNumberOfVersions(coordinates, -1, valueLabel)
+                         for valueLabel in HERMITE_VALUE_LABELS)
+        stressNodetemplate = stressNodetemplates.get(versions)
+        if stressNodetemplate is None:
+            stressNodetemplate = nodes.createNodetemplate()
+            stressNodetemplate.defineField(stress)
+            for valueLabel, versionsCount in zip(HERMITE_VALUE_LABELS, versions):
+                stressNodetemplate.setValueNumberOfVersions(stress, -1, valueLabel, versionsCount)
+            stressNodetemplates[versions] = stressNodetemplate
+        node.merge(stressNodetemplate)
+        node = nodeiterator.next()
+    # elements: reuse each element field template of coordinates
+    eftElementtemplates = []
+    elementiterator = mesh.createElementiterator()
+    element = elementiterator.next()
+    while element.isValid():
+        eft = element.getElementfieldtemplate(coordinates, -1)
+        if eft.isValid():
+            elementtemplate = None
+            for knownEft, knownElementtemplate in eftElementtemplates:
+                if knownEft == eft:
+                    elementtemplate = knownElementtemplate
+                    break
+            if elementtemplate is None:
+                elementtemplate = mesh.createElementtemplate()
+                elementtemplate.defineField(stress, -1, eft)
+                eftElementtemplates.append((eft, elementtemplate))
+            element.merge(elementtemplate)
+        element = elementiterator.next()
+    fm.endChange()
+    return stress
+
+def getStressSidecarFilename(filenameOut):
+    """
+    :return: name of stress sidecar file written alongside filenameOut
+    """
+    return os.path.splitext(filenameOut)[0] + '_stress.npz'
+
+def write_stress_sidecar(filename, hermiteMesh, fieldsDofValues, fieldsForce, plateElementIdentifiers):
+    """
+    Write only the results to a binary NumPy file: stress nodal parameters
+    keyed by node identifier, value label and version, force for each stress
+    field and the plate group's elements. Read with loadStressSidecar into a
+    region holding the input mesh.
+    :param fieldsDofValues: dict of field name to float array (dofsCount, 3) of
+    nodal parameters by HermiteMesh DOF
+    :param fieldsForce: dict of field name to force value
+    """
+    fieldNames = sorted(fieldsDofValues.keys())
+    arrays = dict(('values_' + name, fieldsDofValues[name]) for name in fieldNames)
+    # Zinc identifiers are 32-bit and value labels are below 256; versions take the smallest type holding them
+    versions = numpy.asarray(hermiteMesh.dofVersions)
+    with open(filename, 'wb') as outfile:
+        numpy.savez(outfile,
+            nodeIdentifiers=numpy.asarray(hermiteMesh.dofNodeIdentifiers, dtype=numpy.int32),
+            valueLabels=numpy.asarray(hermiteMesh.dofValueLabels, dtype=numpy.uint8),
+            versions=versions.astype(numpy.min_scalar_type(int(versions.max()) if len(versions) else 1)),
+            fieldNames=numpy.array(fieldNames),
+            forces=numpy.array([fieldsForce[name] for name in fieldNames]),
+            plateElementIdentifiers=numpy.array(plateElementIdentifiers, dtype=numpy.int32),
+            **arrays)
+
+def loadStressSidecar(region, filename):
+    """
+    Define the stress fields and plate group in a region already holding
+    the input mesh from a sidecar written by write_stress_sidecar.
+    :return: dict of stress field name to force value
+    """
+    fm = region.getFieldmodule()
+    coordinates = fm.findFieldByName("coordinates").castFiniteElement()
+    mesh = fm.findMeshByDimension(2)
+    nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+    data = numpy.load(filename)
+    # a DOF map without elements is enough to set nodal parameters
+    dofs = HermiteMesh(numpy.zeros(0, dtype=numpy.int64), data['nodeIdentifiers'], data['valueLabels'], data['versions'],
+                       numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0))
+    fm.beginChange()
+    for name in data['fieldNames'].tolist():
+        field = createStressField(fm, mesh, nodes, coordinates, name=str(name))
+        dofs.writeDofValues(fm, field, data['values_' + name])
+    plateGroup = fm.createFieldElementGroup(mesh)
+    plateGroup.setName("plate")
+    plateGroup.setManaged(True)
+    plateMeshGroup = plateGroup.getMeshGroup()
+    for elementIdentifier in data['plateElementIdentifiers'].tolist():
+        plateMeshGroup.addElement(mesh.findElementByIdentifier(elementIdentifier))
+    fm.endChange()
+    return dict(zip(data['fieldNames'].tolist(), data['forces'].tolist()))
@@ -26,6 +26,145 @@ class Ui_ConfigureDialog(object):
         self.lineEdit0 = QtGui.QLineEdit(self.configGroupBox)
         self.lineEdit0.setObjectName("lineEdit0")
         self.formLayout.setWidget(0, QtGui.QFormLayout.FieldRole, self.lineEdit0)
+        self.labelUseResultCache = QtGui.QLabel(self.configGroupBox)
+        self.labelUseResultCache.setObjectName("labelUseResultCache")
+        self.formLayout.setWidget(1, QtGui.QFormLayout.LabelRole, self.labelUseResultCache)
+        self.checkBoxUseResultCache = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBoxUseResultCache.setText("")
+        self.checkBoxUseResultCache.setObjectName("checkBoxUseResultCache")
+        self.formLayout.setWidget(1, QtGui.QFormLayout.FieldRole, self.checkBoxUseResultCache)
+        self.labelResultCacheSize = QtGui.QLabel(self.configGroupBox)
+        self.labelResultCacheSize.setObjectName("labelResultCacheSize")
+        self.formLayout.setWidget(2, QtGui.QFormLayout.LabelRole, self.labelResultCacheSize)
+        self.spinBoxResultCacheSize = QtGui.QSpinBox(self.configGroupBox)
+        self.spinBoxResultCacheSize.setMinimum(1)
+        self.spinBoxResultCacheSize.setMaximum(100000)
+        self.spinBoxResultCacheSize.setObjectName("spinBoxResultCacheSize")
+        self.formLayout.setWidget(2, QtGui.QFormLayout.FieldRole, self.spinBoxResultCacheSize)
+        self.pushButtonClearResultCache = QtGui.QPushButton(self.configGroupBox)
+        self.pushButtonClearResultCache.setObjectName("pushButtonClearResultCache")
+        self.formLayout.setWidget(3, QtGui.QFormLayout.FieldRole, self.pushButtonClearResultCache)
+        self.labelSweepSamples = QtGui.QLabel(self.configGroupBox)
+        self.labelSweepSamples.setObjectName("labelSweepSamples")
+        self.formLayout.setWidget(4, QtGui.QFormLayout.LabelRole, self.labelSweepSamples)
+        self.spinBoxSweepSamples = QtGui.QSpinBox(self.configGroupBox)
+        self.spinBoxSweepSamples.setMaximum(10000)
+        self.spinBoxSweepSamples.setObjectName("spinBoxSweepSamples")
+        self.formLayout.setWidget(4, QtGui.QFormLayout.FieldRole, self.spinBoxSweepSamples)
+        self.labelSweepStart = QtGui.QLabel(self.configGroupBox)
+        self.labelSweepStart.setObjectName("labelSweepStart")
+        self.formLayout.setWidget(5, QtGui.QFormLayout.LabelRole, self.labelSweepStart)
+        self.doubleSpinBoxSweepStart = QtGui.QDoubleSpinBox(self.configGroupBox)
+        self.doubleSpinBoxSweepStart.setDecimals(4)
+        self.doubleSpinBoxSweepStart.setMinimum(-10.0)
+        self.doubleSpinBoxSweepStart.setMaximum(10.0)
+        self.doubleSpinBoxSweepStart.setSingleStep(0.01)
+        self.doubleSpinBoxSweepStart.setObjectName("doubleSpinBoxSweepStart")
+        self.formLayout.setWidget(5, QtGui.QFormLayout.FieldRole, self.doubleSpinBoxSweepStart)
+        self.labelSweepStop = QtGui.QLabel(self.configGroupBox)
+        self.labelSweepStop.setObjectName("labelSweepStop")
+        self.formLayout.setWidget(6, QtGui.QFormLayout.LabelRole, self.labelSweepStop)
+        self.doubleSpinBoxSweepStop = QtGui.QDoubleSpinBox(self.configGroupBox)
+        self.doubleSpinBoxSweepStop.setDecimals(4)
+        self.doubleSpinBoxSweepStop.setMinimum(-10.0)
+        self.doubleSpinBoxSweepStop.setMaximum(10.0)
+        self.doubleSpinBoxSweepStop.setSingleStep(0.01)
+        self.doubleSpinBoxSweepStop.setObjectName("doubleSpinBoxSweepStop")
+        self.formLayout.setWidget(6, QtGui.QFormLayout.FieldRole, self.doubleSpinBoxSweepStop)
+        self.labelContactBackend = QtGui.QLabel(self.configGroupBox)
+        self.labelContactBackend.setObjectName("labelContactBackend")
+        self.formLayout.setWidget(7, QtGui.QFormLayout.LabelRole, self.labelContactBackend)
+        self.comboBoxContactBackend = QtGui.QComboBox(self.configGroupBox)
+        self.comboBoxContactBackend.addItem("")
+        self.comboBoxContactBackend.addItem("")
+        self.comboBoxContactBackend.setObjectName("comboBoxContactBackend")
+        self.formLayout.setWidget(7, QtGui.QFormLayout.FieldRole, self.comboBoxContactBackend)
+        self.labelStressSolver = QtGui.QLabel(self.configGroupBox)
+        self.labelStressSolver.setObjectName("labelStressSolver")
+        self.formLayout.setWidget(8, QtGui.QFormLayout.LabelRole, self.labelStressSolver)
+        self.comboBoxStressSolver = QtGui.QComboBox(self.configGroupBox)
+        self.comboBoxStressSolver.addItem("")
+        self.comboBoxStressSolver.addItem("")
+        self.comboBoxStressSolver.addItem("")
+        self.comboBoxStressSolver.setObjectName("comboBoxStressSolver")
+        self.formLayout.setWidget(8, QtGui.QFormLayout.FieldRole, self.comboBoxStressSolver)
+        self.labelCullContact = QtGui.QLabel(self.configGroupBox)
+        self.labelCullContact.setObjectName("labelCullContact")
+        self.formLayout.setWidget(9, QtGui.QFormLayout.LabelRole, self.labelCullContact)
+        self.checkBoxCullContact = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBoxCullContact.setText("")
+        self.checkBoxCullContact.setObjectName("checkBoxCullContact")
+        self.formLayout.setWidget(9, QtGui.QFormLayout.FieldRole, self.checkBoxCullContact)
+        self.labelOutputMode = QtGui.QLabel(self.configGroupBox)
+        self.labelOutputMode.setObjectName("labelOutputMode")
+        self.formLayout.setWidget(10, QtGui.QFormLayout.LabelRole, self.labelOutputMode)
+        self.comboBoxOutputMode = QtGui.QComboBox(self.configGroupBox)
+        self.comboBoxOutputMode.addItem("")
+        self.comboBoxOutputMode.addItem("")
+        self.comboBoxOutputMode.addItem("")
+        self.comboBoxOutputMode.setObjectName("comboBoxOutputMode")
+        self.formLayout.setWidget(10, QtGui.QFormLayout.FieldRole, self.comboBoxOutputMode)
+        self.labelTargetForce = QtGui.QLabel(self.configGroupBox)
+        self.labelTargetForce.setObjectName("labelTargetForce")
+        self.formLayout.setWidget(11, QtGui.QFormLayout.LabelRole, self.labelTargetForce)
+        self.doubleSpinBoxTargetForce = QtGui.QDoubleSpinBox(self.configGroupBox)
+        self.doubleSpinBoxTargetForce.setDecimals(6)
+        self.doubleSpinBoxTargetForce.setMaximum(1000000000.0)
+        self.doubleSpinBoxTargetForce.setObjectName("doubleSpinBoxTargetForce")
+        self.formLayout.setWidget(11, QtGui.QFormLayout.FieldRole, self.doubleSpinBoxTargetForce)
+        self.labelLoadCaseAngles = QtGui.QLabel(self.configGroupBox)
+        self.labelLoadCaseAngles.setObjectName("labelLoadCaseAngles")
+        self.formLayout.setWidget(12, QtGui.QFormLayout.LabelRole, self.labelLoadCaseAngles)
+        self.lineEditLoadCaseAngles = QtGui.QLineEdit(self.configGroupBox)
+        self.lineEditLoadCaseAngles.setObjectName("lineEditLoadCaseAngles")
+        self.formLayout.setWidget(12, QtGui.QFormLayout.FieldRole, self.lineEditLoadCaseAngles)
+        self.labelUseService = QtGui.QLabel(self.configGroupBox)
+        self.labelUseService.setObjectName("labelUseService")
+        self.formLayout.setWidget(13, QtGui.QFormLayout.LabelRole, self.labelUseService)
+        self.checkBoxUseService = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBoxUseService.setText("")
+        self.checkBoxUseService.setObjectName("checkBoxUseService")
+        self.formLayout.setWidget(13, QtGui.QFormLayout.FieldRole, self.checkBoxUseService)
+        self.labelServicePort = QtGui.QLabel(self.configGroupBox)
+        self.labelServicePort.setObjectName("labelServicePort")
+        self.formLayout.setWidget(14, QtGui.QFormLayout.LabelRole, self.labelServicePort)
+        self.spinBoxServicePort = QtGui.QSpinBox(self.configGroupBox)
+        self.spinBoxServicePort.setMinimum(1024)
+        self.spinBoxServicePort.setMaximum(65535)
+        self.spinBoxServicePort.setObjectName("spinBoxServicePort")
+        self.formLayout.setWidget(14, QtGui.QFormLayout.FieldRole, self.spinBoxServicePort)
+        self.labelWarmStart = QtGui.QLabel(self.configGroupBox)
+        self.labelWarmStart.setObjectName("labelWarmStart")
+        self.formLayout.setWidget(15, QtGui.QFormLayout.LabelRole, self.labelWarmStart)
+        self.checkBoxWarmStart = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBoxWarmStart.setText("")
+        self.checkBoxWarmStart.setObjectName("checkBoxWarmStart")
+        self.formLayout.setWidget(15, QtGui.QFormLayout.FieldRole, self.checkBoxWarmStart)
+        self.labelStressFitTolerance = QtGui.QLabel(self.configGroupBox)
+        self.labelStressFitTolerance.setObjectName("labelStressFitTolerance")
+        self.formLayout.setWidget(16, QtGui.QFormLayout.LabelRole, self.labelStressFitTolerance)
+        self.doubleSpinBoxStressFitTolerance = QtGui.QDoubleSpinBox(self.configGroupBox)
+        self.doubleSpinBoxStressFitTolerance.setDecimals(8)
+        self.doubleSpinBoxStressFitTolerance.setMaximum(1.0)
+        self.doubleSpinBoxStressFitTolerance.setSingleStep(0.0001)
+        self.doubleSpinBoxStressFitTolerance.setObjectName("doubleSpinBoxStressFitTolerance")
+        self.formLayout.setWidget(16, QtGui.QFormLayout.FieldRole, self.doubleSpinBoxStressFitTolerance)
+        self.labelWriteResults = QtGui.QLabel(self.configGroupBox)
+        self.labelWriteResults.setObjectName("labelWriteResults")
+        self.formLayout.setWidget(17, QtGui.QFormLayout.LabelRole, self.labelWriteResults)
+        self.checkBoxWriteResults = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBoxWriteResults.setText("")
+        self.checkBoxWriteResults.setObjectName("checkBoxWriteResults")
+        self.formLayout.setWidget(17, QtGui.QFormLayout.FieldRole, self.checkBoxWriteResults)
+        self.labelForceTolerance = QtGui.QLabel(self.configGroupBox)
+        self.labelForceTolerance.setObjectName("labelForceTolerance")
+        self.formLayout.setWidget(18, QtGui.QFormLayout.LabelRole, self.labelForceTolerance)
+        self.doubleSpinBoxForceTolerance = QtGui.QDoubleSpinBox(self.configGroupBox)
+        self.doubleSpinBoxForceTolerance.setDecimals(8)
+        self.doubleSpinBoxForceTolerance.setMaximum(1.0)
+        self.doubleSpinBoxForceTolerance.setSingleStep(0.0001)
+        self.doubleSpinBoxForceTolerance.setObjectName("doubleSpinBoxForceTolerance")
+        self.formLayout.setWidget(18, QtGui.QFormLayout.FieldRole, self.doubleSpinBoxForceTolerance)
         self.gridLayout.addWidget(self.configGroupBox, 0, 0, 1, 1)
         self.buttonBox = QtGui.QDialogButtonBox(ConfigureDialog)
         self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
@@ -41,4 +180,41 @@ class Ui_ConfigureDialog(object):
     def retranslateUi(self, ConfigureDialog):
         ConfigureDialog.setWindowTitle(QtGui.QApplication.translate("ConfigureDialog", "ConfigureDialog", None, QtGui.QApplication.UnicodeUTF8))
         self.label0.setText(QtGui.QApplication.translate("ConfigureDialog", "identifier:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelUseResultCache.setText(QtGui.QApplication.translate("ConfigureDialog", "Use result cache:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelResultCacheSize.setText(QtGui.QApplication.translate("ConfigureDialog", "Result cache size:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.spinBoxResultCacheSize.setSuffix(QtGui.QApplication.translate("ConfigureDialog", " MB", None, QtGui.QApplication.UnicodeUTF8))
+        self.pushButtonClearResultCache.setText(QtGui.QApplication.translate("ConfigureDialog", "Clear result cache", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelSweepSamples.setText(QtGui.QApplication.translate("ConfigureDialog", "Sweep samples:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.spinBoxSweepSamples.setSpecialValueText(QtGui.QApplication.translate("ConfigureDialog", "Off", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelSweepStart.setText(QtGui.QApplication.translate("ConfigureDialog", "Sweep start offset:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelSweepStop.setText(QtGui.QApplication.translate("ConfigureDialog", "Sweep stop offset:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelContactBackend.setText(QtGui.QApplication.translate("ConfigureDialog", "Contact backend:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBoxContactBackend.setItemText(0, QtGui.QApplication.translate("ConfigureDialog", "zinc", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBoxContactBackend.setItemText(1, QtGui.QApplication.translate("ConfigureDialog", "numpy", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelStressSolver.setText(QtGui.QApplication.translate("ConfigureDialog", "Stress solver:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBoxStressSolver.setItemText(0, QtGui.QApplication.translate("ConfigureDialog", "optimiser", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBoxStressSolver.setItemText(1, QtGui.QApplication.translate("ConfigureDialog", "direct", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBoxStressSolver.setItemText(2, QtGui.QApplication.translate("ConfigureDialog", "multilevel", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelCullContact.setText(QtGui.QApplication.translate("ConfigureDialog", "Cull contact:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelOutputMode.setText(QtGui.QApplication.translate("ConfigureDialog", "Output mode:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBoxOutputMode.setItemText(0, QtGui.QApplication.translate("ConfigureDialog", "exfile", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBoxOutputMode.setItemText(1, QtGui.QApplication.translate("ConfigureDialog", "sidecar", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboBoxOutputMode.setItemText(2, QtGui.QApplication.translate("ConfigureDialog", "both", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelTargetForce.setText(QtGui.QApplication.translate("ConfigureDialog", "Target force:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.doubleSpinBoxTargetForce.setSpecialValueText(QtGui.QApplication.translate("ConfigureDialog", "Off", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelLoadCaseAngles.setText(QtGui.QApplication.translate("ConfigureDialog", "Load case tilt angles:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.lineEditLoadCaseAngles.setToolTip(QtGui.QApplication.translate("ConfigureDialog", "Plate tilt angles in degrees about the femur axis, separated by commas, one stress field each. Empty for a single untilted case.", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelUseService.setText(QtGui.QApplication.translate("ConfigureDialog", "Use load femur service:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBoxUseService.setToolTip(QtGui.QApplication.translate("ConfigureDialog", "Run in a loadfemur-service process keeping meshes loaded, when one is listening on the port. Otherwise run in the MAP Client.", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelServicePort.setText(QtGui.QApplication.translate("ConfigureDialog", "Service port:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelWarmStart.setText(QtGui.QApplication.translate("ConfigureDialog", "Warm start stress fit:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBoxWarmStart.setToolTip(QtGui.QApplication.translate("ConfigureDialog", "Start the stress optimiser from the last solution for a mesh with the same topology.", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelStressFitTolerance.setText(QtGui.QApplication.translate("ConfigureDialog", "Stress fit tolerance:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.doubleSpinBoxStressFitTolerance.setSpecialValueText(QtGui.QApplication.translate("ConfigureDialog", "Off", None, QtGui.QApplication.UnicodeUTF8))
+        self.doubleSpinBoxStressFitTolerance.setToolTip(QtGui.QApplication.translate("ConfigureDialog", "Stop optimising once an iteration reduces the objective by less than this fraction.", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelWriteResults.setText(QtGui.QApplication.translate("ConfigureDialog", "Write results files:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBoxWriteResults.setToolTip(QtGui.QApplication.translate("ConfigureDialog", "Write results files for the file location port. Without them only the Zinc region port is provided.", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelForceTolerance.setText(QtGui.QApplication.translate("ConfigureDialog", "Force tolerance:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.doubleSpinBoxForceTolerance.setSpecialValueText(QtGui.QApplication.translate("ConfigureDialog", "Off", None, QtGui.QApplication.UnicodeUTF8))
+        self.doubleSpinBoxForceTolerance.setToolTip(QtGui.QApplication.translate("ConfigureDialog", "Refine force quadrature on elements the plate boundary crosses until its estimated error is within this fraction of the force.", None, QtGui.QApplication.UnicodeUTF8))
 
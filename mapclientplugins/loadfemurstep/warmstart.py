@@ -0,0 +1,98 @@
+"""
+Stress fit solutions kept between runs to warm start the optimiser.
+
+Solutions are keyed by a signature of the mesh topology and Hermite
+parameter map, not its coordinates, so a fit after small changes to the
+plate or the geometry starts from the last solution instead of zero. Each
+entry also records the iterations and optimisation time of the last cold
+start, from which the saving of warm starts is reported.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy
+from mapclientplugins.loadfemurstep.resultcache import TEMPORARY_PREFIX
+
+def getTopologySignature(hermiteMesh):
+    """
+    :param hermiteMesh: HermiteMesh
+    :return: hex digest of element and DOF identifiers and the element to DOF
+    map, which is the same for meshes whose stress parameters are interchangeable
+    """
+    hasher = hashlib.sha256()
+    for array in (hermiteMesh.elementIdentifiers, hermiteMesh.dofNodeIdentifiers, hermiteMesh.dofValueLabels,
+                  hermiteMesh.dofVersions, hermiteMesh.mapRows, hermiteMesh.mapColumns):
+        hasher.update(numpy.ascontiguousarray(array, dtype=numpy.int64).tobytes())
+    return hasher.hexdigest()
+
+class WarmStart(object):
+    """
+    A stored stress solution with the cost of the cold start it replaces.
+    """
+
+    def __init__(self, dofValues, coldIterations, coldTime):
+        """
+        :param dofValues: float array (dofsCount, 3) of stress nodal parameters
+        :param coldIterations: optimiser iterations of the last cold start
+        :param coldTime: optimisation time in seconds of the last cold start
+        """
+        self.dofValues = dofValues
+        self.coldIterations = coldIterations
+        self.coldTime = coldTime
+
+class WarmStartStore(object):
+    '''
+    Directory of stress solutions, one file per topology signature and
+    stress field name.
+    '''
+
+    def __init__(self, storeDir):
+        '''
+        :param storeDir: directory holding solutions, created on demand
+        '''
+        self._storeDir = storeDir
+
+    def _getFilename(self, signature, name):
+        return os.path.join(self._storeDir, signature + '_' + name + '.npz')
+
+    def lookup(self, signature, name, dofsCount):
+        '''
+        :param dofsCount: expected number of DOFs
+        :return: WarmStart, or None if missing or unreadable
+        '''
+        try:
+            with numpy.load(self._getFilename(signature, name)) as archive:
+                dofValues = archive['dofValues']
+                if dofValues.shape != (dofsCount, 3):
+                    return None
+                return WarmStart(dofValues, int(archive['coldIterations']), float(archive['coldTime']))
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def store(self, signature, name, warmStart):
+        '''
+        Save warmStart, replacing any older one for signature and name.
+        '''
+        if not os.path.isdir(self._storeDir):
+            os.makedirs(self._storeDir)
+        # save to a temporary file first so a partial solution is never found
+        handle, tempFilename = tempfile.mkstemp(prefix=TEMPORARY_PREFIX, suffix='.npz', dir=self._storeDir)
+        with os.fdopen(handle, 'wb') as outfile:
+            numpy.savez(outfile, dofValues=warmStart.dofValues,
+                        coldIterations=warmStart.coldIterations, coldTime=warmStart.coldTime)
+        # replace atomically so readers see either the old or the new solution
+        os.replace(tempFilename, self._getFilename(signature, name))
+
+    def clear(self):
+        '''
+        Remove all solutions.
+        '''
+        if os.path.isdir(self._storeDir):
+            shutil.rmtree(self._storeDir)
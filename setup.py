@@ -7,7 +7,7 @@ import sys, os, io
 def readfile(filename, split=False):
     with io.open(filename, encoding="utf-8") as stream:
         if split:
-            return stream.read().split("\\n")
+            return stream.read().splitlines()
         return stream.read()
 
 readme = readfile("README.rst", split=True)[3:]  # skip title
@@ -33,4 +33,10 @@ setup(
     include_package_data=True,
     zip_safe=False,
     install_requires=requires,
+    entry_points={
+        'console_scripts': [
+            'loadfemur-batch = mapclientplugins.loadfemurstep.cli:main',
+            'loadfemur-service = mapclientplugins.loadfemurstep.service:main',
+        ],
+    },
     )
@@ -0,0 +1,59 @@
+"""
+Adaptive contact quadrature evaluation budget on a paraboloid patch of
+bicubic Hermite elements cut by the plate.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import numpy
+import pytest
+
+pytest.importorskip('opencmiss.zinc')
+
+from mapclientplugins.loadfemurstep.adaptivequadrature import AdaptiveContactQuadrature
+from mapclientplugins.loadfemurstep.hermitemesh import HermiteMesh
+
+NUMBER_OF_POINTS = 4
+PLATE_HEIGHT = 0.5
+UP = [0.0, 0.0, 1.0]
+
+
+def createParaboloidPatch(elementsCount1D):
+    """
+    :return: (HermiteMesh, dofValues) of z = x*x + y*y over [-1, 1] x [-1, 1]
+    with separate nodal parameters in each element
+    """
+    size = 2.0/elementsCount1D
+    dofValues = []
+    for j in range(elementsCount1D):
+        for i in range(elementsCount1D):
+            for n2 in range(2):
+                for n1 in range(2):
+                    x = -1.0 + (i + n1)*size
+                    y = -1.0 + (j + n2)*size
+                    dofValues += [[x, y, x*x + y*y], [size, 0.0, 2.0*x*size], [0.0, size, 2.0*y*size], [0.0, 0.0, 0.0]]
+    dofsCount = len(dofValues)
+    dofIndexes = numpy.arange(dofsCount)
+    hermiteMesh = HermiteMesh(numpy.arange(1, elementsCount1D*elementsCount1D + 1), numpy.zeros(dofsCount, dtype=int),
+        None, None, dofIndexes, dofIndexes, numpy.ones(dofsCount))
+    return hermiteMesh, numpy.array(dofValues)
+
+
+@pytest.mark.parametrize('evaluationBudget', [16, 64])
+def test_evaluation_budget_limits_refinement(evaluationBudget):
+    hermiteMesh, dofValues = createParaboloidPatch(4)
+    elementIndexes = numpy.arange(hermiteMesh.getElementsCount())
+    unlimited = AdaptiveContactQuadrature(hermiteMesh, dofValues, NUMBER_OF_POINTS, 8)
+    coarseValues = unlimited.integrateElements(UP, PLATE_HEIGHT, elementIndexes)
+    tolerance = 1.0E-4*float(numpy.sum(coarseValues))
+    exactForce, _, unlimitedEvaluations = unlimited.integratePenetration(UP, PLATE_HEIGHT, elementIndexes, tolerance, coarseValues)
+    budgeted = AdaptiveContactQuadrature(hermiteMesh, dofValues, NUMBER_OF_POINTS, 8, evaluationBudget)
+    force, errorEstimate, evaluations = budgeted.integratePenetration(UP, PLATE_HEIGHT, elementIndexes, tolerance, coarseValues)
+    fixedRuleEvaluations = NUMBER_OF_POINTS*NUMBER_OF_POINTS
+    assert evaluations <= len(elementIndexes)*evaluationBudget*fixedRuleEvaluations
+    assert evaluations < unlimitedEvaluations
+    # stopping early still improves on the fixed rule
+    assert abs(force - exactForce) < abs(float(numpy.sum(coarseValues)) - exactForce)
+    assert errorEstimate is not None
@@ -0,0 +1,48 @@
+"""
+The Zinc and NumPy contact backends give the same force and fitted stress
+on a synthetic femur-like mesh.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import numpy
+import pytest
+
+pytest.importorskip('opencmiss.zinc')
+
+from opencmiss.zinc.context import Context as ZincContext
+from mapclientplugins.loadfemurstep.loadfemur import CONTACT_BACKENDS, FemurModel, getSettings, solveFemurModel
+from mapclientplugins.loadfemurstep.phases import PhaseMonitor
+from mapclientplugins.loadfemurstep.benchmark.synthetic import writeFemurLikeMesh
+
+# allowed difference relative to the Zinc backend's force and largest stress
+PARITY_TOLERANCE = 1.0E-6
+
+
+@pytest.mark.parametrize('backendSettings', [
+    { 'cullContact': False },
+    { 'cullContact': True },
+    { 'forceTolerance': 1.0E-3, 'forceRefinementLevels': 3 },
+])
+def test_backends_agree(tmp_path, backendSettings):
+    filenameIn = str(tmp_path / 'femur.exf')
+    writeFemurLikeMesh(filenameIn, 16, 8)
+    context = ZincContext('parity')
+    model = FemurModel(context.createRegion(), filenameIn)
+    forces = {}
+    stresses = {}
+    for backend in CONTACT_BACKENDS:
+        settings = getSettings(backendSettings)
+        settings.update({ 'contactBackend': backend, 'plateOffset': 0.05, 'writeResults': False, 'maximumIterations': 5 })
+        results = solveFemurModel(model, str(tmp_path / ('results_' + backend + '.exf')), settings, PhaseMonitor())
+        forces[backend] = results['force']
+        stress = model.fm.findFieldByName('stress').castFiniteElement()
+        stresses[backend] = model.getHermiteMesh().readDofValues(model.fm, stress)
+    assert forces['zinc'] > 0.0
+    stressScale = numpy.max(numpy.abs(stresses['zinc']))
+    assert stressScale > 0.0
+    for backend in CONTACT_BACKENDS:
+        assert abs(forces[backend] - forces['zinc']) <= PARITY_TOLERANCE*forces['zinc'], backend
+        assert numpy.max(numpy.abs(stresses[backend] - stresses['zinc'])) <= PARITY_TOLERANCE*stressScale, backend
@@ -0,0 +1,24 @@
+"""
+The plugin imports within a time budget and without Zinc, NumPy, SciPy,
+PySide or the computation, as the MAP Client imports every plugin to list
+them.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from mapclientplugins.loadfemurstep.benchmark.importtime import checkImportTimes
+
+# seconds, the fastest of repeated imports each in a fresh interpreter
+IMPORT_TIME_BUDGET = 0.05
+
+
+def test_plugin_import_time():
+    rows = checkImportTimes(IMPORT_TIME_BUDGET, repeats=5)
+    # the package itself needs nothing the MAP Client may not have installed
+    assert rows[0]['skipped'] is None
+    for row in rows:
+        assert not row['deferredImported'], row
+        if row['skipped'] is None:
+            assert row['time'] <= IMPORT_TIME_BUDGET, row
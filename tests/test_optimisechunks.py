@@ -0,0 +1,44 @@
+"""
+Splitting the stress fit optimiser into chunks of iterations, which
+restarts its quasi-Newton state with each call, gives the same stress as
+running all iterations in one call.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import numpy
+import pytest
+
+pytest.importorskip('opencmiss.zinc')
+
+from opencmiss.zinc.context import Context as ZincContext
+from mapclientplugins.loadfemurstep.loadfemur import FemurModel, getSettings, solveFemurModel
+from mapclientplugins.loadfemurstep.phases import PhaseMonitor
+from mapclientplugins.loadfemurstep.benchmark.synthetic import writeFemurLikeMesh
+
+# allowed difference relative to the one call fit's largest stress and objective
+CHUNK_TOLERANCE = 1.0E-6
+
+
+@pytest.mark.parametrize('cullContact', [False, True])
+def test_chunked_optimisation_matches_one_call(tmp_path, cullContact):
+    filenameIn = str(tmp_path / 'femur.exf')
+    writeFemurLikeMesh(filenameIn, 16, 8)
+    context = ZincContext('chunks')
+    model = FemurModel(context.createRegion(), filenameIn)
+    stresses = {}
+    objectives = {}
+    for chunkIterations in (0, 1, 2):
+        settings = getSettings({ 'cullContact': cullContact, 'plateOffset': 0.05, 'writeResults': False,
+            'maximumIterations': 5, 'optimiseChunkIterations': chunkIterations })
+        results = solveFemurModel(model, str(tmp_path / 'results.exf'), settings, PhaseMonitor())
+        objectives[chunkIterations] = results['stressFitObjective']
+        stress = model.fm.findFieldByName('stress').castFiniteElement()
+        stresses[chunkIterations] = model.getHermiteMesh().readDofValues(model.fm, stress)
+    stressScale = numpy.max(numpy.abs(stresses[0]))
+    assert stressScale > 0.0
+    for chunkIterations in (1, 2):
+        assert numpy.max(numpy.abs(stresses[chunkIterations] - stresses[0])) <= CHUNK_TOLERANCE*stressScale, chunkIterations
+        assert objectives[chunkIterations] <= objectives[0] + CHUNK_TOLERANCE*abs(objectives[0]), chunkIterations
@@ -0,0 +1,38 @@
+"""
+The input EX file is parsed once per run, the stress field being created
+from the loaded coordinates rather than by reading the file again.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip('opencmiss.zinc')
+
+from opencmiss.zinc.region import Region
+from mapclientplugins.loadfemurstep.loadfemur import loadfemur
+from mapclientplugins.loadfemurstep.settings import OUTPUT_MODES
+from mapclientplugins.loadfemurstep.benchmark.synthetic import writeFemurLikeMesh
+
+
+@pytest.mark.parametrize('outputMode', OUTPUT_MODES)
+def test_input_read_once(tmp_path, monkeypatch, outputMode):
+    filenameIn = str(tmp_path / 'femur.exf')
+    writeFemurLikeMesh(filenameIn, 16, 8)
+    filenamesRead = []
+    readFile = Region.readFile
+
+    def countingReadFile(region, filename):
+        filenamesRead.append(filename)
+        return readFile(region, filename)
+
+    monkeypatch.setattr(Region, 'readFile', countingReadFile)
+    results = loadfemur(filenameIn, str(tmp_path / 'results.exf'), { 'outputMode': outputMode, 'maximumIterations': 1 })
+    assert filenamesRead == [filenameIn]
+    assert [phase['name'] for phase in results['metrics']['phases']].count('read') == 1
+    assert results['region'].getFieldmodule().findFieldByName('stress').isValid()
+    assert os.path.isfile(results['metricsFilename'])
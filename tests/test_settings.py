@@ -0,0 +1,20 @@
+"""
+Settings returned by getSettings can be changed without changing the
+defaults or the settings they were made from.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from mapclientplugins.loadfemurstep.settings import DEFAULT_SETTINGS, getSettings
+
+
+def test_settings_share_no_lists():
+    settings = getSettings()
+    settings['loadCaseAngles'].append(10.0)
+    assert DEFAULT_SETTINGS['loadCaseAngles'] == []
+    overrides = { 'loadCaseAngles': [0.0, 5.0] }
+    settings = getSettings(overrides)
+    settings['loadCaseAngles'].append(10.0)
+    assert overrides['loadCaseAngles'] == [0.0, 5.0]
@@ -0,0 +1,31 @@
+"""
+The simpleviz script generated for stress sidecars loads without SciPy or
+the computation, as viewers import it on their own.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('opencmiss.zinc')
+
+from mapclientplugins.loadfemurstep.loadfemur import write_simpleviz_script
+
+_IMPORT_SCRIPT = """
+import json, runpy, sys
+runpy.run_path(%(filename)r)
+sys.stdout.write(json.dumps([name for name in ('scipy', 'mapclientplugins.loadfemurstep.loadfemur') if name in sys.modules]))
+"""
+
+
+def test_sidecar_script_imports_no_computation(tmp_path):
+    filename = str(tmp_path / 'simpleviz.py')
+    write_simpleviz_script(filename, str(tmp_path / 'femur.exf'), str(tmp_path / 'results_stress.npz'))
+    output = subprocess.check_output([sys.executable, '-c', _IMPORT_SCRIPT % { 'filename': filename }])
+    assert json.loads(output.decode('utf-8')) == []
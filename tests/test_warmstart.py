@@ -0,0 +1,23 @@
+"""
+Warm started stress fits against cold starts, with and without contact
+culling.
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import pytest
+
+pytest.importorskip('opencmiss.zinc')
+
+from mapclientplugins.loadfemurstep.benchmark.warmstartcheck import DEFAULT_OFFSETS, checkWarmStarts, \
+    isWarmStartCovered
+
+
+def test_warm_starts_match_cold_starts(tmp_path):
+    rows = checkWarmStarts((16, 8), DEFAULT_OFFSETS, { 'maximumIterations': 10 }, 1.0E-4, str(tmp_path))
+    # culled warm starts seed only the fit stencil, which must be exercised
+    assert isWarmStartCovered(rows)
+    for row in rows:
+        assert row['ok'], row